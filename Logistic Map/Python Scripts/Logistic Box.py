@@ -1,7 +1,21 @@
 import numpy as numpy
 import matplotlib.pyplot as plt
-import random 
-import seaborn as sns
+from functools import partial
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic
+from dynamical_systems.box import box_counts, box_dimensions
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.correlation import correlation_sums
+from dynamical_systems.embedding import delay_embedding
+from dynamical_systems.feigenbaum import feigenbaum_constants
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import iterate_orbits, sample_orbits
+from dynamical_systems.render import bifurcation_image
+from dynamical_systems.results import Result
+from dynamical_systems.streams import value_stream, value_uniform
+from dynamical_systems.sweep import sweep
 
 '''
 The aim of this script is to calculate the box dimension of thr logistic map attractor. The
@@ -18,13 +32,7 @@ will be closer to 1 (the Logistic Map is a 1D, thus the highest it can be is 1 i
 domain is needed to describe the orbits).
 '''
 
-#The logistic map
-def logistic(r,x):
-    return r*x*(1-x)
-
-#its derivative
-def logistic_derivative(r,x):
-    return r*(1-2*x)
+#The logistic map and its derivative come from the shared map registry
 
 '''
 calculate the values of the logistical map with an initial x0 and parameter r, only capturing dat
@@ -33,37 +41,44 @@ the value of x0 as to remove synchronis artifacts as well as taking a random sam
 plotting. We calculate the exponent using the definition of (1/n)(sum(ln(|f'|)). The input
 values would be parameter value r, initial x value x0, the number of iterations and the
 number of iterations to allow before recording data (transients) k or (r,x,i,t)
+With a tolerance the orbit is stopped once it has settled onto a cycle and the rest of it is
+the cycle repeated (see dynamical_systems.cycles.cycle_orbits).
 '''
 
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-5
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-5
     rawx_values   = []
-    rawr_values   = []
     sample        = int((iterations-transients)/2)
-    for i in range(iterations):
-        x = logistic(r,x)
-        if i > transients:
-            rawx_values.append(x)
-            rawr_values.append(r)
-    x_values      = random.sample(rawx_values,sample)
-    r_values      = random.sample(rawr_values,sample)
-    return r_values, x_values
+    if tolerance is not None:
+        orbit = cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
+        return sample_orbits(r,orbit,sample,stream)
+    with stage('iterate'):
+        for i in range(iterations):
+            x = logistic(r,x)
+            if i > transients:
+                rawx_values.append(x)
+    return sample_orbits(r,numpy.array(rawx_values),sample,stream)
+
             
 '''
-Then we graph the ranges of x as we vary the parameter r.
+Then we graph the ranges of x as we vary the parameter r, binning the points into a single
+image of (r,x) pixels instead of plotting each one.
 '''
 
-def graph_logistic(r1,r2,x0,iterations,transients):
-    for r in numpy.linspace(r1,r2,1001):
-        values = logistic_map_values(r,x0,iterations,transients)
-        plt.plot(values[0],values[1],"k.", markersize = 0.1,alpha = 0.15)
-    plt.ylim(-1,1)
-    plt.xlim(r1,r2)
-    plt.title('The Logistic Map Transitioning to Chaos')
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Orbit Values (x)')
-    plt.grid(True,which='both',linewidth=0.5,color='grey',linestyle='--')
-    plt.show()
+def graph_logistic(r1,r2,x0,iterations,transients,shading='log',backend='serial',workers=None,
+                   graph=True):
+    image  = bifurcation_image('logistic',r1,r2,x0,iterations,transients+2,width=1001,
+                               perturbation=1e-5,backend=backend,workers=workers)
+    result = Result(title='The Logistic Map Transitioning to Chaos',xlabel='Parameter (r)',
+                    ylabel='Orbit Values (x)',xlim=(r1,r2),ylim=(-1,1),
+                    grid=dict(which='both',linewidth=0.5,color='grey',linestyle='--'),
+                    image=image).image(image,shading)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
 To calculate the box counting dimension we first need to determine how many boxes or 'lines'
@@ -76,15 +91,14 @@ point will fit into the 4th box. We do the same for all x points in the orbit. W
 this by dividing all values within the array by the box size, then 'floor' the values to
 determine which box it fits in.
 Next we determine how many unique boxes are needed to cover all the orbit points and sum.
-Then we calculate the the number of boxes used and output log(N) and log(1/e).
+Then we calculate the the number of boxes used and output log(N) and log(1/e). The counting
+itself is done by box_counts, which sorts the points once and then counts the boxes for any
+number of box sizes from the sorted points.
 
 '''
 
 def box_counting(X,epsilon):
-    data        = numpy.clip(X,0,1-1e-15)
-    box_fitting = numpy.floor(data/epsilon)
-    N_total     = numpy.unique(box_fitting)
-    N           = len(N_total)
+    N           = box_counts(X,[epsilon])[0]
     return numpy.log(N), numpy.log(1/epsilon)
 
 '''
@@ -99,99 +113,152 @@ boxes approaches the number of points, we dont use this regime.
 We want the total number of boxes to be less than the total number of data points and the
 number of boxes is the domain(1) devided by the box length. Combining, this produces the
 condition points*epsilon > 1 or > 1.1 to stay away from the boundary. 
+The points are the whole orbit after the transients (not the random half used for plotting),
+the same orbit the range and overlay functions below count for each r, with the same
+perturbation of x0 (drawn from the stream of that r, see dynamical_systems.streams), so all
+three give the same D for the same r and the points*epsilon condition means the same thing in
+each.
+The fitted line is drawn over the points (as a regression plot would) and everything is
+returned as a Result with D in it (result.D), drawn unless graph=None and shown only when
+graph=True, as for every graph in this script.
 '''
 
-def box_counting_values(r,x0,iterations,transients):
-    data      = logistic_map_values(r,x0,iterations,transients)[1]
+def box_counting_values(r,x0,iterations,transients,graph=True):
+    data      = iterate_orbits('logistic',r,x0 + value_uniform(r)*1e-5,iterations,transients+2)
     eps       = 10/(iterations - transients)
     epsilon   = numpy.linspace(0.01,eps,3001)
-    logN_vals = []
-    loge_vals = []
-    for e in epsilon:
-        logN, loge = box_counting(data,e)
-        logN_vals.append(logN)
-        loge_vals.append(loge)
-    D = round(numpy.polyfit(loge_vals,logN_vals,1)[0],2)
-    sns.regplot(x=loge_vals,y=logN_vals,ci=None, line_kws={'color':'red',\
-    'linestyle':'--','linewidth':0.75,'label':f'D={D}'},scatter_kws={'color':'black','s':0.7,\
-    'alpha':0.2,'marker':'.'})
-    plt.title(f'Plot of Number of Boxes (N) and width size $\epsilon$, r={r}')
-    plt.xlabel('Log(1/$\epsilon$)')
-    plt.ylabel('Log N($\epsilon$)')
-    plt.grid(True, which='both',linestyle='--',linewidth=0.1,color='lightgrey')
-    plt.legend()
-    plt.show()
-    return D
+    logN_vals = numpy.log(box_counts(data,epsilon))
+    loge_vals = numpy.log(1/epsilon)
+    with stage('polyfit'):
+        slope, intercept = numpy.polyfit(loge_vals,logN_vals,1)
+    D         = round(slope,2)
+    ends      = numpy.array([loge_vals.min(),loge_vals.max()])
+    result    = Result(title=f'Plot of Number of Boxes (N) and width size $\epsilon$, r={r}',
+                       xlabel='Log(1/$\epsilon$)',ylabel='Log N($\epsilon$)',legend=True,
+                       grid=dict(which='both',linestyle='--',linewidth=0.1,color='lightgrey'),
+                       epsilon=epsilon,logN=logN_vals,loge=loge_vals,D=D)
+    result.scatter(loge_vals,logN_vals,color='black',s=0.7,alpha=0.2,marker='.')
+    result.line(ends,slope*ends + intercept,color='red',linestyle='--',linewidth=0.75,
+                label=f'D={D}')
+    if graph is not None:
+        with stage('drawing'):
+            result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+The correlation dimension D2 is another measure of the dimension of the attractor. The orbit
+(in order, so not the random sample used above) is embedded in m dimensions with delay tau
+and we count the fraction C(e) of pairs of points that are within e of each other for a range
+of e, then D2 is the slope of log C(e) against log e. The pairs are counted with a KD-tree
+(see dynamical_systems.correlation), and for long orbits only from references random points,
+so 10^6 points take a few seconds. As for the box dimension the smallest e is kept above
+about 10 over the number of points.
+'''
+
+def correlation_dimension_values(r,x0,iterations,transients,m=2,tau=1,references=2000,
+                                 graph=True):
+    orbit     = iterate_orbits('logistic',r,x0 + value_uniform(r)*1e-5,iterations,transients+2)
+    embedded  = delay_embedding(orbit,m,tau)
+    epsilon   = numpy.geomspace(10/(iterations - transients),0.01,30)
+    C         = correlation_sums(embedded,epsilon,references)
+    keep      = C > 0
+    logC_vals = numpy.log(C[keep])
+    loge_vals = numpy.log(epsilon[keep])
+    with stage('polyfit'):
+        slope, intercept = numpy.polyfit(loge_vals,logC_vals,1)
+    D2        = round(slope,2)
+    ends      = numpy.array([loge_vals.min(),loge_vals.max()])
+    result    = Result(title=f'Correlation Sum C($\epsilon$) in {m} dimensions, r={r}',
+                       xlabel='Log($\epsilon$)',ylabel='Log C($\epsilon$)',legend=True,
+                       grid=dict(which='both',linestyle='--',linewidth=0.1,color='lightgrey'),
+                       epsilon=epsilon,C=C,logC=logC_vals,loge=loge_vals,D2=D2)
+    result.scatter(loge_vals,logC_vals,color='black',s=4,marker='o')
+    result.line(ends,slope*ends + intercept,color='red',linestyle='--',linewidth=0.75,
+                label=f'D2={D2}')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
     
 
 '''
 takes x0, iterations and transient levels to output a range of values for the box counting
-dimension through out the range of r. manually adds tghe point r=3.56995 to calculate
-dimension at the point where chaos begins or Feigenbaum point
+dimension through out the range of r. adds the point r_inf = 3.5699456... to calculate
+dimension at the point where chaos begins or Feigenbaum point, located from the superstable
+parameters of the period doubling cascade (see dynamical_systems.feigenbaum). Each value of r
+is independent, so the r values can be shared out between threads or processes with the
+backend and workers arguments (see dynamical_systems.sweep), e.g. backend='process' to use
+every core.
 '''
 
-def range_box_counting_values(r1,r2,x0,iterations,transients):
+def range_box_counting_values(r1,r2,x0,iterations,transients,backend='serial',workers=None,
+                              graph=True):
     eps       = 10/(iterations - transients)
     epsilon   = numpy.linspace(0.01,eps,3001)
-    feigenbaum= numpy.array([3.56995])
+    feigenbaum= numpy.array([feigenbaum_constants('logistic')[2]])
     r_param   = numpy.linspace(r1,r2,107)
     parameter = numpy.sort(numpy.concatenate([r_param,feigenbaum]))
-    r_values  = []
-    dimension = []
-    for r in parameter:
-        data      = logistic_map_values(r,x0,iterations,transients)[1]
-        r_values.append(r)
-        logN_vals = []
-        loge_vals = []
-        for e in epsilon:
-            logN, loge = box_counting(data,e)
-            logN_vals.append(logN)
-            loge_vals.append(loge)
-        D     = round(numpy.polyfit(loge_vals,logN_vals,1)[0],2)
-        dimension.append(D)
-    plt.scatter(r_values,dimension,s=50,color='black',marker='o')
-    plt.xlim(r1,r2)
-    plt.ylim(0,1)
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Box Counting Dimension (D)')
-    plt.title('Range of Box Counting Dimension')
-    plt.show()
-    return r_values, dimension
-
-def Overlay_plot(r1,r2,x0,iterations,transients):
+    r_values  = list(parameter)
+    dimension = sweep(partial(box_dimensions,'logistic'),parameter,x0,iterations,transients+2,
+                      epsilon,perturbation=1e-5,per_value=True,backend=backend,workers=workers)
+    dimension = [round(D,2) for D in dimension]
+    result    = Result(title='Range of Box Counting Dimension',xlabel='Parameter (r)',
+                       ylabel='Box Counting Dimension (D)',xlim=(r1,r2),ylim=(0,1),
+                       r=r_values,dimension=dimension)
+    result.scatter(r_values,dimension,s=50,color='black',marker='o')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+The overlay draws the bifurcation image over the grid of r as graph_logistic does, its rows
+streamed through the image a chunk of steps at a time (see dynamical_systems.render), and the
+box dimensions for their own much smaller grid as range_box_counting_values does (with the
+same perturbation for each r, so the points are the ones it plots). Only the image counts and
+the few orbits for the dimensions are ever held in memory. It returns a Result like the graphs
+above, with the dimensions drawn on a second y axis (see Result.twin).
+
+Each part of the run is marked as a stage (see dynamical_systems.instrument), so wrapping a
+call in profiling() gives the time spent iterating, discarding transients, binning, box
+counting, fitting and drawing, e.g.
+
+    with profiling() as profiler:
+        Overlay_plot(2.8,4,0.2,10000,1000)
+    print(profiler.summary())
+'''
+
+def Overlay_plot(r1,r2,x0,iterations,transients,backend='serial',workers=None,graph=True):
     r_values  = numpy.linspace(r1,r2,1001)
     eps       = 10/(iterations - transients)
     epsilon   = numpy.linspace(0.01,eps,3001)
-    feigenbaum= numpy.array([3.56995])
+    feigenbaum= numpy.array([feigenbaum_constants('logistic')[2]])
     r_param   = numpy.linspace(r1,r2,72)
     parameter = numpy.sort(numpy.concatenate([r_param,feigenbaum]))
-    r_points  = []
-    dimension = []
-    fig,ax1   = plt.subplots()
-    for r in r_values:
-        values = logistic_map_values(r,x0,iterations,transients)
-        ax1.plot(values[0],values[1],"k.", markersize = 0.1, alpha=0.3)
-    for r in parameter:
-        data      = logistic_map_values(r,x0,iterations,transients)[1]
-        r_points.append(r)
-        logN_vals = []
-        loge_vals = []
-        for e in epsilon:
-            logN, loge = box_counting(data,e)
-            logN_vals.append(logN)
-            loge_vals.append(loge)
-        D     = round(numpy.polyfit(loge_vals,logN_vals,1)[0],2)
-        dimension.append(D)
-    ax1.set_xlabel('Parameter r')
-    ax1.set_ylabel('Orbit Value (x)')
-    ax1.set_xlim(r1,r2)
-    ax1.set_ylim(0,1)
-    ax1.tick_params(axis='y', labelcolor='black')
-    ax1.grid(True, which='both', linestyle='--', color='lightgray')
-    ax2 = ax1.twinx()
-    ax2.scatter(r_points,dimension, color='red', s=30, marker='x')
-    ax2.set_ylabel('Box Counting Dimension', color='red')
-    ax2.tick_params(axis='y',labelcolor='red')
-    ax2.set_ylim(0,1)
-    plt.suptitle('Overlay of Logistic Map and Box Dimension at Different Values of r')
-    plt.show()
+    with stage('bifurcation image'):
+        image = bifurcation_image('logistic',r1,r2,x0,iterations,transients+2,len(r_values),800,
+                                  xlim=(0,1),r_values=r_values,perturbation=1e-5,
+                                  backend=backend,workers=workers)
+    r_points  = list(parameter)
+    with stage('box dimension'):
+        dimension = sweep(partial(box_dimensions,'logistic'),parameter,x0,iterations,
+                          transients+2,epsilon,perturbation=1e-5,per_value=True,
+                          backend=backend,workers=workers)
+    dimension = [round(D,2) for D in dimension]
+    boxes     = Result(ylabel='Box Counting Dimension',ylim=(0,1),ycolor='red')
+    boxes.scatter(r_points,dimension,color='red',s=30,marker='x')
+    result    = Result(title='Overlay of Logistic Map and Box Dimension at Different Values of r',
+                       xlabel='Parameter r',ylabel='Orbit Value (x)',xlim=(r1,r2),ylim=(0,1),
+                       grid=dict(which='both',linestyle='--',color='lightgray'),
+                       r=r_points,dimension=dimension,image=image)
+    result.image(image).twin(boxes)
+    if graph is not None:
+        with stage('drawing'):
+            result.draw()
+    if graph is True:
+        plt.show()
+    return result
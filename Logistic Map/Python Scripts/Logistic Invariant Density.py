@@ -1,18 +1,27 @@
 import numpy 
 import matplotlib.pyplot as plt
-import random 
 import seaborn as sns
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.density import invariant_density
+from dynamical_systems.results import Result
+from dynamical_systems.streams import value_stream
+from dynamical_systems.ulam import ulam_density
 
 '''
-define the logistic map and return an array of x values
+return an array of x values of the logistic map (the map itself is in the shared registry),
+with a tolerance the settled part of the orbit is filled in from its cycle
 '''
 
-def logistic(r,x):
-    return r*x*(1-x)
-
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-5
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-5
     x_values   = []
+    if tolerance is not None:
+        return cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
     for i in range(iterations):
         x = logistic(r,x)
         if i > transients:
@@ -26,24 +35,40 @@ each point into a designated bin. To do this, the x points are divided by the qu
 (1/bins) where bins is the number of bins. this number is rounded down or floored so that
 the x point is now a value between 0 and bins and this represents the which bin the x point
 belongs to. To do this, the floor function is used.
+
+The orbit (the same steps as logistic_map_values) is fed into the bins a chunk at a time by
+dynamical_systems.density rather than being stored, so very long orbits use no more memory
+than short ones. x0 can also be an array of starting values, all of whose orbits are binned
+together, and with checkpoint (a file name) a long run is saved as it goes and picked up again
+from the file if it is stopped. Only the occupied bins are plotted.
+
+With method='ulam' no orbit is run at all (iterations, transients and x0 are not used) and
+the density is the stationary distribution of Ulam's transition matrix between the bins (see
+dynamical_systems.ulam), which resolves the bins next to the singularities at 0 and 1 far
+better than an orbit does and takes well under a second for 10^5 bins.
+
+The densities are returned in a Result (see dynamical_systems.results), as result.density. As
+well as True and False the graph switch can be None, in which case nothing is drawn at all.
 '''
 
-def Invariant_Density(r,x0,iterations,transients,bins,graph=True):
-    width     = 1/bins
-    data      = logistic_map_values(r,x0,iterations,transients)
-    x_number  = numpy.floor(numpy.array(data,float)*bins)
-    numbers, totals    = numpy.unique(x_number, return_counts=True)
-    density   = totals/(numpy.sum(totals)*width)
-    x_axis    = (numbers + 0.5) * width
-    plt.scatter(x_axis,density,s=10,color='black',label='Numerical')
-    plt.xlabel('Bins centres')
-    plt.ylabel('Density')
-    plt.title(f'Invariant Measure for r = {r}')
-    plt.xlim(0,1)
-    plt.ylim(0,20)
-    if graph == True:
+def Invariant_Density(r,x0,iterations,transients,bins,graph=True,checkpoint=None,
+                      method='orbit'):
+    if method == 'ulam':
+        counts = ulam_density('logistic',r,bins)
+    else:
+        counts = invariant_density('logistic',r,x0,iterations,transients+2,bins,
+                                   perturbation=1e-5,checkpoint=checkpoint)
+    occupied  = counts.counts > 0
+    density   = counts.density()[occupied]
+    x_axis    = counts.centres()[occupied]
+    result    = Result(title=f'Invariant Measure for r = {r}',xlabel='Bins centres',
+                       ylabel='Density',xlim=(0,1),ylim=(0,20),x=x_axis,density=density)
+    result.scatter(x_axis,density,s=10,color='black',label='Numerical')
+    if graph is not None:
+        result.draw()
+    if graph is True:
         plt.show()
-    return density
+    return result
 
 '''
 next we create a program that will plot 6 different plots with increasing bin numbers to
@@ -58,21 +83,30 @@ def analytical(x):
 def analytical_range(points,graph=True):
     x_range = numpy.linspace(0,1,points)
     y_range = analytical(x_range)
-    plt.scatter(x_range,y_range,s=2,color='red',alpha=0.3,label='Analytical')
-    if graph == True:
+    result  = Result(x=x_range,density=y_range)
+    result.scatter(x_range,y_range,s=2,color='red',alpha=0.3,label='Analytical')
+    if graph is not None:
+        result.draw()
+    if graph is True:
         plt.show()
+    return result
 
-def Analytical_numerical_overlay(r,x0,iterations,transients,bins,points,graph=False):
-    density = Invariant_Density(r,x0,iterations,transients,bins,graph)
-    analytical_range(points,graph)
-    plt.grid(True, which='both',color='grey',linewidth=0.5,linestyle='--')
-    plt.legend()
-    plt.show()
+def Analytical_numerical_overlay(r,x0,iterations,transients,bins,points,graph=True):
+    result     = Invariant_Density(r,x0,iterations,transients,bins,graph=None)
+    analytical = analytical_range(points,graph=None)
+    result.layers += analytical.layers
+    result.data.update(analytical=analytical.density)
+    result.grid   = dict(which='both',color='grey',linewidth=0.5,linestyle='--')
+    result.legend = True
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
     
 '''
-Note that Invariant_Density and analytical_range have a 'switch' (graph==True), that prints
-graph if these are used as stand-alone-functions. If used as part of the Analytical_numberical
-function, this is switched to False or off so that the graphs do output until further
-down the code when needed.
+Note that Invariant_Density and analytical_range have a 'switch' (graph=True), that prints
+graph if these are used as stand-alone-functions. Analytical_numerical_overlay asks both for
+their Results alone (graph=None) and draws their points together as one Result, with the same
+switch for the overlay itself.
 '''
-
@@ -1,6 +1,21 @@
 import numpy
 import matplotlib.pyplot as plt
-import random
+import math
+from functools import partial
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic, logistic_derivative
+from dynamical_systems.adaptive import adaptive_sweep
+from dynamical_systems.cache import OrbitMemo
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.lyapunov import FLOOR, lyapunov_exponents
+from dynamical_systems.orbit import sample_orbits
+from dynamical_systems.plane import lyapunov_plane
+from dynamical_systems.render import BifurcationImage, bifurcation_image
+from dynamical_systems.results import Result
+from dynamical_systems.streams import value_stream
+from dynamical_systems.sweep import sweep
 
 '''
 A program that graphs the logistic map for values of the parameter r between 0 and 4. Above 4
@@ -14,111 +29,170 @@ value indicates that the predictability of the system with tha value of r is les
 to small changes in initial conditions
 '''
 
-#The logistic map
-def logistic(r,x):
-    return r*x*(1-x)
-
-#its derivative
-def logistic_derivative(r,x):
-    return r*(1-2*x)
+#The logistic map and its derivative come from the shared map registry
 
 '''
 calculate the values of the logistical map with an initial x0 and parameter r, only capturing dat
 after removing the transients, we also add a small value to
 the value of x0 as to remove synchronis artifacts as well as taking a random sample before
-plotting. We calculate the exponent using the definition of (1/n)(sum(ln(|f'|)).
+plotting. We calculate the exponent using the definition of (1/n)(sum(ln(|f'|)), keeping only
+a running sum of ln|f'| rather than every value, and clipping |f'| at a tiny floor so that a
+superstable point (f'=0) gives a very negative but finite exponent instead of -inf. The
+perturbation and the sample come from a seeded stream of their own for each r (value_stream
+in dynamical_systems.streams), so the values are the same each run.
+A tolerance stops logistic_map_values once the orbit repeats a cycle to within it, the
+remaining steps being filled in from the cycle (dynamical_systems.cycles).
 '''
 
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-5
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-5
     rawx_values   = []
-    rawr_values   = []
     sample        = int((iterations-transients)/2)
+    if tolerance is not None:
+        orbit = cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
+        return sample_orbits(r,orbit,sample,stream)
     for i in range(iterations):
         x = logistic(r,x)
         if i > transients:
             rawx_values.append(x)
-            rawr_values.append(r)
-    x_values      = random.sample(rawx_values,sample)
-    r_values      = random.sample(rawr_values,sample)
-    return r_values, x_values
+    return sample_orbits(r,numpy.array(rawx_values),sample,stream)
 
 def Lyapunov_value(r,x0,iterations,transients):
-    x          = x0 + random.gauss()*1e-5
-    d_values   = []
+    stream     = value_stream(r)
+    x          = x0 + stream.random()*1e-5
+    total      = 0
     for i in range(iterations):
-        d = numpy.abs(logistic_derivative(r,x))
+        d = abs(logistic_derivative(r,x))
         x = logistic(r,x)
         if i > transients:
-            d_values.append(d)
-    d_array    = numpy.array(d_values)
-    log_d      = numpy.log(d_array)
-    Lyapunov   = sum(log_d)/len(log_d)
+            total += math.log(max(d,FLOOR))
+    Lyapunov   = total/(iterations-transients-1)
     return Lyapunov
+
+'''
+The Lyapunov exponent for a whole array of r at once, stepping every r together and keeping
+one running sum per r so that the memory used does not grow with the number of iterations.
+It returns one exponent per r, averaged over the same steps as Lyapunov_value. The r values
+can be shared out between threads or processes with the backend and workers arguments (see
+dynamical_systems.sweep). With a tolerance (e.g. 1e-10) each r is stopped early once its orbit
+has settled onto a cycle to within it (see dynamical_systems.cycles), so the stable part of the
+range costs little but the exponents differ from the full sums by about the tolerance; the
+default tolerance=None iterates every r to the end.
+'''
+
+def Lyapunov_grid(r_range,x0,iterations,transients,backend='serial',workers=None,
+                  tolerance=None):
+    return sweep(partial(lyapunov_exponents,'logistic'),r_range,x0,iterations-1,transients+1,
+                 perturbation=1e-5,tolerance=tolerance,backend=backend,workers=workers)
             
 '''
 Then we graph the ranges of x as we vary the parameter r and we also grap the Lyapunov
-values over the range of r between 0 and 4.
+values over the range of r between 0 and 4. The bifurcation is drawn as a single image of
+(r,x) pixels shaded by the number of orbit points in each.
 '''
 
-def graph_logistic(r1,r2,x0,iterations,transients):
-    for r in numpy.linspace(r1,r2,1001):
-        values = logistic_map_values(r,x0,iterations,transients)
-        plt.plot(values[0],values[1],"k.", markersize = 0.1,alpha = 0.15)
-    plt.ylim(-1,1)
-    plt.xlim(r1,r2)
-    plt.title('The Logistic Map Transitioning to Chaos')
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Orbit Values (x)')
-    plt.grid(True,which='both',linewidth=0.5,color='grey',linestyle='--')
-    plt.show()
+def graph_logistic(r1,r2,x0,iterations,transients,shading='log',backend='serial',workers=None,
+                   graph=True):
+    image  = bifurcation_image('logistic',r1,r2,x0,iterations,transients+2,width=1001,
+                               perturbation=1e-5,backend=backend,workers=workers)
+    result = Result(title='The Logistic Map Transitioning to Chaos',xlabel='Parameter (r)',
+                    ylabel='Orbit Values (x)',xlim=(r1,r2),ylim=(-1,1),
+                    grid=dict(which='both',linewidth=0.5,color='grey',linestyle='--'),
+                    image=image).image(image,shading)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+Both graphs return a Result (dynamical_systems.results) with the numbers in it. graph=True
+draws and shows it, graph=False only draws it onto the current figure and graph=None gives
+the values alone, ready to be reused or written to a file with result.save().
+
+With adaptive=True the 1001 evenly spaced r values are replaced by budget values placed by an
+adaptive sweep (dynamical_systems.adaptive), which refines only where the exponent changes
+sign or the attractor changes, so the zero crossings and periodic windows are sharp. Otherwise
+tolerance is passed on to Lyapunov_grid.
+'''
+
+def range_lyapunov(r1,r2,x0,iterations,transients,backend='serial',workers=None,graph=True,
+                   adaptive=False,budget=1001,tolerance=None):
+    if adaptive:
+        r_values, values = adaptive_sweep('logistic',r1,r2,x0,iterations-1,transients+1,
+                                          budget=budget,perturbation=1e-5,backend=backend,
+                                          workers=workers)[:2]
+    else:
+        r_values = numpy.linspace(r1,r2,1001)
+        values   = Lyapunov_grid(r_values,x0,iterations,transients,backend,workers,tolerance)
+    result   = Result(title='Lyapunov Values',xlabel='Parameter (r)',
+                      ylabel='Lyapunov Exponent ($\\lambda$)',xlim=(r1,r2),ylim=(-5,1),
+                      grid=dict(which='both'),legend=True,r=r_values,Lyapunov=values)
+    result.line(r_values,values)
+    result.hline(0,color = 'black', linestyle='--',linewidth=0.5)
+    result.hspan(0,1,r1,r2,color='black',alpha=0.1,label='$\\lambda$>0')
+    result.hspan(-5,0,r1,r2,color='red',alpha=0.1,label='$\\lambda$<0')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+The Lyapunov exponent over the plane of r and the initial value x0 rather than along r with x0
+fixed, which shows where the exponent depends on where the orbit starts. The plane is worked
+out in tiles shared between workers (see dynamical_systems.plane) and, given a path, written
+to a single .npy file as it goes. With a tolerance each orbit stops once it has settled as in
+Lyapunov_grid.
+'''
 
-def range_lyapunov(r1,r2,x0,iterations,transients):
-    r_values = []
-    values   = []
-    for r in numpy.linspace(r1,r2,1001):
-        values.append(Lyapunov_value(r,x0,iterations,transients))
-        r_values.append(r)
-    plt.plot(r_values,values)
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Lyapunov Exponent ($\\lambda$)')
-    plt.title('Lyapunov Values')
-    plt.grid(True,which='both')
-    plt.xlim(r1,r2)
-    plt.ylim(-5,1)
-    plt.axhline(0,color = 'black', linestyle='--',linewidth=0.5)
-    plt.axhspan(0,1,r1,r2,color='black',alpha=0.1,label='$\\lambda$>0')
-    plt.axhspan(-5,0,r1,r2,color='red',alpha=0.1,label='$\\lambda$<0')
-    plt.legend()
-    plt.show()
+def Lyapunov_plane(r1,r2,x1,x2,iterations,transients,width=2048,height=2048,path=None,
+                   backend='serial',workers=None,graph=True,tolerance=None):
+    plane  = lyapunov_plane('logistic',r1,r2,x1,x2,None,iterations-1,transients+1,width,
+                            height,perturbation=1e-5,tolerance=tolerance,path=path,
+                            backend=backend,workers=workers)
+    result = Result(title='Lyapunov Values',xlabel='Parameter (r)',ylabel='Initial Value ($x_0$)',
+                    xlim=(r1,r2),ylim=(x1,x2),Lyapunov=plane.values).image(plane)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
-Finally we overlay both the lyapunov and the bifurcation maps on top of each other.
+Finally we overlay both the lyapunov and the bifurcation maps on top of each other. The orbits
+for the grid of r are generated once into an in-memory memo (of at most memory bytes, see
+dynamical_systems.cache.OrbitMemo) and both the exponents and the bifurcation image are then
+taken from the same orbits rather than iterating the map twice. The orbits are kept from step
+transients+1 on: the exponent is averaged over x_n for n = transients+1, ..., iterations-1, the
+same steps as Lyapunov_grid (so the curve is the one range_lyapunov draws), and the image bins
+x_n for n = transients+2, ..., iterations as graph_logistic does. Like the graphs above it
+returns a Result, the exponent being drawn on a second y axis (see Result.twin).
 '''
 
-def Overlay_plot(r1,r2,x0,iterations,transients):
-    lyapunov= []
-    r_values        = []
-    fig,ax1         = plt.subplots()
-    for r in numpy.linspace(r1,r2,1001):
-        values = logistic_map_values(r,x0,iterations,transients)
-        lyapunov.append(Lyapunov_value(r,x0,iterations,transients))
-        r_values.append(values[0])
-        ax1.plot(values[0],values[1],"k.", markersize = 0.1, alpha=0.3)
-    ax1.set_xlabel('Parameter r')
-    ax1.set_ylabel('Orbit Value (x)')
-    ax1.set_xlim(r1,r2)
-    ax1.set_ylim(0,1)
-    ax1.tick_params(axis='y', labelcolor='k')
-    ax1.grid(True, which='both', linestyle='--', color='lightgray')
-    ax2 = ax1.twinx()
-    ax2.plot(r_values,lyapunov, color='tab:blue', linewidth='0.7')
-    ax2.set_ylabel('Lyapunov Exponent', color='tab:blue')
-    ax2.tick_params(axis='y',labelcolor='tab:blue')
-    #ax2.axvline(3.57, color = 'red', linestyle='--', linewidth='0.8', label = 'r =  3.57')
-    ax2.set_ylim(-5,1)
-    ax2.axhspan(0,1,color='black',alpha=0.1,label='$\\lambda$>0')
-    ax2.axhspan(-5,0,color='red',alpha=0.1,label='$\\lambda$<0')
-    plt.suptitle('Overlay of Logistic Map and Lyapunov Exponent at Different Values of r')
-    plt.legend(loc='lower left')
-    plt.show()
+def Overlay_plot(r1,r2,x0,iterations,transients,backend='serial',workers=None,memory=512*2**20,
+                 graph=True):
+    r_values        = numpy.linspace(r1,r2,1001)
+    orbits          = OrbitMemo(memory).orbits('logistic',r_values,x0,iterations,transients+1,
+                                               1e-5,backend=backend,workers=workers)
+    derivative      = numpy.abs(logistic_derivative(r_values[:,None],orbits[:,:-1]))
+    lyapunov        = numpy.log(numpy.maximum(derivative,FLOOR)).mean(axis=1)
+    image           = BifurcationImage(r1,r2,0,1,len(r_values),800)
+    image.add(r_values[:,None],orbits[:,1:])
+    exponent        = Result(ylabel='Lyapunov Exponent',ylim=(-5,1),ycolor='tab:blue',
+                             legend=dict(loc='lower left'))
+    exponent.line(r_values,lyapunov,color='tab:blue',linewidth=0.7)
+    exponent.hspan(0,1,color='black',alpha=0.1,label='$\\lambda$>0')
+    exponent.hspan(-5,0,color='red',alpha=0.1,label='$\\lambda$<0')
+    result          = Result(title='Overlay of Logistic Map and Lyapunov Exponent at Different '
+                             'Values of r',xlabel='Parameter r',ylabel='Orbit Value (x)',
+                             xlim=(r1,r2),ylim=(0,1),
+                             grid=dict(which='both',linestyle='--',color='lightgray'),
+                             r=r_values,Lyapunov=lyapunov,image=image)
+    result.image(image).twin(exponent)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
@@ -1,21 +1,30 @@
 import numpy 
 import matplotlib.pyplot as plt
-import random 
 import seaborn as sns
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.embedding import delay_embedding
+from dynamical_systems.results import Panels, Result
+from dynamical_systems.streams import value_stream
 
 
-#The logistic map
-def logistic(r,x):
-    return r*x*(1-x)
+#The logistic map comes from the shared map registry
 '''
 calculate the values of the logistical map with an initial x0 and parameter r, only capturing dat
 after removing the transients, we also add a small value to
 the value of x0 as to remove synchronis artifacts as well as taking a random sample before
-plotting. 
+plotting. An optional tolerance stops iterating once the orbit has settled onto a cycle (see
+dynamical_systems.cycles).
 '''
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-5
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-5
     x_values   = []
+    if tolerance is not None:
+        return cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
     for i in range(iterations):
         x = logistic(r,x)
         if i > transients:
@@ -27,102 +36,101 @@ We can produce a matrix formed from vectors that consist of iteration steps from
 series. The number of different column vectors is the embedding dimension and the number
 of iterations taken before capturing data points into the column vector is known as the
 time delay, i.e. if m = 2 and t=3 means we construct a matrix with 2 vectors and each
-point within the vectors is 3 steps from the previous
+point within the vectors is 3 steps from the previous. The matrix is a read only view onto the
+orbit (see dynamical_systems.embedding) so no values are copied.
 '''
 def embedded_matrix(m,t,r,x0,iterations,transients):
-    x_data = logistic_map_values(r,x0,iterations,transients)
-    stopper = len(x_data) - m*t
-    matrix = numpy.zeros([stopper,m],float)
-    for i in range(m):
-        column = numpy.array(x_data[i*t:stopper+i*t])
-        matrix[:,i] = column
-    return matrix
+    x_data = numpy.array(logistic_map_values(r,x0,iterations,transients),float)
+    return delay_embedding(x_data,m,t)
 '''
 to begin with, we plot the simple time series against iteration step. The time series
 graph simply returns the 'trajectory' taken by the map and after iterating for N step
 returns the final 50 or so steps as not to overcrowed the graph.
+Each of the plots below returns a Result (see dynamical_systems.results), or Panels for the
+figures of several plots, with the values in it. graph=True draws it and shows it,
+graph=False only draws it (onto the current figure) and graph=None does not draw anything.
 '''
-def time_series_map(r,x0,iterations,transients):
-    data    = logistic_map_values(r,x0,iterations,transients)
-    rvalues = transients + numpy.array(list(range(len(data))))
-    #plt.scatter(rvalues,data,color='red',marker='x',s=2,label=f'r = {r}')
-    plt.plot(rvalues,data,color='red',marker='x',markersize=3,linewidth=0.4,linestyle='--')
-    plt.grid(True, which='both',color='black',linestyle='--',linewidth=0.2)
-    plt.xlabel('Step Number (n)')
-    plt.ylim(0,1)
-    plt.ylabel('X')
-    plt.title(f'Times series of the Logistic Map (r={r})')
-    plt.show()
+def time_series_map(r,x0,iterations,transients,graph=True):
+    data    = numpy.array(logistic_map_values(r,x0,iterations,transients),float)
+    rvalues = transients + numpy.arange(len(data))
+    result  = Result(title=f'Times series of the Logistic Map (r={r})',xlabel='Step Number (n)',
+                     ylabel='X',ylim=(0,1),
+                     grid=dict(which='both',color='black',linestyle='--',linewidth=0.2),
+                     n=rvalues,x=data)
+    result.line(rvalues,data,color='red',marker='x',markersize=3,linewidth=0.4,linestyle='--')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 '''
 Plot a time series for a range of r values and plot them on a 2x3 plot.
 '''
-def compare_TS_2x3_plot(r1,r2,r3,r4,r5,r6,x0,iterations,transients):
-    fig, axes  = plt.subplots(2,3)
-    parameter = [[r1,r2,r3],[r4,r5,r6]]
-    for m in range(2):
-        for n in range(3):
-            data      = logistic_map_values(parameter[m][n],x0,iterations,transients)
-            rvalues   = transients + numpy.array(list(range(len(data))))
-            axes[m][n].plot(rvalues,data,marker='x',linestyle='--',markersize=5,linewidth=0.5)
-            axes[m,n].grid(True,which='both',color='black',linestyle='--',linewidth=0.2)
-            axes[m,n].set_ylim(0,1)
-            axes[m,n].set_title(f'r = {parameter[m][n]}')
-    fig.supxlabel('Iteration Step')
-    fig.supylabel('X value')
-    plt.suptitle('Time Series of the Logistic Map at Different r Values')
-    plt.show()
+def compare_TS_2x3_plot(r1,r2,r3,r4,r5,r6,x0,iterations,transients,graph=True):
+    parameter = [r1,r2,r3,r4,r5,r6]
+    results   = []
+    for r in parameter:
+        data    = numpy.array(logistic_map_values(r,x0,iterations,transients),float)
+        rvalues = transients + numpy.arange(len(data))
+        results.append(Result(title=f'r = {r}',ylim=(0,1),
+                              grid=dict(which='both',color='black',linestyle='--',linewidth=0.2),
+                              n=rvalues,x=data)
+                       .line(rvalues,data,marker='x',linestyle='--',markersize=5,linewidth=0.5))
+    result    = Panels(results,2,3,title='Time Series of the Logistic Map at Different r Values',
+                       xlabel='Iteration Step',ylabel='X value',r=parameter)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
 Next we produce return maps or poincare plots. These graph points X against the next point
 on the trajectory. We also produce a function to do this over multiple values of r
 '''
 
-def two_D_Poincare_plot(t,r,x0,iterations,transients):
+def two_D_Poincare_plot(t,r,x0,iterations,transients,graph=True):
     matrix = numpy.round(embedded_matrix(2,t,r,x0,iterations,transients),3)
-    plt.scatter(matrix[:,0],matrix[:,1],s=5,marker='x',color='black')
-    plt.xlabel('$X_n$')
-    plt.ylabel(rf'$X_{{n+{t}}}$')
-    plt.title('Return Map of the Logistic Map')
-    plt.show()
-    #return matrix
-
-def compare_poincare_plot(m,t,r1,r2,r3,r4,r5,r6,x0,iterations,transients):
-    fig, axes  = plt.subplots(2,3)
-    parameter = [[r1,r2,r3],[r4,r5,r6]]
-    for i in range(2):
-        for n in range(3):
-            matrix = numpy.round(embedded_matrix(m,t,parameter[i][n],x0,iterations,transients),3)
-            axes[i,n].scatter(matrix[:,0],matrix[:,1],s=5,marker='x',color='black')
-            axes[i,n].grid(True,which='both',color='black',linestyle='--',linewidth=0.2)
-            axes[i,n].set_ylim(0,1)
-            axes[i,n].set_title(f'r = {parameter[i][n]}')
-    fig.supxlabel('$X_n$')
-    fig.supylabel(rf'$X_{{n+{t}}}$')
-    plt.suptitle('Poincare plots of the Logistic Map at Different r Values')
-    plt.show()
+    result = Result(title='Return Map of the Logistic Map',xlabel='$X_n$',
+                    ylabel=rf'$X_{{n+{t}}}$',matrix=matrix)
+    result.scatter(matrix[:,0],matrix[:,1],s=5,marker='x',color='black')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+def compare_poincare_plot(m,t,r1,r2,r3,r4,r5,r6,x0,iterations,transients,graph=True):
+    parameter = [r1,r2,r3,r4,r5,r6]
+    results   = []
+    for r in parameter:
+        matrix = numpy.round(embedded_matrix(m,t,r,x0,iterations,transients),3)
+        results.append(Result(title=f'r = {r}',ylim=(0,1),
+                              grid=dict(which='both',color='black',linestyle='--',linewidth=0.2),
+                              matrix=matrix)
+                       .scatter(matrix[:,0],matrix[:,1],s=5,marker='x',color='black'))
+    result    = Panels(results,2,3,title='Poincare plots of the Logistic Map at Different r Values',
+                       xlabel='$X_n$',ylabel=rf'$X_{{n+{t}}}$',r=parameter)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
 a function that takes an embedded matrix and plots the return map for x, x+1t, x+2t... so
 that it can be seen how many steps it takes for the breakdon of accurate predicatability.
 '''
 
-def multiple_time_delay(m,t,r,x0,iterations,transients):
-    matrix = embedded_matrix(m,t,r,x0,iterations,transients)
-    fig,ax = plt.subplots(1,m-1)
-    for i in range(m-1):
-        ax[i].scatter(matrix[:,0],matrix[:,i+1],s=2,color='black')
-        ax[i].set_title(rf'$X_{{n+{i+1}}}$')
-    fig.suptitle('Return Map (time delayed)')
-    fig.supylabel('$X_{{{n+i}}}$')
-    fig.supxlabel('$X_n$')
-    plt.show()
-
-
-
-
-
-
-
-
-
-            
+def multiple_time_delay(m,t,r,x0,iterations,transients,graph=True):
+    matrix  = embedded_matrix(m,t,r,x0,iterations,transients)
+    results = [Result(title=rf'$X_{{n+{i+1}}}$').scatter(matrix[:,0],matrix[:,i+1],s=2,
+                                                        color='black')
+               for i in range(m-1)]
+    result  = Panels(results,1,m-1,title='Return Map (time delayed)',xlabel='$X_n$',
+                     ylabel='$X_{{{n+i}}}$',matrix=matrix)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
@@ -1,21 +1,33 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import random 
 import seaborn as sns
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic, logistic_derivative
+from dynamical_systems.cycles import cycle_orbits, orbit_periods
+from dynamical_systems.lyapunov import FLOOR
+from dynamical_systems.orbit import iterate_orbits
+from dynamical_systems.streams import value_stream
+from dynamical_systems.table import OrbitTable
 
 '''
 Using Pandas to investigate the Logistic Map
 '''
 
 '''
-calculating values for a number of iterations
+calculating values for a number of iterations (stopping early once the orbit has settled onto
+a cycle if a tolerance is given)
 '''
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-5
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-5
     x_values   = []
+    if tolerance is not None:
+        return cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
     for i in range(iterations):
-        x = r*x*(1-x)
+        x = logistic(r,x)
         if i > transients:
             x_values.append(x)
     return x_values
@@ -23,18 +35,20 @@ def logistic_map_values(r,x0,iterations,transients):
 '''
 creates a dataframe using pandas of the lostic map values for a range of r and dispalys in
 wide format (1 column per r value) as well as the running average of 5 iterations
+
+Every r is stepped together by the orbit engine (the same steps as logistic_map_values) and the
+orbits are kept in a single OrbitTable (see dynamical_systems.table), one array of values with
+r stored once per orbit, from which the tall or wide dataframe is made directly, with no
+concatenating or pivoting. shape='table' returns the OrbitTable itself, and dtype=np.float32
+stores the values in half the memory.
 '''
 
-def logistic_dataframe(R_list,x0,iterations,transients,shape='tall'):
-    storage = []
-    for r in R_list:
-        x_values  = logistic_map_values(r,x0,iterations,transients)
-        df        = pd.DataFrame({'Iterations':range(len(x_values)),'r':r,'X':x_values})
-        storage.append(df)
-    dataframe = pd.concat(storage)
-    if shape == 'wide':
-        dataframe = dataframe.pivot(index='Iterations',columns='r',values='X')      
-    return dataframe
+def logistic_dataframe(R_list,x0,iterations,transients,shape='tall',dtype=float):
+    orbits = iterate_orbits('logistic',R_list,x0,iterations,transients+2,1e-5)
+    table  = OrbitTable.from_orbits(R_list,orbits,0,dtype=dtype)
+    if shape == 'table':
+        return table
+    return table.to_pandas(shape)
 
 '''
 create a database that contains an embedded embedded matrix of the Logistic Map for a
@@ -65,16 +79,49 @@ Lyapunov exponent (mean) for each parameter value as a seperate array.
 Input must be of teh 'tall' type or rather the returned form from the function
 logistic_dataframe. The output can be either the wide or tall type but wide will have
 multiindexing.
+
+The columns are worked out on whole numpy columns rather than row by row, chunk rows at a time,
+and the mean for each r is built up from a running sum and count per chunk, so only one chunk
+of temporaries is held at once. |X'| is clipped at FLOOR as in the other Lyapunov functions so
+superstable points do not give -inf. With out_put=None the columns are not added to DF and only
+the exponents are returned.
 '''
 
-def Lyapunov_dataframe(DF,out_put='tall'):
-    DF["X'"] = DF.apply(lambda row: row['r']*(1-2*row['X']), axis=1)
-    DF['Lyapunov'] = DF["X'"].apply(lambda value: np.log(np.abs(value)))
-    exponent = DF.groupby('r')['Lyapunov'].mean()
-    if output == 'tall':
+def Lyapunov_dataframe(DF,out_put='tall',chunk=10**6):
+    derivative = np.empty(len(DF)) if out_put else None
+    lyapunov   = np.empty(len(DF)) if out_put else None
+    total      = None
+    for start in range(0,len(DF),chunk):
+        part  = DF.iloc[start:start+chunk]
+        d     = logistic_derivative(part['r'].to_numpy(float),part['X'].to_numpy(float))
+        l     = np.log(np.maximum(np.abs(d),FLOOR))
+        sums  = pd.Series(l,index=part['r'].to_numpy()).groupby(level=0).agg(['sum','count'])
+        total = sums if total is None else total.add(sums,fill_value=0)
+        if out_put:
+            derivative[start:start+chunk] = d
+            lyapunov[start:start+chunk]   = l
+    exponent = (total['sum']/total['count']).rename('Lyapunov').rename_axis('r')
+    if not out_put:
+        return exponent
+    DF["X'"]       = derivative
+    DF['Lyapunov'] = lyapunov
+    if out_put == 'tall':
         dataframe = DF
-    elif output == 'wide':
+    elif out_put == 'wide':
         DF = DF.pivot(index='Iterations',columns='r',values=["X","X'","Lyapunov"])
         DF = DF.swaplevel(0, 1, axis=1).sort_index(axis=1, level=0)
         dataframe = DF
-    return Dataframe, exponent
+    return dataframe, exponent
+
+'''
+A table of the period of the cycle that the orbit settles onto for each r in R_list, with
+the iteration at which it was seen to settle. Each r stops being iterated as soon as its last
+values repeat to within tolerance (see dynamical_systems.cycles), so a table over a mostly
+stable range is cheap. A period of 0 means the orbit never settled onto a cycle of period at
+most max_period in the given iterations, e.g. because it is chaotic.
+'''
+
+def Period_dataframe(R_list,x0,iterations,tolerance=1e-10,max_period=64):
+    R_list           = np.asarray(R_list,float)
+    periods, settled = orbit_periods('logistic',R_list,x0,iterations,1e-5,tolerance,max_period)
+    return pd.DataFrame({'r':R_list,'Period':periods,'Settled':settled})
@@ -1,84 +1,142 @@
 import numpy
 import matplotlib.pyplot as plt
-import random
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import logistic
+from dynamical_systems.adaptive import adaptive_sweep
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.entropy import entropy_counts, entropy_sweep, shannon_entropy
+from dynamical_systems.orbit import iterate_orbits, sample_orbits
+from dynamical_systems.render import bifurcation_image
+from dynamical_systems.results import Result
+from dynamical_systems.streams import value_stream
 '''
 This is a script that maps the logistic equation for the ranges of r between 0 and 4
 '''
 
-#The logistic map
-def logistic(r,x):
-    return r*x*(1-x)
+#The logistic map comes from the shared map registry
 
 '''
 calculate the values of the logistical map with an initial x0 and parameter r, only capturing dat
 after removing the transients, we also add a small value to
 the value of x0 as to remove synchronis artifacts as well as taking a random sample before
-plotting.
+plotting. Both come from a seeded stream of their own for each r (value_stream in
+dynamical_systems.streams), so the same values are given every time for the same r, and the
+sample is one index selection out of the kept values. Given a
+tolerance, a periodic orbit is only iterated until it has settled and the rest is filled in
+from its cycle.
 '''
 
-def logistic_map_values(r,x0,iterations,transients):
-    x = x0 + random.uniform(0,1)*1e-8
+def logistic_map_values(r,x0,iterations,transients,tolerance=None):
+    stream = value_stream(r)
+    x = x0 + stream.random()*1e-8
     rawx_values   = []
-    rawr_values   = []
     sample        = int((iterations-transients)/2)
+    if tolerance is not None:
+        orbit = cycle_orbits('logistic',r,x,iterations,transients+2,tolerance=tolerance)[0]
+        return sample_orbits(r,orbit,sample,stream)
     for i in range(iterations):
         x = logistic(r,x)
         if i > transients:
             rawx_values.append(x)
-            rawr_values.append(r)
-    x_values = random.sample(rawx_values,sample)
-    r_values = random.sample(rawr_values,sample)
-    return r_values, x_values
+    return sample_orbits(r,numpy.array(rawx_values),sample,stream)
 
 '''
-Then we graph the ranges of x as we vary the parameter r.
+The same values but for a whole array of r at once using the orbit engine, which steps every
+r together. The kept values are the same as logistic_map_values (from step transients+2 up to
+iterations) and the output is a pair of arrays of shape (len(r_range),sample).
 '''
 
-def graph_logistic(r1,r2,x0,iterations,transients):
-    for r in numpy.linspace(r1,r2,1001):
-        values = logistic_map_values(r,x0,iterations,transients)
-        plt.plot(values[0],values[1],"k.", markersize = 0.1,alpha = 0.15)
-    plt.ylim(0,1)
-    plt.xlim(r1,r2)
-    plt.title('The Logistic Map Transitioning to Chaos')
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Orbit Values (x)')
-    plt.grid(True,which='both',linewidth=0.5,color='grey',linestyle='--')
-    plt.show()
+def logistic_map_grid(r_range,x0,iterations,transients):
+    orbits = iterate_orbits('logistic',r_range,x0,iterations,transients+2,perturbation=1e-8)
+    sample = int((iterations-transients)/2)
+    return sample_orbits(r_range,orbits,sample)
 
 '''
-Calculate the Shannon Entropy of the logistic map for a given value of the parameter r
+Then we graph the ranges of x as we vary the parameter r. Rather than plotting every point, the
+points are binned into an image of (r,x) pixels as they are generated and the image is drawn
+once, shaded by the log (or linear) number of points in each pixel.
+
+The graphs here return a Result (see dynamical_systems.results) holding the numbers and how to
+draw them. graph=True draws and shows it, graph=False only draws it onto the current figure,
+graph=None only works it out, e.g. to save it with result.save('bifurcation.png') on a machine
+with no display.
+
+With adaptive=True, as well as one orbit per pixel column, budget more orbits are placed by an
+adaptive sweep (dynamical_systems.adaptive) that starts coarse and fills in around the period
+doublings, the periodic windows and the edges of chaos, so the narrow features are filled in
+within their columns. The columns are then shaded by each pixel's share of its column so the
+extra orbits do not darken them.
+'''
+
+def graph_logistic(r1,r2,x0,iterations,transients,shading='log',backend='serial',workers=None,
+                   graph=True,adaptive=False,budget=1001):
+    r_values = None
+    if adaptive:
+        r_values = adaptive_sweep('logistic',r1,r2,x0,iterations,transients+2,budget=budget,
+                                  perturbation=1e-8,backend=backend,workers=workers)[0]
+        r_values = numpy.union1d(r1 + (numpy.arange(1001)+0.5)*(r2-r1)/1001,r_values)
+        shading  = 'column'
+    image  = bifurcation_image('logistic',r1,r2,x0,iterations,transients+2,width=1001,
+                               r_values=r_values,perturbation=1e-8,backend=backend,
+                               workers=workers)
+    result = Result(title='The Logistic Map Transitioning to Chaos',xlabel='Parameter (r)',
+                    ylabel='Orbit Values (x)',xlim=(r1,r2),ylim=(0,1),
+                    grid=dict(which='both',linewidth=0.5,color='grey',linestyle='--'),
+                    image=image).image(image,shading)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+Rather than running graph_logistic again for every new r1 and r2, explore serves the whole
+diagram as zoomable tiles at http://localhost:port/ (see dynamical_systems.server), each tile
+worked out when it is first looked at and kept on disk for next time.
+'''
+
+def explore(x0=0.2,iterations=2000,transients=500,port=8000,workers=None):
+    from dynamical_systems.server import serve
+    serve('logistic',port=port,x0=x0,iterations=iterations,transients=transients+2,
+          workers=workers)
+
+'''
+Calculate the Shannon Entropy of the logistic map for a given value of the parameter r, from
+every kept value of the orbit (not the random sample plotted above) and with the perturbation
+drawn from the stream of r, so it is the value shannon_entropy_range gives at the same r.
 '''
 
 def logistic_shannon_entropy(r,x,iterations,transients,bins,base='e'):
-    rdata, xdata = logistic_map_values(r,x,iterations,transients)
-    data   = numpy.array(xdata,float)
-    allocation = numpy.floor(data*bins)
-    unique, counts = numpy.unique(allocation, return_counts=True)
-    prob = counts/sum(counts)
-    prob = prob[prob>0]
-    if base == 'e':
-        entropy_i = prob*numpy.log(prob)
-        entropy   = -1*sum(entropy_i)
-    elif base == 2:
-        entropy_i  = prob*numpy.log2(prob)
-        entropy   = -1*sum(entropy_i)
-    return entropy
-
-def shannon_entropy_range(r1,r2,x,iterations,transients,bins,base='e'):
-    r_range = numpy.linspace(r1,r2,2500)
-    r_values = []
-    entropy = []
-    for r in r_range:
-        r_values.append(r)
-        ent  = logistic_shannon_entropy(r,x,iterations,transients,bins,base)
-        entropy.append(ent)
-    plt.scatter(r_values,entropy, marker='.', s=3,color='red')
-    plt.grid(True, which = 'both', linestyle ='--', linewidth=1, color='grey')
-    plt.title(f'Variation of Shannon Entropy for Logistic Map with r for {bins} Bins')
-    plt.xlim(0,4)
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Shannon Entropy')
-    plt.show()
+    return entropy_sweep('logistic',[r],x,iterations,transients+2,bins,base,perturbation=1e-8,
+                         per_value=True)[0]
+
+def entropy_of_values(xdata,bins,base='e'):
+    return shannon_entropy(entropy_counts(xdata,bins),base)
+
+'''
+The entropy for a grid of spacing values of r. Every orbit is binned into one (r, bins) count
+matrix by dynamical_systems.entropy and the entropies are computed from it all at once, using
+every kept value of each orbit rather than a random sample of them, each orbit perturbed as for
+logistic_shannon_entropy. The r values can be shared out between threads or processes with the
+backend and workers arguments.
+'''
+
+def shannon_entropy_range(r1,r2,x,iterations,transients,bins,base='e',spacing=2500,
+                          backend='serial',workers=None,graph=True):
+    r_values = numpy.linspace(r1,r2,spacing)
+    entropy  = entropy_sweep('logistic',r_values,x,iterations,transients+2,bins,base,
+                             perturbation=1e-8,per_value=True,backend=backend,workers=workers)
+    result   = Result(title=f'Variation of Shannon Entropy for Logistic Map with r for {bins} Bins',
+                      xlabel='Parameter (r)',ylabel='Shannon Entropy',xlim=(r1,r2),
+                      grid=dict(which='both',linestyle='--',linewidth=1,color='grey'),
+                      r=r_values,entropy=entropy)
+    result.scatter(r_values,entropy,marker='.',s=3,color='red')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
         
@@ -1,38 +1,59 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from functools import partial
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','..'))
+from dynamical_systems.maps import sine, sine_derivative
+from dynamical_systems.adaptive import adaptive_sweep
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.density import invariant_density
+from dynamical_systems.embedding import delay_embedding
+from dynamical_systems.lyapunov import FLOOR, lyapunov_exponents
+from dynamical_systems.orbit import iterate_orbits
+from dynamical_systems.render import bifurcation_image
+from dynamical_systems.results import Panels, Result
+from dynamical_systems.sweep import sweep
+from dynamical_systems.ulam import ulam_density
 
 '''
 The sine map is another 1d map that exhibits chaotic behaviour. the discrete map is iterated
-through the function rsin(pi*x) for xE [0,1] and rE [0,1]. We also define the derivative for
-the Lyapunov exponents
+through the function rsin(pi*x) for xE [0,1] and rE [0,1]. The map and the derivative for
+the Lyapunov exponents are the 'sine' entry of the shared map registry
 '''
 
-def sin_map(r,x):
-    return r*(np.sin(np.pi*x))
-
-def sin_derivative(r,x):
-    return r*np.pi*(np.cos(np.pi*x))
+sin_map        = sine
+sin_derivative = sine_derivative
 
 '''
 Next is to then to create a dataframe that stores a number of iterations, discarding
 transients  and outputs the orbit values as well as the lyapunov exponent at each x value
 and also the time-delay embedded matrix for t time delays columns. The time delay value
 is set to 1 by default, meaning if no chaning in argument tau, the function will
-automatically output X(n+1) values only. This will be the backbone of further functions
-for graphing
-'''
-
-def Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True):
-    raw_steps    = []
-    raw_x_values = []
-    Insta_Lya    = []
-    for i in range(iterations+1):
-        raw_steps.append(i)
-        raw_x_values.append(x)
-        wip = np.log(np.abs(sin_derivative(r,x)))
-        Insta_Lya.append(wip)
-        x = sin_map(r,x)
+automatically output X(n+1) values only. The delayed columns come from a delay embedding of
+the orbit (a strided view onto it, see dynamical_systems.embedding) rather than looking up
+each delayed value one at a time. This will be the backbone of further functions for graphing
+With a tolerance the orbit is stopped once it has settled onto a cycle and the remaining steps
+are filled in from the cycle (see dynamical_systems.cycles.cycle_orbits), with the exponent
+column then worked out on the whole orbit at once.
+'''
+
+def Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True,tolerance=None):
+    if tolerance is not None:
+        raw_steps    = np.arange(iterations+1)
+        raw_x_values = cycle_orbits('sine',r,x,iterations,0,tolerance=tolerance)[0]
+        Insta_Lya    = np.log(np.maximum(np.abs(sin_derivative(r,raw_x_values)),FLOOR))
+    else:
+        raw_steps    = []
+        raw_x_values = []
+        Insta_Lya    = []
+        for i in range(iterations+1):
+            raw_steps.append(i)
+            raw_x_values.append(x)
+            wip = np.log(max(np.abs(sin_derivative(r,x)),FLOOR))
+            Insta_Lya.append(wip)
+            x = sin_map(r,x)
     if remove == True:
         steps    = raw_steps[transients:]
         x_values = raw_x_values[transients:]
@@ -41,135 +62,157 @@ def Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True):
         steps    = raw_steps
         x_values = raw_x_values
         Lyapunov = Insta_Lya
-    data = pd.DataFrame({'Iterations':steps,'Lyapunov':Lyapunov,'r':r,'X_n':x_values})
+    data   = pd.DataFrame({'Iterations':steps,'Lyapunov':Lyapunov,'r':r,'X_n':x_values})
+    matrix = delay_embedding(data['X_n'].to_numpy(),tau+1)
+    data   = data.iloc[:len(matrix)].copy()
     for t in range(1,1+tau):
-        column = []
-        for L in range(len(data)):
-            try:
-                column.append(data['X_n'].iloc[L+t])
-            except IndexError:
-                column.append(None)
-        data[f'X_n+{t}'] = column
-    data = data.dropna()
+        data[f'X_n+{t}'] = matrix[:,t]
     return data
 
 '''
-Creating a time series graph
+Creating a time series graph. It and the figures of several time series and of return maps
+below return a Result (or Panels, see dynamical_systems.results) with the values in it, drawn
+onto the current figure unless graph=None and shown only with graph=True.
 '''
 
-def time_series(r,x,iterations,transients):
-    data = Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True)
-    plt.plot(data['Iterations'],data['X_n'],color='black',marker='x',linewidth=0.5,linestyle='--')
-    plt.title("Time Series for Sine Map")
-    plt.xlabel('Time Step')
-    plt.ylabel('Orbit Values')
-    plt.show()
+def time_series(r,x,iterations,transients,graph=True):
+    data   = Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True)
+    result = Result(title="Time Series for Sine Map",xlabel='Time Step',ylabel='Orbit Values',
+                    data=data)
+    result.line(data['Iterations'],data['X_n'],color='black',marker='x',linewidth=0.5,
+                linestyle='--')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
 Create a figure that has 5 time series plots (2x3) each with a different values of r. The
 5 values of r used must be in the form of a list and inputed as r_list.
 '''
 
-def time_series_multiple(r_list,x,iterations,transients):
-    fig,ax = plt.subplots(5)
-    for i, r in enumerate(r_list):
+def time_series_multiple(r_list,x,iterations,transients,graph=True):
+    results = []
+    for r in r_list:
         data = Sin_embedded_matrix(r,x,iterations,transients,tau=1,remove=True)
-        ax[i].plot(data['Iterations'],data['X_n'],color='black',marker='x',linewidth=0.5,
-                   linestyle='--',label=f'r={r}')
-        ax[i].set_ylim(0,1)
-        ax[i].set_xlim(transients,iterations-1)
-        ax[i].legend()
-        ax[i].grid(True, which='both',linestyle='--',linewidth=0.7,color='grey')
-        if i != 4:
-            ax[i].tick_params(axis='x', labelbottom=False)
-    plt.suptitle('Time Series for Sine Map')
-    plt.xlim(transients,iterations-1)
-    fig.supxlabel('Time Step')
-    fig.supylabel('$X_n$')
-    plt.show()
-
-'''
-Create a bifurcation diagram for the Sine map
-'''
-
-def sine_bifurcation(r1,r2,x,iterations,transients):
-    r_values = np.linspace(r1,r2,1200)
-    for r in r_values:       
-        data = Sin_embedded_matrix(r,x,iterations,transients)
-        plt.scatter(data['r'],data['X_n'],s=0.6,color='black',alpha=0.05)
-    plt.title('Sine Map Bifurcation')
-    plt.xlabel('Parameter (r)')
-    plt.xlim(0,1)
-    plt.ylabel('Orbit Values (x)')
-    plt.ylim(0,1)
-    plt.show()
+        results.append(Result(xlim=(transients,iterations-1),ylim=(0,1),legend=True,
+                              grid=dict(which='both',linestyle='--',linewidth=0.7,color='grey'),
+                              data=data)
+                       .line(data['Iterations'],data['X_n'],color='black',marker='x',
+                             linewidth=0.5,linestyle='--',label=f'r={r}'))
+    result  = Panels(results,len(results),1,title='Time Series for Sine Map',xlabel='Time Step',
+                     ylabel='$X_n$',sharex=True,r=list(r_list))
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+Create a bifurcation diagram for the Sine map, binned into a single image of (r,x) pixels. The
+r values can be shared out between threads or processes with backend and workers (see
+dynamical_systems.sweep), as can those of the Lyapunov sweep below. Like the Lyapunov and
+density graphs it gives back a Result (dynamical_systems.results), drawn unless graph=None and
+shown only with graph=True.
+'''
+
+def sine_bifurcation(r1,r2,x,iterations,transients,shading='log',backend='serial',workers=None,
+                     graph=True):
+    image  = bifurcation_image('sine',r1,r2,x,iterations,transients,width=1200,backend=backend,
+                               workers=workers)
+    result = Result(title='Sine Map Bifurcation',xlabel='Parameter (r)',ylabel='Orbit Values (x)',
+                    xlim=(0,1),ylim=(0,1),image=image).image(image,shading)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
     
 '''
-Claculating Lyapunov exponent over range r1 to r2
+Claculating Lyapunov exponent over range r1 to r2. Every r is stepped together and only a
+running sum of ln|f'(x)| is kept per r, so no orbit or per step column is stored. With
+adaptive=True the space values of r are not evenly spaced but placed where the exponent
+changes sign or the attractor changes (see dynamical_systems.adaptive). Otherwise, given a
+tolerance (e.g. 1e-10), each r stops early once its orbit has settled onto a cycle to within it
+(see dynamical_systems.cycles); the default tolerance=None iterates every r to the end.
 '''
 
-def Lyapunov(r1,r2,space,x,iterations,transients):
-    lambdaa = []
-    r_parameter = []
-    r_values = np.linspace(r1,r2,space)
-    for r in r_values:
-        r_parameter.append(r)
-        data = Sin_embedded_matrix(r,x,iterations,transients)
-        wip = data.groupby('r')['Lyapunov'].mean()
-        lambdaa.append(float(wip.iloc[0])) 
-    plt.scatter(r_parameter,lambdaa,s=1.1,color='red')
-    plt.grid(True,which='both',color='grey',linewidth=1,linestyle='--')
-    plt.axhline(0, color='black', linewidth = 0.7)
-    plt.xlabel('Parameter (r)')
-    plt.xlim(r1,r2)
-    plt.ylabel('$\lambda$')
-    plt.ylim(-4,1)
-    plt.title('Variation of Lyapunov Exponent with r')
-    plt.show()
+def Lyapunov(r1,r2,space,x,iterations,transients,backend='serial',workers=None,graph=True,
+             adaptive=False,tolerance=None):
+    if adaptive:
+        r_parameter, lambdaa = adaptive_sweep('sine',r1,r2,x,iterations-1,transients,
+                                              budget=space,backend=backend,workers=workers)[:2]
+    else:
+        r_parameter = np.linspace(r1,r2,space)
+        lambdaa     = sweep(partial(lyapunov_exponents,'sine'),r_parameter,x,iterations-1,
+                            transients,tolerance=tolerance,backend=backend,workers=workers)
+    result      = Result(title='Variation of Lyapunov Exponent with r',xlabel='Parameter (r)',
+                         ylabel='$\lambda$',xlim=(r1,r2),ylim=(-4,1),
+                         grid=dict(which='both',color='grey',linewidth=1,linestyle='--'),
+                         r=r_parameter,Lyapunov=lambdaa)
+    result.scatter(r_parameter,lambdaa,s=1.1,color='red')
+    result.hline(0, color='black', linewidth = 0.7)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
 
 '''
-Creating return maps
+Creating return maps, plotted straight from a delay embedding view of the orbit
 '''
 
-def return_maps(r,x,iterations,transients,tau=1,remove=True):
-    data = Sin_embedded_matrix(r,x,iterations,transients,tau=tau)
+def return_maps(r,x,iterations,transients,tau=1,remove=True,graph=True):
+    orbit  = iterate_orbits('sine',r,x,iterations,transients if remove else 0)
+    matrix = delay_embedding(orbit,tau+1)
     if tau == 1:
-        plt.scatter(data['X_n'],data['X_n+1'],s=1,color='black',alpha=0.5)
-        plt.show()
+        result = Result(matrix=matrix).scatter(matrix[:,0],matrix[:,1],s=1,color='black',
+                                               alpha=0.5)
     else:
-        fig,ax = plt.subplots(1,tau)
-        for t in range(tau):
-            ax[t].scatter(data['X_n'],data[f'X_n+{t+1}'],s=1,color='black',alpha=0.5)
-            ax[t].set_title(f't = {t+1}')
-        fig.suptitle('Return Maps for the Sine Map')
-        fig.supylabel('$X_{n+t}$')
-        fig.supxlabel('$X_n$')
+        result = Panels([Result(title=f't = {t+1}').scatter(matrix[:,0],matrix[:,t+1],s=1,
+                                                             color='black',alpha=0.5)
+                         for t in range(tau)],1,tau,title='Return Maps for the Sine Map',
+                        xlabel='$X_n$',ylabel='$X_{n+t}$',matrix=matrix)
+    if graph is not None:
+        result.draw()
+    if graph is True:
         plt.show()
+    return result
 
 '''
-Calculating the Invariant density of the sine map
+Calculating the Invariant density of the sine map. The orbit is binned a chunk at a time as it
+is generated (see dynamical_systems.density) rather than first being put in a dataframe, so
+long orbits use no more memory than short ones. x can be an array of starting values whose
+orbits are all binned together and checkpoint names a file to save a long run to and pick it
+up again from. method='ulam' takes the density from Ulam's transition matrix between the bins
+instead of an orbit (see dynamical_systems.ulam), which follows the edges of the density much
+more closely.
 '''
 
 def sine_invariant(x):
     Pi = np.pi
     return 1/(Pi*np.sqrt(x*(1-x)))
 
-def sine_invariant_density(r,x,iterations,transients,bins):
-    width = 1/bins
-    data      = Sin_embedded_matrix(r,x,iterations,transients)['X_n']
-    x_number  = np.floor(np.array(data,float)*bins)
-    numbers, totals    = np.unique(x_number, return_counts=True)
-    density   = totals/(np.sum(totals)*width)
-    x_axis    = (numbers + 0.5) * width
+def sine_invariant_density(r,x,iterations,transients,bins,checkpoint=None,graph=True,
+                           method='orbit'):
+    if method == 'ulam':
+        counts = ulam_density('sine',r,bins)
+    else:
+        counts = invariant_density('sine',r,x,iterations-1,transients,bins,
+                                   checkpoint=checkpoint)
+    occupied  = counts.counts > 0
+    density   = counts.density()[occupied]
+    x_axis    = counts.centres()[occupied]
     x_range   = np.linspace(0,1,bins)
-    y_range   = [sine_invariant(x) for x in x_range]
-    plt.scatter(x_axis,density,s=1,color='black',label='Numerical',alpha=0.6
-                )
-    plt.xlabel('Bins centres')
-    plt.ylabel('Density')
-    plt.title(f'Invariant Measure for r = {r}')
-    plt.xlim(0,1)
-    plt.ylim(0,15)
-    plt.plot(x_range,y_range,linewidth=1,color='red',label='Analytical')
-    plt.legend()
-    plt.show()
+    y_range   = sine_invariant(x_range)
+    result    = Result(title=f'Invariant Measure for r = {r}',xlabel='Bins centres',
+                       ylabel='Density',xlim=(0,1),ylim=(0,15),legend=True,x=x_axis,
+                       density=density,analytical=y_range)
+    result.scatter(x_axis,density,s=1,color='black',label='Numerical',alpha=0.6)
+    result.line(x_range,y_range,linewidth=1,color='red',label='Analytical')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
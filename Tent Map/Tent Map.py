@@ -1,20 +1,35 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import random
-import pandas as pd
+from functools import partial
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+from dynamical_systems.maps import skew_tent_map, tent
+from dynamical_systems.cache import OrbitMemo
+from dynamical_systems.cycles import cycle_orbits
+from dynamical_systems.density import invariant_density
+from dynamical_systems.embedding import delay_embedding
+from dynamical_systems.entropy import entropy_counts, entropy_sweep, shannon_entropy
+from dynamical_systems.lyapunov import lyapunov_exponents
+from dynamical_systems.orbit import iterate_orbits
+from dynamical_systems.plane import lyapunov_plane
+from dynamical_systems.render import bifurcation_image
+from dynamical_systems.results import Panels, Result
+from dynamical_systems.sweep import sweep
+from dynamical_systems.table import OrbitTable
+from dynamical_systems.ulam import ulam_density
 
 '''
 First we map the tent function essentially for 1 time step and as a function of the
 initial value of x. The tent map has the form of if x<0.5 then T(x) = rx and if
 x>0.5 then T(x) = r(1-x) with the parameter being [0,2] and the domain [0,1]. The first
-function is essentially 1 iteration within a time series.
+function is essentially 1 iteration within a time series. The array-safe version (and its
+derivative) lives in the shared map registry as 'tent' so the orbit engine can step every r
+together.
 '''
 
-def Tent(r,x):
-    if x <0.5:
-        return r*x
-    else:
-        return r*(1-x)
+Tent = tent
 
 '''
 next we then output an array of values for the orbit or iterations of the tent map for
@@ -23,127 +38,178 @@ iterations and remove a number of transients to let any periodic behaviour to em
 Lyapunov exponent is just ln|r| at each x, we also calulate this for the given r. The
 input of the function is the parameter, the initial value, the number of time steps and
 the number of transients to remove. The removal of transients is automatic and the output
-will be a pandas database that has iterations numbered from n=transients+1 and its values.
-This is set by remove= True. If you would like to retain the transients in the output, the
-remove argument must be set to False.
+has iterations numbered from n=transients and its values. This is set by remove= True. If you
+would like to retain the transients in the output, the remove argument must be set to False.
+
+The output is an OrbitTable (see dynamical_systems.table): the x values in one array (of
+dtype, float32 halves it again) with r and the exponent stored once rather than on every row.
+table.values is the orbit and table.to_pandas() gives the old dataframe with the Iterations,
+r, X_n and Lyapunov columns. r can also be an array of values, whose orbits are then all
+stepped together by the orbit engine and kept in the one table. With a tolerance the orbits
+come from the cycle detector instead (dynamical_systems.cycles.cycle_orbits): each stops
+once it has settled, as every orbit with r below 1 does, and the rest is its cycle repeated.
 '''
 
-def Tent_values(r,x,iterations,transients,remove = True):
-    raw_steps    = []
+def Tent_values(r,x,iterations,transients,remove = True,dtype=float,tolerance=None):
+    first = transients if remove == True else 0
+    if tolerance is not None:
+        orbits = cycle_orbits('tent',r,x,iterations,first,tolerance=tolerance)[0]
+        return OrbitTable.from_orbits(r,orbits,first,np.log(r),dtype,'X_n')
+    if np.ndim(r):
+        orbits = iterate_orbits('tent',r,x,iterations,first)
+        return OrbitTable.from_orbits(r,orbits,first,np.log(r),dtype,'X_n')
     raw_x_values = []
     for i in range(iterations+1):
-        raw_steps.append(i)
         raw_x_values.append(x)
-        x = Tent(r,x)
-    if remove == True:
-        steps    = raw_steps[transients:]
-        x_values = raw_x_values[transients:]
-    else:
-        steps    = raw_steps
-        x_values = raw_x_values
-    data = pd.DataFrame({'Iterations':steps,'r':r,'X_n':x_values, 'Lyapunov':np.log(r)})   
-    return data
+        x = r*x if x < 0.5 else r*(1-x)    #scalar form of Tent, much faster for one r
+    return OrbitTable.from_orbits(r,raw_x_values[first:],first,np.log(r),dtype,'X_n')
     
 '''
 Now we iterate the map for many values of r between 0 and 2, then plot the x values as a
 function of r using the Tent_values() function. This will be the bifurcation map and we
 also graph the Lyapunov exponent using Tent_Lyapunov(). Both need the Tent_values function
-and produce graphs for a specified r range and number of r points in that range.
+and produce graphs for a specified r range and number of r points in that range. The
+bifurcation points are binned into an image with one pixel column per r value and drawn once,
+shaded by the log (or linear) number of points per pixel. The r values can be shared out
+between threads or processes with the backend and workers arguments (see
+dynamical_systems.sweep). For the exponent, given a tolerance (e.g. 1e-10), each r stops early
+once its orbit has settled onto a cycle to within it (see dynamical_systems.cycles), as every r
+below 1 soon does; by default (tolerance=None) every r is iterated to the end.
+
+Both return a Result (dynamical_systems.results) with the values in it. graph=True draws it on
+ax with its titles and shows it, graph=False only draws the points on ax (for overlays) and
+graph=None does not draw anything.
 '''
 
-def Tent_bifurcation(r1,r2,x,iterations,transients,spacing,remove = True,graph=True,ax=None):
+def Tent_bifurcation(r1,r2,x,iterations,transients,spacing,remove = True,graph=True,ax=None,
+                     shading='log',backend='serial',workers=None,cache=None):
     r_range = np.linspace(r1,r2,spacing)
-    if ax == None:
-        ax = plt.gca()
-    for r in r_range:
-        data = Tent_values(r,x,iterations,transients,remove=True)
-        ax.scatter(data['r'],data['X_n'],color = 'black',s=0.3,alpha=0.1)
-    if graph == True:
-        plt.title('Tent Map Bifurcation')
-        plt.xlabel('Parameter Value (r)')
-        plt.xlim(r1,r2)
-        plt.ylabel('Orbit Value (x)')
-        plt.ylim(0,1)
-        plt.grid(True,which='both',linestyle='--',color='grey',linewidth=0.7)
+    image   = bifurcation_image('tent',r1,r2,x,iterations,transients if remove else 0,
+                                width=spacing,r_values=r_range,cache=cache,backend=backend,
+                                workers=workers)
+    result  = Result(title='Tent Map Bifurcation',xlabel='Parameter Value (r)',
+                     ylabel='Orbit Value (x)',xlim=(r1,r2),ylim=(0,1),
+                     grid=dict(which='both',linestyle='--',color='grey',linewidth=0.7),
+                     r=r_range,image=image).image(image,shading)
+    if graph is not None:
+        result.draw(ax,decorate=graph)
+    if graph is True:
         plt.show()
+    return result
 
-def Tent_Lyapunov(r1,r2,x,iterations,transients,spacing,remove=True,graph=True,ax=None):
-    r_range = np.linspace(r1,r2,spacing)
-    if ax == None:
-        ax = plt.gca()
-    for r in r_range:
-        data = Tent_values(r,x,iterations,transients,remove=True)
-        ax.scatter(data['r'],data['Lyapunov'],color = 'red',s=0.4,alpha=0.5)
-    if graph == True:
-        plt.title('Tent Lyapunov Values')
-        plt.xlabel('Parameter Value (r)')
-        plt.grid(True, which='both', linestyle='--',color='grey',linewidth=0.8)
-        plt.axhline(0,r1,r2,color='black',linewidth=1,linestyle='--')
-        plt.axvline(1,-7,1,color='black',linewidth=1,linestyle='--')
-        plt.xlim(r1,r2)
-        plt.ylabel('λ')
-        plt.ylim(-7,1)
+#the same diagram served as zoomable tiles at http://localhost:port/ (dynamical_systems.server)
+def Tent_explore(x,iterations,transients,port=8000,workers=None):
+    from dynamical_systems.server import serve
+    serve('tent',port=port,x0=x,iterations=iterations,transients=transients,workers=workers)
+
+def Tent_Lyapunov(r1,r2,x,iterations,transients,spacing,remove=True,graph=True,ax=None,
+                  backend='serial',workers=None,cache=None,tolerance=None):
+    r_range  = np.linspace(r1,r2,spacing)
+    Lyapunov = sweep(partial(lyapunov_exponents,'tent'),r_range,x,iterations,
+                     transients if remove else 0,cache=cache,tolerance=tolerance,
+                     backend=backend,workers=workers)
+    result   = Result(title='Tent Lyapunov Values',xlabel='Parameter Value (r)',ylabel='λ',
+                      xlim=(r1,r2),ylim=(-7,1),
+                      grid=dict(which='both',linestyle='--',color='grey',linewidth=0.8),
+                      r=r_range,Lyapunov=Lyapunov)
+    result.scatter(r_range,Lyapunov,color = 'red',s=0.4,alpha=0.5)
+    result.hline(0,r1,r2,color='black',linewidth=1,linestyle='--')
+    result.vline(1,-7,1,color='black',linewidth=1,linestyle='--')
+    if graph is not None:
+        result.draw(ax,decorate=graph)
+    if graph is True:
+        plt.show()
+    return result
+
+'''
+The Lyapunov exponent over the plane of r and the position a of the peak, for the skew tent
+map (r x/(2a) left of the peak, r(1-x)/(2(1-a)) right of it, which is the tent map at a=0.5).
+The plane is worked out in tiles shared between workers and written into a single .npy file at
+path if one is given (see dynamical_systems.plane), and drawn red where the map is chaotic and
+blue where it is not.
+'''
+
+def Tent_Lyapunov_plane(r1,r2,a1,a2,x,iterations,transients,width=2048,height=2048,path=None,
+                        graph=True,ax=None,backend='serial',workers=None):
+    plane  = lyapunov_plane(skew_tent_map,r1,r2,a1,a2,x,iterations,transients,width,height,
+                            y='parameter',perturbation=1e-6,path=path,backend=backend,
+                            workers=workers)
+    result = Result(title='Skew Tent Lyapunov Values',xlabel='Parameter Value (r)',
+                    ylabel='Peak Position (a)',xlim=(r1,r2),ylim=(a1,a2),
+                    Lyapunov=plane.values).image(plane)
+    if graph is not None:
+        result.draw(ax,decorate=graph)
+    if graph is True:
         plt.show()
+    return result
 
 '''
 using both the Tent_Lyapunov and Tent_bifurcation function, we can overlay the two on the
-same graph
-'''
-
-def Tent_overlay_1(r1,r2,x,iterations,transients,spacing,remove=True,graph=False):
-    fig, ax1 = plt.subplots()
-    ax2 = ax1.twinx()
-    Tent_bifurcation(r1,r2,x,iterations,transients,spacing,remove=True,graph=False,ax=ax2)
-    Tent_Lyapunov(r1,r2,x,iterations,transients,spacing,remove=True,graph=False,ax=ax1)
-    ax1.set_xlim(0,2)
-    ax1.set_ylim(-2,0.7)
-    ax1.grid(True,which='both',linestyle='--',color='grey',linewidth=0.7)
-    ax1.set_xlabel('Parameter (r)')
-    ax2.set_ylabel('Orbit values (X)')
-    ax2.set_ylim(0,1)
-    ax1.set_ylabel('Lyapunov exponent')
-    ax1.axhline(0,linestyle='--',color='black',linewidth=1)
-    plt.suptitle('Comparing Lyapunov Exponent to Bifurcation')
-    plt.show()
+same graph. The orbits are generated once into an in-memory memo (at most memory bytes, see
+dynamical_systems.cache.OrbitMemo) which both functions then read from, and the exponent and
+the bifurcation image are put in one Result with the image on a second y axis (see
+Result.twin), so the graph switch works as for the two on their own.
+'''
+
+def Tent_overlay_1(r1,r2,x,iterations,transients,spacing,remove=True,graph=True,ax=None,
+                   backend='serial',workers=None,memory=512*2**20):
+    memo = OrbitMemo(memory)
+    memo.orbits('tent',np.linspace(r1,r2,spacing),x,iterations,transients,backend=backend,
+                workers=workers)
+    bifurcation = Tent_bifurcation(r1,r2,x,iterations,transients,spacing,remove=True,graph=None,
+                                   cache=memo)
+    Lyapunov    = Tent_Lyapunov(r1,r2,x,iterations,transients,spacing,remove=True,graph=None,
+                                cache=memo)
+    result = Result(title='Comparing Lyapunov Exponent to Bifurcation',xlabel='Parameter (r)',
+                    ylabel='Lyapunov exponent',xlim=(0,2),ylim=(-2,0.7),
+                    grid=dict(which='both',linestyle='--',color='grey',linewidth=0.7),
+                    r=Lyapunov.r,Lyapunov=Lyapunov.Lyapunov,image=bifurcation.data['image'])
+    result.layers = Lyapunov.layers
+    result.hline(0,linestyle='--',color='black',linewidth=1)
+    result.twin(Result(ylabel='Orbit values (X)',ylim=(0,1)).image(bifurcation.data['image']))
+    if graph is not None:
+        result.draw(ax,decorate=graph)
+    if graph is True:
+        plt.show()
+    return result
 
 '''
 Return maps are useful for looking at the geometry of the orbits of the map. We use a
 dataframe created from Tent_values as a generator within the function and then we
 append the number of columns for the number of time delay i.e t=1,2,3....
-We then tidy up the dataframe using pandas method of dropna(). this results in the
-dataframe being shorter in rows by t rows, where t is the number of time delayed columns.
-The output is an embedded matrix which is used to produce return maps of differing time
-delays
+The delayed columns are taken from a delay embedding of the orbit (a strided view, so no
+values are copied until they are put in the dataframe). The dataframe is shorter in rows by t
+rows, where t is the number of time delayed columns. The output is an embedded matrix which is
+used to produce return maps of differing time delays. The return map itself plots straight
+from the delay embedding view without building the dataframe, and returns the panels of the
+figure (dynamical_systems.results.Panels) with the embedding in them, drawn as above only if
+graph is not None and shown if it is True.
 '''
 
 def embedded_matrix(r,x,tau,iterations,transients,remove = True):
-    data = Tent_values(r,x,iterations,transients,remove=True)
+    table  = Tent_values(r,x,iterations,transients,remove=True)
+    matrix = delay_embedding(table.values,tau+1)
+    data   = table.to_pandas().iloc[:len(matrix)].copy()
     for t in range(1,1+tau):
-        column = []
-        for L in range(len(data)):
-            try:
-                column.append(data['X_n'].iloc[L+t])
-            except IndexError:
-                column.append(None)
-        data[f'X_n+{t}'] = column
+        data[f'X_n+{t}'] = matrix[:,t]
     wip = data.pop('Lyapunov')
     data['Lyapunov'] = wip
-    data = data.dropna()
     return data
 
-def Tent_return_map(r,x,tau,iterations,transients,remove=True):
-    data = embedded_matrix(r,x,tau,iterations,transients)
-    fig,ax = plt.subplots(1,tau)
-    for t in range(tau):
-        ax[t].scatter(data[f'X_n'],data[f'X_n+{t+1}'],s=0.5,color='black',alpha=0.9)
-        ax[t].grid(True, which='both', linestyle='--', color = 'grey', linewidth=0.5)
-        ax[t].set_xlim(0,1)
-        ax[t].set_ylabel(f'$X_{{n+{t+1}}}$')
-        ax[t].set_ylim(0,1)
-        ax[t].set_title(f'τ = {t+1}')
-    fig.suptitle(f'Return Maps for Tent Map up to τ = {tau}')
-    fig.supxlabel('$X_n$')
-    plt.show()
+def Tent_return_map(r,x,tau,iterations,transients,remove=True,graph=True):
+    orbit   = Tent_values(r,x,iterations,transients,remove=True).values
+    matrix  = delay_embedding(orbit,tau+1)
+    results = [Result(title=f'τ = {t+1}',ylabel=f'$X_{{n+{t+1}}}$',xlim=(0,1),ylim=(0,1),
+                      grid=dict(which='both',linestyle='--',color='grey',linewidth=0.5))
+               .scatter(matrix[:,0],matrix[:,t+1],s=0.5,color='black',alpha=0.9)
+               for t in range(tau)]
+    result  = Panels(results,1,tau,title=f'Return Maps for Tent Map up to τ = {tau}',
+                     xlabel='$X_n$',matrix=matrix)
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
             
 '''
 Calculating the invariant density by first removing transients, then dividing the domain [0,1]
@@ -151,56 +217,58 @@ into a number of spacings or bins and allocating each point into one of the bins
 multipling the data points by number of bins, then using floor function to allocate them.
 Then we calculate the probability by dividing the total number in each bin by the total
 number of data points and finally multiplying by bin width to get probability density.
+The orbit is binned a chunk at a time as it is generated (see dynamical_systems.density) so
+it is never stored, x can be an array of starting values whose orbits are all binned together
+and checkpoint names a file to save a long run to and pick it up again from. method='ulam'
+takes the density from Ulam's transition matrix between the bins instead of an orbit (see
+dynamical_systems.ulam).
 '''
 
-def Tent_Inv_density(r,x,iterations,transients,bins):
-    width     = 1/bins
-    data      = Tent_values(r,x,iterations,transients,remove = True)['X_n']
-    x_number  = np.floor(np.array(data,float)*bins)
-    numbers, totals    = np.unique(x_number, return_counts=True)
-    density   = totals/(np.sum(totals)*width)
-    x_axis    = (numbers + 0.5) * width
-    plt.scatter(x_axis,density,s=10,color='black',label='Numerical')
-    plt.xlabel('Bins centres')
-    plt.ylabel('Density')
-    plt.title(f'Invariant Measure for r = {r}')
-    plt.xlim(0,1)
-    plt.ylim(0,2)
-    plt.axhline(1,linestyle='-',linewidth=1,color='red',label='Analytical')
-    plt.legend()
-    plt.show()
+def Tent_Inv_density(r,x,iterations,transients,bins,checkpoint=None,graph=True,
+                     method='orbit'):
+    if method == 'ulam':
+        counts = ulam_density('tent',r,bins)
+    else:
+        counts = invariant_density('tent',r,x,iterations,transients,bins,checkpoint=checkpoint)
+    occupied  = counts.counts > 0
+    density   = counts.density()[occupied]
+    x_axis    = counts.centres()[occupied]
+    result    = Result(title=f'Invariant Measure for r = {r}',xlabel='Bins centres',
+                       ylabel='Density',xlim=(0,1),ylim=(0,2),legend=True,x=x_axis,
+                       density=density)
+    result.scatter(x_axis,density,s=10,color='black',label='Numerical')
+    result.hline(1,linestyle='-',linewidth=1,color='red',label='Analytical')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
     
 '''
-Calculate the shannon entropy
+Calculate the shannon entropy. For a range of r every orbit is binned into one (r, bins) count
+matrix and all the entropies are computed from it at once (see dynamical_systems.entropy), for
+spacing values of r shared out between workers with backend and workers.
 '''
 
 def tent_shannon_entropy(r,x,iterations,transients,bins,base='e'):
-    data            = Tent_values(r,x,iterations,transients)['X_n']
-    values          = np.array(data*bins)
-    floor           = np.floor(values)
-    numbers, counts = np.unique(floor, return_counts=True)
-    prob            = counts/sum(counts)
-    clean_prob      = prob[prob>0]
-    if base == 'e':
-        entropy_i   = clean_prob*np.log(clean_prob)
-        entropy     = -sum(entropy_i)
-    elif base == 2:
-        entropy_i   = clean_prob*np.log2(clean_prob)
-        entropy     = -sum(entropy_i)
-    return entropy
-
-def tent_shannon_entropy_range(r1,r2,x,iterations,transients,bins,base='e'):
-    r_values = np.linspace(r1,r2,1000)
-    entropy  = []
-    for r in r_values:
-        entropy.append(tent_shannon_entropy(r,x,iterations,transients,bins,base))
-    plt.scatter(r_values,entropy,marker='.',s=2,color='black')
-    plt.grid(True, which='both',linestyle='--',color='grey',linewidth=0.5)
-    plt.xlim(r1,r2)
-    plt.xlabel('Parameter (r)')
-    plt.ylabel('Shannon Entropy')
-    plt.title(f'Shannon Entropy for Tent Map with Bins = {bins}')
-    plt.show()
+    data            = Tent_values(r,x,iterations,transients).values
+    return shannon_entropy(entropy_counts(data,bins),base)
+
+def tent_shannon_entropy_range(r1,r2,x,iterations,transients,bins,base='e',spacing=1000,
+                               backend='serial',workers=None,graph=True):
+    r_values = np.linspace(r1,r2,spacing)
+    entropy  = entropy_sweep('tent',r_values,x,iterations,transients,bins,base,backend=backend,
+                             workers=workers)
+    result   = Result(title=f'Shannon Entropy for Tent Map with Bins = {bins}',
+                      xlabel='Parameter (r)',ylabel='Shannon Entropy',xlim=(r1,r2),
+                      grid=dict(which='both',linestyle='--',color='grey',linewidth=0.5),
+                      r=r_values,entropy=entropy)
+    result.scatter(r_values,entropy,marker='.',s=2,color='black')
+    if graph is not None:
+        result.draw()
+    if graph is True:
+        plt.show()
+    return result
         
         
 
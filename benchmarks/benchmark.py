@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import importlib.util
+import numpy
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+'''
+Benchmarks for the hot paths of the map scripts. Each case runs one of the script functions
+headless (the Agg backend, with plt.show() replaced by closing the figures) over a matrix of
+sizes, the number of iterations and, for the sweeps over r, the number of r values. For every
+size it records the best time of a few runs, the throughput in map iterations per second
+(iterations times r values over the time) and the peak memory allocated during one further run
+under tracemalloc (numpy reports its arrays to tracemalloc, so this includes them).
+
+The results are written as JSON so that two runs, e.g. before and after a change, can be
+compared with --compare, which exits with status 1 if any case has got slower (or used more
+memory) by more than the tolerance, so it can be used to gate regressions:
+
+    python benchmarks/benchmark.py --output before.json
+    python benchmarks/benchmark.py --output after.json --compare before.json
+
+A case is not run at sizes that it is predicted (from its time at the size before) to take
+longer than --max-seconds over, so the pure python functions stop early rather than taking
+hours at 10^7 iterations. The skipped sizes are recorded as skipped.
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = {
+    'bifurcation' : os.path.join('Logistic Map','Python Scripts','Logistic bifurcation.py'),
+    'box'         : os.path.join('Logistic Map','Python Scripts','Logistic Box.py'),
+    'lyapunov'    : os.path.join('Logistic Map','Python Scripts','Logistic Lyapunov.py'),
+    'tent'        : os.path.join('Tent Map','Tent Map.py'),
+    'sine'        : os.path.join('Sine Map','Code','Sin Map.py'),
+}
+
+ITERATIONS = [10**3,10**4,10**5,10**6,10**7]
+R_VALUES   = [10**2,10**3,10**4]
+TRANSIENTS = 100
+
+'''
+The scripts live in folders with spaces in their names so are loaded straight from their files.
+plt.show is replaced before any of them are loaded so that no window is ever opened and the
+figures do not pile up in memory.
+'''
+
+def show(*args,**kwargs):
+    plt.close('all')
+
+def load_script(name):
+    path   = os.path.join(ROOT,SCRIPTS[name])
+    spec   = importlib.util.spec_from_file_location(f'benchmark_{name}',path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+'''
+The cases. Each one takes the loaded scripts and the sizes and returns a function of no
+arguments that runs the case once. Cases marked grid are run for every number of r values as
+well as every number of iterations.
+'''
+
+def tent_values(scripts,iterations,r_values):
+    return lambda: scripts['tent'].Tent_values(1.7,0.2,iterations,TRANSIENTS)
+
+def lyapunov_value(scripts,iterations,r_values):
+    return lambda: scripts['lyapunov'].Lyapunov_value(3.9,0.2,iterations,TRANSIENTS)
+
+def box_counting_values(scripts,iterations,r_values):
+    return lambda: scripts['box'].box_counting_values(3.9,0.2,iterations,TRANSIENTS)
+
+def sin_embedded_matrix(scripts,iterations,r_values):
+    return lambda: scripts['sine'].Sin_embedded_matrix(0.9,0.2,iterations,TRANSIENTS)
+
+def lyapunov_grid(scripts,iterations,r_values):
+    r_range = numpy.linspace(2.5,4,r_values)
+    return lambda: scripts['lyapunov'].Lyapunov_grid(r_range,0.2,iterations,TRANSIENTS)
+
+def shannon_entropy_range(scripts,iterations,r_values):
+    return lambda: scripts['bifurcation'].shannon_entropy_range(2.5,4,0.2,iterations,TRANSIENTS,
+                                                                100,spacing=r_values)
+
+def tent_shannon_entropy_range(scripts,iterations,r_values):
+    return lambda: scripts['tent'].tent_shannon_entropy_range(0,2,0.2,iterations,TRANSIENTS,100,
+                                                              spacing=r_values)
+
+CASES = {
+    'Tent_values'                : (tent_values,False),
+    'Lyapunov_value'             : (lyapunov_value,False),
+    'box_counting_values'        : (box_counting_values,False),
+    'Sin_embedded_matrix'        : (sin_embedded_matrix,False),
+    'Lyapunov_grid'              : (lyapunov_grid,True),
+    'shannon_entropy_range'      : (shannon_entropy_range,True),
+    'tent_shannon_entropy_range' : (tent_shannon_entropy_range,True),
+}
+
+def best_time(run,repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+        plt.close('all')
+    return min(times)
+
+def peak_memory(run):
+    tracemalloc.start()
+    try:
+        run()
+    finally:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        plt.close('all')
+    return peak
+
+'''
+Run every case over the sizes. For a case that is not a sweep over r the r value count is 1.
+The sizes are run smallest first and once the predicted time of a size (the time of the
+previous size scaled by the increase in work) is over max_seconds that size and every bigger
+one are skipped.
+'''
+
+def run_benchmarks(cases,iterations,r_values,repeat=3,max_seconds=30,memory=True,log=print):
+    plt.show = show
+    scripts  = {name:load_script(name) for name in SCRIPTS}
+    results  = []
+    for case in cases:
+        function, grid = CASES[case]
+        sizes          = [(i,n) for n in (r_values if grid else [1]) for i in iterations]
+        last           = None
+        for i, n in sorted(sizes,key=lambda size: size[0]*size[1]):
+            work   = i*n
+            result = {'case':case,'iterations':i,'r_values':n}
+            if last is not None and last[0]*work/last[1] > max_seconds:
+                result['skipped'] = True
+                results.append(result)
+                log(f'{case:28} {i:>10} {n:>6}  skipped')
+                continue
+            run     = function(scripts,i,n)
+            seconds = best_time(run,repeat if work <= 10**6 else 1)
+            result.update(seconds=seconds,throughput=work/seconds)
+            if memory:
+                result['peak_bytes'] = peak_memory(run)
+            results.append(result)
+            last = (seconds,work)
+            log(f'{case:28} {i:>10} {n:>6}  {seconds:10.4f}s {work/seconds:12.4g} it/s'
+                + (f" {result['peak_bytes']/2**20:10.2f} MiB" if memory else ''))
+    return {'created'   : time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python'    : platform.python_version(),
+            'numpy'     : numpy.__version__,
+            'machine'   : platform.machine(),
+            'processor' : platform.processor(),
+            'cpus'      : os.cpu_count(),
+            'results'   : results}
+
+'''
+Compare two sets of results. For every case and size run in both, the ratio new/old of the time
+and of the peak memory are reported, and a ratio over 1 + tolerance is a regression. Returns
+the list of regressions.
+'''
+
+def compare(new,old,tolerance=0.25,log=print):
+    previous    = {(r['case'],r['iterations'],r['r_values']):r for r in old['results']}
+    regressions = []
+    for result in new['results']:
+        key  = (result['case'],result['iterations'],result['r_values'])
+        base = previous.get(key)
+        if base is None or result.get('skipped') or base.get('skipped'):
+            continue
+        for field in ('seconds','peak_bytes'):
+            if field not in result or field not in base or not base[field]:
+                continue
+            ratio = result[field]/base[field]
+            flag  = ''
+            if ratio > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressions.append(dict(zip(('case','iterations','r_values'),key),field=field,
+                                        ratio=ratio))
+            log(f'{key[0]:28} {key[1]:>10} {key[2]:>6}  {field:10} {ratio:8.3f}x{flag}')
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the map scripts.')
+    parser.add_argument('--cases',nargs='+',choices=sorted(CASES),default=list(CASES))
+    parser.add_argument('--iterations',nargs='+',type=float,default=ITERATIONS)
+    parser.add_argument('--r-values',nargs='+',type=float,default=R_VALUES)
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--max-seconds',type=float,default=30)
+    parser.add_argument('--no-memory',action='store_true',help='do not measure peak memory')
+    parser.add_argument('--output',help='file to write the results to as JSON')
+    parser.add_argument('--compare',help='results file from an earlier run to compare against')
+    parser.add_argument('--tolerance',type=float,default=0.25)
+    args    = parser.parse_args(argv)
+    results = run_benchmarks(args.cases,[int(i) for i in args.iterations],
+                             [int(n) for n in args.r_values],args.repeat,args.max_seconds,
+                             not args.no_memory)
+    if args.output:
+        with open(args.output,'w') as file:
+            json.dump(results,file,indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results,json.load(file),args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regression(s) over {args.tolerance:.0%}')
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+'''
+Shared numerical code for the map scripts (Logistic, Tent and Sine). The scripts themselves
+live in folders with spaces in their names and so cannot be imported from each other, so
+anything that more than one script needs lives here instead.
+
+The names below are only imported from their modules when first used (e.g.
+dynamical_systems.lyapunov_exponents or from dynamical_systems import Result), so importing the
+package costs next to nothing and a numeric job never pulls in scipy, pandas or matplotlib
+unless it uses something that needs them. sweep is the exception, as it shares its name with
+its module and importing the module (as most of the others do) would otherwise shadow it; it
+needs nothing beyond numpy.
+'''
+
+import importlib
+from dynamical_systems.sweep import shared_pool, sweep
+
+EXPORTS = {
+    'maps'        : ['FAMILIES','MAPS','Map','get_family','get_map','register_map',
+                     'skew_tent_map'],
+    'adaptive'    : ['adaptive_sweep'],
+    'cache'       : ['OrbitCache','OrbitMemo','set_default_cache'],
+    'correlation' : ['correlation_dimension','correlation_dimensions'],
+    'cycles'      : ['cycle_orbits','orbit_periods'],
+    'orbit'       : ['iterate_orbits'],
+    'density'     : ['DensityAccumulator','invariant_density'],
+    'embedding'   : ['delay_embedding'],
+    'feigenbaum'  : ['feigenbaum_constants','superstable_parameters'],
+    'instrument'  : ['Profiler','profiling','stage'],
+    'entropy'     : ['entropy_sweep','shannon_entropy'],
+    'lyapunov'    : ['lyapunov_exponents'],
+    'plane'       : ['lyapunov_plane'],
+    'results'     : ['Panels','Result'],
+    'streams'     : ['set_seed'],
+    'table'       : ['OrbitTable'],
+    'ulam'        : ['ulam_density'],
+}
+
+MODULES = {name: module for module, names in EXPORTS.items() for name in names}
+
+__all__ = sorted(MODULES) + ['shared_pool','sweep']
+
+def __getattr__(name):
+    if name not in MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'{__name__}.{MODULES[name]}'),name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(MODULES))
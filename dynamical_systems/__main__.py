@@ -0,0 +1,4 @@
+import sys
+from dynamical_systems.cli import main
+
+sys.exit(main())
@@ -0,0 +1,79 @@
+import numpy
+from functools import partial
+from dynamical_systems.entropy import entropy_counts, shannon_entropy
+from dynamical_systems.maps import get_map
+from dynamical_systems.orbit import initial_state, orbit_chunks
+from dynamical_systems.lyapunov import FLOOR
+from dynamical_systems.sweep import sweep
+
+'''
+Adaptive grids of r. A uniform grid spends most of its points on long smooth stretches (a
+stable fixed point, a band of chaos) and few on the narrow periodic windows and the places
+where the Lyapunov exponent crosses zero, which are the interesting parts. Instead the sweep
+starts from a coarse uniform grid and repeatedly puts a new r in the middle of every interval
+whose two ends differ, until budget values of r have been used:
+
+ - the Lyapunov exponent changes sign,
+ - the number of points on the attractor (the number of the bins boxes over the domain that the
+   kept orbit visits, so p for a period p orbit) changes by more than a factor of ratio,
+ - or the Shannon entropy of the orbit over the same boxes jumps by more than jump.
+
+The widest of the flagged intervals are split first, and intervals narrower than min_width
+are left alone. When nothing is left to refine and there is budget to spare, the widest
+intervals of all are halved, which can turn up windows that the coarser grid stepped over,
+and the refinement then carries on from the finer grid. Each new batch of r is evaluated in one pass of the orbit engine (shared out
+between workers with backend and workers, as for sweep).
+
+adaptive_sweep returns the r values in order along with the exponent, the number of attractor
+points and the entropy at each, which can be passed straight to a plot or used as the r_values
+of another sweep (e.g. bifurcation_image).
+'''
+
+def attractor_summary(f,r,x0,iterations,transients,bins=1000,domain=None,perturbation=0,
+                      chunk=1000):
+    f        = get_map(f)
+    domain   = domain if domain is not None else getattr(f,'domain',(0,1))
+    r, x     = initial_state(r,x0,perturbation)
+    total    = numpy.zeros(x.shape,float)
+    counts   = 0
+    for block in orbit_chunks(f,r,x0,iterations,transients,perturbation,chunk,cache=False):
+        with numpy.errstate(over='ignore',invalid='ignore'):
+            d = numpy.abs(f.derivative(r[...,None],block))
+        total  += numpy.log(numpy.maximum(d,FLOOR)).sum(axis=-1)
+        counts  = counts + entropy_counts(block,bins,domain)
+    lyapunov = total/(iterations-transients+1)
+    return lyapunov, numpy.count_nonzero(counts,axis=-1), shannon_entropy(counts)
+
+def flagged_intervals(lyapunov,points,entropy,ratio=1.5,jump=0.5):
+    sign    = numpy.signbit(lyapunov)
+    points  = numpy.maximum(points,1)
+    change  = numpy.abs(numpy.log(points[1:]/points[:-1])) > numpy.log(ratio)
+    change |= sign[1:] != sign[:-1]
+    change |= numpy.abs(numpy.diff(entropy)) > jump
+    return change
+
+def adaptive_sweep(f,r1,r2,x0,iterations,transients,start=101,budget=1001,bins=1000,
+                   perturbation=0,ratio=1.5,jump=0.5,min_width=None,backend='serial',
+                   workers=None):
+    evaluate  = partial(attractor_summary,f)
+    min_width = min_width if min_width is not None else (r2-r1)*1e-6
+    r         = numpy.linspace(r1,r2,min(start,budget))
+    lyapunov, points, entropy = sweep(evaluate,r,x0,iterations,transients,bins,None,
+                                      perturbation,backend=backend,workers=workers)
+    while len(r) < budget:
+        width    = numpy.diff(r)
+        split    = numpy.flatnonzero(flagged_intervals(lyapunov,points,entropy,ratio,jump)
+                                     & (width > min_width))
+        if len(split) == 0:
+            split = numpy.flatnonzero(width >= width.max()/1.5)
+        if width.max() <= min_width:
+            break
+        split    = split[numpy.argsort(-width[split],kind='stable')][:budget-len(r)]
+        middle   = (r[split] + r[split+1])/2
+        values   = sweep(evaluate,middle,x0,iterations,transients,bins,None,perturbation,
+                         backend=backend,workers=workers)
+        order    = numpy.argsort(numpy.concatenate([r,middle]),kind='stable')
+        r        = numpy.concatenate([r,middle])[order]
+        lyapunov, points, entropy = (numpy.concatenate([old,new])[order] for old, new in
+                                     zip((lyapunov,points,entropy),values))
+    return r, lyapunov, points, entropy
@@ -0,0 +1,89 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import iterate_orbits
+from dynamical_systems.streams import value_uniform
+
+'''
+Box counting. For each box width e in epsilon the domain is cut into boxes of width e and we
+count how many of them contain at least one point of the data, N(e). The box dimension is the
+slope of log N(e) against log(1/e). The data is clipped into the domain first so that a point
+sitting exactly on the upper edge still lands in the last box.
+
+Rather than a fresh numpy.unique (a sort) for every box width, the points are sorted (and
+repeated points dropped) once and every box width is counted from the sorted points:
+
+ - when there are fewer boxes than points, the edges j*e of every box for every width in a
+   block are put into one array and located in the sorted points with a single searchsorted.
+   Box j is occupied if there is a point between its two edges, so the work is the number of
+   boxes rather than the number of points.
+ - when there are more boxes than points, along the sorted points the box number floor(x/e)
+   can only stay the same or go up, so the number of occupied boxes is one plus the number of
+   places it goes up, a comparison of neighbours done for a block of widths at once.
+
+Blocks are sized so that no intermediate array is bigger than block_size elements.
+'''
+
+def box_counts(data,epsilon,domain=(0,1),block_size=2**22):
+    with stage('box counting'):
+        return count_boxes(data,epsilon,domain,block_size)
+
+def count_boxes(data,epsilon,domain=(0,1),block_size=2**22):
+    low, high = domain
+    points    = numpy.unique(numpy.clip(numpy.asarray(data,float),low,high-1e-15) - low)
+    epsilon   = numpy.atleast_1d(numpy.asarray(epsilon,float))
+    boxes     = numpy.ceil((high-low)/epsilon).astype(numpy.int64)
+    N         = numpy.empty(len(epsilon),numpy.int64)
+    coarse    = numpy.flatnonzero(boxes <= len(points))
+    fine      = numpy.flatnonzero(boxes > len(points))
+    for block in split_blocks(boxes[coarse]+1,block_size):
+        N[coarse[block]] = count_by_edges(points,epsilon[coarse[block]],boxes[coarse[block]])
+    for block in split_blocks(numpy.full(len(fine),len(points)),block_size):
+        widths  = epsilon[fine[block],None]
+        number  = numpy.floor(points/widths)
+        N[fine[block]] = 1 + numpy.count_nonzero(number[:,1:] != number[:,:-1],axis=1)
+    return N
+
+def count_by_edges(points,epsilon,boxes):
+    starts   = numpy.concatenate([[0],numpy.cumsum(boxes+1)[:-1]])
+    width    = numpy.repeat(epsilon,boxes+1)
+    j        = numpy.arange(len(width)) - numpy.repeat(starts,boxes+1)
+    below    = numpy.searchsorted(points,j*width)
+    occupied = numpy.zeros(len(width),numpy.int64)
+    occupied[:-1] = below[1:] > below[:-1]
+    occupied[starts[1:]-1] = 0
+    return numpy.add.reduceat(occupied,starts)
+
+#consecutive slices of the indices whose sizes add up to no more than block_size (at least 1)
+def split_blocks(sizes,block_size):
+    blocks, start, total = [], 0, 0
+    for i, size in enumerate(sizes):
+        if total and total + size > block_size:
+            blocks.append(slice(start,i))
+            start, total = i, 0
+        total += size
+    if start < len(sizes):
+        blocks.append(slice(start,len(sizes)))
+    return blocks
+
+def box_dimension(data,epsilon,domain=(0,1)):
+    N = box_counts(data,epsilon,domain)
+    with stage('polyfit'):
+        return numpy.polyfit(numpy.log(1/numpy.asarray(epsilon,float)),numpy.log(N),1)[0]
+
+'''
+The box dimension of the attractor for every r in a grid, with the orbits generated by the
+orbit engine (same arguments as iterate_orbits, including cache). Returns one dimension per r.
+With per_value the perturbation of each orbit is drawn from the value_stream of its r rather
+than from its row of the grid (see dynamical_systems.streams), so the dimension for an r is the
+same whatever grid it is part of, and the same as for the single r functions of the scripts.
+'''
+
+def box_dimensions(f,r,x0,iterations,transients,epsilon,perturbation=0,cache=None,
+                   per_value=False):
+    f      = get_map(f)
+    domain = getattr(f,'domain',(0,1))
+    if per_value and perturbation:
+        x0, perturbation = x0 + value_uniform(r)*perturbation, 0
+    orbits = iterate_orbits(f,r,x0,iterations,transients,perturbation,cache)
+    return numpy.array([box_dimension(orbit,epsilon,domain) for orbit in orbits])
@@ -0,0 +1,167 @@
+import os
+import hashlib
+import numpy
+from collections import OrderedDict
+from numpy.lib.format import open_memmap
+from dynamical_systems.streams import resolve_seed, row_offset
+
+'''
+A persistent on-disk store of orbits. Each sweep output (the array iterate_orbits would return)
+is written to a .npy file named by a hash of everything that determines it (the map, the r
+grid, x0, iterations, transients and perturbation) and is mapped back lazily with
+mmap_mode='r' when the same sweep is asked for again, so a repeated analysis starts at once and
+only the parts of the orbits actually read are ever loaded into memory. New orbits are written
+a chunk at a time straight into the file, so they are never held in memory either.
+
+The directory defaults to $DYNAMICAL_SYSTEMS_CACHE or ~/.cache/dynamical_systems/orbits. Once
+the files add up to more than max_bytes, the least recently used ones are deleted (a file's
+modification time is updated each time it is read).
+
+Nothing is cached unless asked for: the engine functions take a cache argument, and if it is
+not given they use the default cache, which is off until set with set_default_cache, e.g.
+set_default_cache(OrbitCache()) at the top of a session. cache=False always skips the cache.
+'''
+
+class OrbitCache:
+    def __init__(self,directory=None,max_bytes=4*2**30):
+        if directory is None:
+            directory = os.environ.get('DYNAMICAL_SYSTEMS_CACHE',
+                                       os.path.join(os.path.expanduser('~'),'.cache',
+                                                    'dynamical_systems','orbits'))
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory,exist_ok=True)
+
+    def key(self,f,r,x0,iterations,transients,perturbation=0):
+        return orbit_key(f,r,x0,iterations,transients,perturbation)
+
+    def path(self,key):
+        return os.path.join(self.directory,key + '.npy')
+
+    def get(self,key):
+        path = self.path(key)
+        try:
+            orbits = numpy.load(path,mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return orbits
+
+    '''
+    The cached orbits for these arguments, computing and writing them first if they are not
+    already stored. The returned array is a read only memory map onto the file.
+    '''
+
+    def orbits(self,f,r,x0,iterations,transients,perturbation=0,chunk=1000):
+        from dynamical_systems.orbit import orbit_chunks
+        key    = self.key(f,r,x0,iterations,transients,perturbation)
+        orbits = self.get(key)
+        if orbits is not None:
+            return orbits
+        shape  = numpy.broadcast_shapes(numpy.shape(r),numpy.shape(x0))
+        temp   = self.path(key) + f'.{os.getpid()}.tmp'
+        output = open_memmap(temp,mode='w+',dtype=float,shape=shape + (iterations-transients+1,))
+        start  = 0
+        for block in orbit_chunks(f,r,x0,iterations,transients,perturbation,chunk,cache=False):
+            output[...,start:start+block.shape[-1]] = block
+            start += block.shape[-1]
+        output.flush()
+        del output
+        os.replace(temp,self.path(key))
+        self.evict(keep=key)
+        return self.get(key)
+
+    def size(self):
+        return sum(os.path.getsize(path) for path in self.files())
+
+    def files(self):
+        return [os.path.join(self.directory,name) for name in os.listdir(self.directory)
+                if name.endswith('.npy')]
+
+    def evict(self,keep=None):
+        files = sorted(self.files(),key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in files)
+        for path in files:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == self.path(keep):
+                continue
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+    def clear(self):
+        for path in self.files():
+            os.remove(path)
+
+'''
+An in-memory version of the same thing for within one session, e.g. so that a combined figure
+(a bifurcation diagram with the Lyapunov exponent over it) generates each orbit once and both
+panels read it. The orbits are held in memory in least recently used order and the oldest are
+dropped once they add up to more than max_bytes. An orbit bigger than max_bytes on its own is
+returned but not kept. It has the same orbits() method as OrbitCache, so either can be passed
+as the cache argument of the engine functions. Its orbits() can also fill the memo with a
+parallel sweep (backend and workers as for sweep), after which the analyses that read it run
+in the calling process without iterating the map again.
+'''
+
+class OrbitMemo:
+    def __init__(self,max_bytes=512*2**20):
+        self.max_bytes = max_bytes
+        self.entries   = OrderedDict()
+        self.nbytes    = 0
+
+    def orbits(self,f,r,x0,iterations,transients,perturbation=0,chunk=1000,backend='serial',
+               workers=None):
+        from functools import partial
+        from dynamical_systems.orbit import iterate_orbits
+        from dynamical_systems.sweep import sweep
+        key = orbit_key(f,r,x0,iterations,transients,perturbation)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if backend == 'serial' or numpy.ndim(r) != 1:
+            orbits = iterate_orbits(f,r,x0,iterations,transients,perturbation,cache=False)
+        else:
+            orbits = sweep(partial(iterate_orbits,f),r,x0,iterations,transients,perturbation,
+                           cache=False,backend=backend,workers=workers)
+        orbits.flags.writeable = False
+        if orbits.nbytes <= self.max_bytes:
+            self.entries[key] = orbits
+            self.nbytes += orbits.nbytes
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self.entries.popitem(last=False)[1].nbytes
+        return orbits
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+#everything that determines a sweep output, hashed into a single key (with a perturbation, that
+#includes the seed and where the rows start, see dynamical_systems.streams)
+def orbit_key(f,r,x0,iterations,transients,perturbation=0):
+    r, x0   = numpy.broadcast_arrays(numpy.asarray(r,float),numpy.asarray(x0,float))
+    streams = (resolve_seed(),row_offset()) if perturbation else None
+    content = hashlib.sha256()
+    content.update(repr((map_key(f),r.shape,iterations,transients,perturbation,
+                         streams)).encode())
+    content.update(numpy.ascontiguousarray(r).tobytes())
+    content.update(numpy.ascontiguousarray(x0).tobytes())
+    return content.hexdigest()
+
+#maps are identified by their registry name, plain functions by where they are defined
+def map_key(f):
+    if isinstance(f,str):
+        return f
+    name = getattr(f,'name',None)
+    return name if name is not None else f'{f.__module__}.{f.__qualname__}'
+
+DEFAULT_CACHE = None
+
+def set_default_cache(cache):
+    global DEFAULT_CACHE
+    DEFAULT_CACHE = cache
+
+def resolve_cache(cache):
+    if cache is None:
+        return DEFAULT_CACHE
+    return cache or None
@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import argparse
+import importlib
+import numpy
+from functools import partial
+
+'''
+Running analyses in bulk from a job file, without opening any of the scripts:
+
+    python -m dynamical_systems jobs.yaml --backend process --workers 4
+
+The repository is not an installed package (there is no packaging metadata or console script),
+so this has to be run from the folder holding dynamical_systems, or with that folder on
+PYTHONPATH.
+
+The job file (JSON, or YAML if PyYAML is installed) is either a list of jobs or a mapping with
+the jobs under jobs and, optionally, the defaults backend, workers, seed and output (the folder
+the outputs go in, by default the one the job file is in). A job is a mapping of
+
+    analysis  one of ANALYSES below
+    map       the registered map to use (logistic, tent, sine), or for a plane with
+              y: parameter a family of maps (see dynamical_systems.maps.FAMILIES)
+    r         a single r, [r1, r2] for the analyses over a range, or [r1, r2, count] for a
+              grid of count evenly spaced values of r
+    output    the file to write, .npy (the main array), .npz (every array), .csv (the
+              one dimensional arrays as columns), .json, or an image (.png, .svg, .pdf)
+    name      a name for the job in the log (optional)
+
+together with the keyword arguments of the analysis (x0, iterations, transients, bins...).
+A job can instead run a function of one of the scripts, as dynamical_systems.export does,
+with script, function, args and kwargs in place of analysis, map and r, and writes its figure
+to output.
+
+Nothing but numpy is imported until a job needs it: each analysis is imported from its module
+when the job runs, matplotlib only when a job writes an image and a script only when a job
+uses it, so numeric jobs start in a fraction of a second. All the jobs' sweeps run on the one
+worker pool (see dynamical_systems.sweep.shared_pool) rather than starting a pool each.
+'''
+
+'''
+The analyses, by name: the module and function, how r is passed (a grid of r shared out by
+sweep, the two ends of a range, a single value, or not at all), whether the function takes
+backend and workers itself, and the names of the arrays it returns.
+'''
+
+ANALYSES = {
+    'orbits'      : ('orbit','iterate_orbits','grid',False,('orbits',)),
+    'lyapunov'    : ('lyapunov','lyapunov_exponents','grid',False,('Lyapunov',)),
+    'periods'     : ('cycles','orbit_periods','grid',False,('period','settled')),
+    'entropy'     : ('entropy','entropy_sweep','grid',True,('entropy','period')),
+    'box'         : ('box','box_dimensions','grid',False,('D',)),
+    'correlation' : ('correlation','correlation_dimensions','grid',False,('D',)),
+    'adaptive'    : ('adaptive','adaptive_sweep','range',True,
+                     ('r','Lyapunov','points','entropy')),
+    'bifurcation' : ('render','bifurcation_image','range',True,('counts',)),
+    'plane'       : ('plane','lyapunov_plane','range',True,('Lyapunov',)),
+    'density'     : ('density','invariant_density','value',True,('centres','density')),
+    'ulam'        : ('ulam','ulam_density','value',False,('centres','density')),
+    'feigenbaum'  : ('feigenbaum','feigenbaum_constants',None,False,
+                     ('superstable','delta','r_inf')),
+}
+
+IMAGES = ('.png','.svg','.pdf','.jpg','.jpeg')
+
+def load_jobs(path):
+    with open(path) as file:
+        if os.path.splitext(path)[1].lower() in ('.yaml','.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError('YAML job files need PyYAML, or write the jobs as JSON') \
+                      from None
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+    if isinstance(spec,list):
+        spec = {'jobs':spec}
+    spec.setdefault('output',os.path.dirname(os.path.abspath(path)))
+    return spec
+
+def r_values(r):
+    if numpy.ndim(r) == 0:
+        return float(r)
+    if len(r) == 3:
+        return numpy.linspace(r[0],r[1],int(r[2]))
+    return tuple(float(value) for value in r)
+
+'''
+Run one analysis job, returning the arrays it worked out by name (with r for the grids) and
+the object that draws it if it has one (an image or a density).
+'''
+
+def run_analysis(job,backend='serial',workers=None):
+    job = dict(job)
+    module, name, kind, parallel, fields = ANALYSES[job.pop('analysis')]
+    function = getattr(importlib.import_module(f'dynamical_systems.{module}'),name)
+    f        = job.pop('map','logistic')
+    r        = r_values(job.pop('r')) if kind is not None else None
+    pool     = dict(backend=backend,workers=workers) if parallel else {}
+    if module == 'plane' and job.get('y') == 'parameter':
+        f = importlib.import_module('dynamical_systems.maps').get_family(f)
+    if kind == 'grid':
+        value = sweep_grid(function,f,r,job,backend,workers)
+    elif kind == 'range':
+        value = function(f,*r,**job,**pool)
+    elif kind == 'value':
+        value = function(f,r,**job,**pool)
+    else:
+        value = function(f,**job)
+    drawing = value if hasattr(value,'draw') or hasattr(value,'density') else None
+    if hasattr(value,'centres'):
+        value = (value.centres(),value.density())
+    elif hasattr(value,'counts'):
+        value = value.counts
+    elif hasattr(value,'values'):
+        value = value.values
+    values = dict(zip(fields,value if isinstance(value,tuple) else (value,)))
+    if kind == 'grid':
+        values = {'r':r,**values}
+    return values, drawing
+
+def sweep_grid(function,f,r,job,backend,workers):
+    from dynamical_systems.sweep import sweep
+    if numpy.ndim(r) == 0:
+        r = numpy.array([r])
+    return sweep(partial(function,f),r,backend=backend,workers=workers,**job)
+
+'''
+Writing the arrays of a job. .npy takes the main (last named) array, .csv needs them all to be
+one dimensional and of the same length.
+'''
+
+def write_values(values,path):
+    extension = os.path.splitext(path)[1].lower()
+    arrays    = {name: numpy.asarray(value) for name, value in values.items()}
+    if extension == '.npy':
+        numpy.save(path,list(arrays.values())[-1])
+    elif extension == '.npz':
+        numpy.savez(path,**arrays)
+    elif extension == '.csv':
+        if any(array.ndim != 1 for array in arrays.values()):
+            raise ValueError(f'{path}: only one dimensional results can be written as csv')
+        numpy.savetxt(path,numpy.column_stack(list(arrays.values())),delimiter=',',
+                      header=','.join(arrays),comments='')
+    elif extension == '.json':
+        with open(path,'w') as file:
+            json.dump({name: array.tolist() for name, array in arrays.items()},file)
+    else:
+        raise ValueError(f'{path}: unknown output format {extension!r}')
+    return path
+
+def write_figure(job,values,drawing,path):
+    from dynamical_systems.results import Result
+    result = Result(title=job.get('name',job['analysis']),xlabel='r')
+    if drawing is not None and hasattr(drawing,'draw'):
+        result.image(drawing,job.get('shading','log'))
+    elif drawing is not None:
+        result.line(drawing.centres(),drawing.density(),color='black')
+        result.xlabel, result.ylabel = 'x', 'Density'
+    else:
+        x = values.get('r')
+        if x is None:
+            raise ValueError(f"{path}: {job['analysis']} results cannot be drawn")
+        for name, value in values.items():
+            if name != 'r':
+                result.line(x,value,label=name)
+        result.legend = len(values) > 2
+    return result.save(path)
+
+def run_script(job,directory):
+    from dynamical_systems.export import export_jobs
+    folder, base = os.path.split(os.path.join(directory,job['output']))
+    name, format = os.path.splitext(base)
+    return export_jobs([dict(job,name=name,formats=[format[1:]])],folder)[0]
+
+def run_job(job,directory,backend='serial',workers=None):
+    if 'script' in job:
+        return run_script(job,directory)
+    job  = dict(job)
+    path = os.path.join(directory,job.pop('output'))
+    os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+    if job.get('analysis') not in ANALYSES:
+        raise ValueError(f"unknown analysis {job.get('analysis')!r}, use one of "
+                         f'{sorted(ANALYSES)}')
+    label = job.pop('name',None)
+    shade = job.pop('shading','log')
+    if job['analysis'] == 'plane' and path.endswith('.npy'):
+        job['path'] = path
+    values, drawing = run_analysis(job,backend,workers)
+    if os.path.splitext(path)[1].lower() in IMAGES:
+        return write_figure(dict(job,name=label or job['analysis'],shading=shade),values,drawing,
+                            path)
+    if 'path' in job:
+        return path
+    return write_values(values,path)
+
+'''
+Run every job of a job file in order, all on one pool of workers, printing how long each took
+and what it wrote. Returns the paths written.
+'''
+
+def run_jobs(spec,backend=None,workers=None,seed=None,output=None,log=print):
+    from contextlib import nullcontext
+    from dynamical_systems.streams import set_seed
+    from dynamical_systems.sweep import shared_pool
+    backend   = backend or spec.get('backend','serial')
+    workers   = workers or spec.get('workers')
+    seed      = seed if seed is not None else spec.get('seed')
+    directory = output or spec['output']
+    paths     = []
+    if seed is not None:
+        set_seed(seed)
+    with shared_pool(backend,workers) if backend != 'serial' else nullcontext():
+        for number, job in enumerate(spec['jobs']):
+            start = time.perf_counter()
+            path  = run_job(job,directory,backend,workers)
+            label = job.get('name',job.get('analysis',job.get('function')))
+            log(f'[{number+1}/{len(spec["jobs"])}] {label}: {path} '
+                f'({time.perf_counter()-start:.2f} s)')
+            paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dynamical_systems',
+                                     description='Run a file of map analysis jobs.',
+                                     epilog='Run it from the folder holding dynamical_systems '
+                                            '(or with that folder on PYTHONPATH), as the '
+                                            'package is not installed.')
+    parser.add_argument('jobs',nargs='?',help='job file (.json, .yaml or .yml)')
+    parser.add_argument('--backend',choices=('serial','thread','process'),default=None,
+                        help='how the sweeps are shared out (default from the job file)')
+    parser.add_argument('--workers',type=int,default=None)
+    parser.add_argument('--seed',type=int,default=None,help='seed of the random streams')
+    parser.add_argument('--output',default=None,help='folder for the outputs')
+    parser.add_argument('--list',action='store_true',help='list the analyses and stop')
+    args = parser.parse_args(argv)
+    if args.list:
+        for name, (module, function, kind, parallel, fields) in ANALYSES.items():
+            print(f'{name:12} dynamical_systems.{module}.{function} -> {", ".join(fields)}')
+        return 0
+    if args.jobs is None:
+        parser.error('a job file is needed')
+    run_jobs(load_jobs(args.jobs),args.backend,args.workers,args.seed,args.output)
+    return 0
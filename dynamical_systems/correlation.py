@@ -0,0 +1,132 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.embedding import delay_embedding
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import iterate_orbits
+from dynamical_systems.streams import REFERENCES, choose
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+'''
+The correlation dimension D2 of Grassberger and Procaccia. The orbit is delay embedded in m
+dimensions (see dynamical_systems.embedding) and the correlation sum C(e), the fraction of
+pairs of embedded points that are within e of each other (in the max norm), is counted for a
+list of radii. C(e) goes as e^D2 for small e, so D2 is the slope of log C(e) against log e.
+
+Counting all N^2 pairs is out of the question for 10^6 points, so only the pairs that can be
+close are looked at:
+
+ - with scipy, the points go into a KD-tree and cKDTree.count_neighbors counts the pairs for
+   every radius in a single dual tree walk, in which whole boxes of points that are all near
+   (or all far from) each other are counted at once.
+ - without it, the points are sorted by their first coordinate, and a pair can only be within
+   the largest radius if their first coordinates are, which is a window of the sorted points
+   found with searchsorted. Only the pairs inside the windows have their distances worked
+   out, block_size pairs at a time, and each is put into the bin of the smallest radius it is
+   within, so all the radii come from one pass.
+
+With references (a number of points) the sum is taken only over that many randomly chosen
+reference points against all the others, the usual way of cutting the cost further for very
+long orbits. They are chosen from a seeded stream (see dynamical_systems.streams), so the sums
+are the same from run to run. Repeated points (a periodic orbit is nothing else) are merged first and counted
+with a weight, so the cost goes with the number of distinct points.
+'''
+
+def correlation_sums(points,radii,references=None,method=None,block_size=2**22):
+    points = numpy.asarray(points,float)
+    points = points if points.ndim == 2 else points[:,None]
+    radii  = numpy.asarray(radii,float)
+    n      = len(points)
+    method = method or ('tree' if cKDTree is not None else 'grid')
+    with stage('correlation sum'):
+        distinct, inverse, weight = numpy.unique(points,axis=0,return_inverse=True,
+                                                 return_counts=True)
+        if references is not None and references < n:
+            chosen         = choose(n,references,REFERENCES)
+            centres, count = numpy.unique(inverse.ravel()[chosen],return_counts=True)
+        else:
+            centres, count = numpy.arange(len(distinct)), weight
+        if method == 'tree':
+            if cKDTree is None:
+                raise ImportError('the tree method needs scipy, use method="grid"')
+            tree  = cKDTree(distinct)
+            other = tree if len(centres) == len(distinct) else cKDTree(distinct[centres])
+            pairs = other.count_neighbors(tree,radii,p=numpy.inf,weights=(count,weight))
+        elif method == 'grid':
+            pairs = count_window_pairs(distinct,weight,centres,count,radii,
+                                       len(centres) == len(distinct),block_size)
+        else:
+            raise ValueError(f"unknown method {method!r}, use 'tree' or 'grid'")
+    m = count.sum()
+    return (numpy.asarray(pairs,float) - m)/(m*(n-1))
+
+'''
+The pairs within each radius from the windows of the points, which numpy.unique has already
+sorted by their first coordinate, each pair adding the product of the weights of its two
+points. Between every centre and all the points (symmetric, the distinct points are their own
+centres) each pair is taken once (j after i in the window) and counted twice, with the pairs
+of copies of the same point added at distance 0, to give the count of ordered pairs (with
+every point paired with itself) made by the tree.
+'''
+
+def count_window_pairs(points,weight,centres,count,radii,symmetric,block_size):
+    first  = points[:,0]
+    reach  = radii.max()
+    if symmetric:
+        start = centres + 1
+    else:
+        start = numpy.searchsorted(first,first[centres] - reach,'left')
+    stop   = numpy.searchsorted(first,first[centres] + reach,'right')
+    sizes  = stop - start
+    bins   = numpy.zeros(len(radii)+1,float)
+    ranked = numpy.sort(radii)
+    ends   = numpy.cumsum(sizes)
+    cuts   = numpy.searchsorted(ends,numpy.arange(block_size,ends[-1] if len(ends) else 0,
+                                                  block_size),'right')
+    for a, b in zip(numpy.concatenate([[0],cuts]),numpy.concatenate([cuts,[len(sizes)]])):
+        if a == b:
+            continue
+        size  = sizes[a:b]
+        i     = numpy.repeat(centres[a:b],size)
+        j     = numpy.repeat(start[a:b] - numpy.concatenate([[0],numpy.cumsum(size)[:-1]]),
+                             size) + numpy.arange(size.sum())
+        d     = numpy.abs(points[i] - points[j]).max(axis=1)
+        pair  = numpy.repeat(count[a:b],size)*weight[j]
+        bins += numpy.bincount(numpy.searchsorted(ranked,d,'left'),pair,len(radii)+1)
+    pairs  = numpy.cumsum(bins)[:-1]
+    if symmetric:
+        pairs = 2*pairs + (weight**2).sum()
+    return pairs[numpy.searchsorted(ranked,radii)]
+
+'''
+D2 from the slope of log C(e) against log e over the radii where C(e) is not zero. points is
+an orbit, embedded here in m dimensions with delay tau, or an already embedded (N,m) array
+when m is None.
+'''
+
+def correlation_dimension(points,radii,m=2,tau=1,references=None,method=None):
+    if m is not None:
+        points = delay_embedding(points,m,tau)
+    radii = numpy.asarray(radii,float)
+    C     = correlation_sums(points,radii,references,method)
+    keep  = C > 0
+    if keep.sum() < 2:
+        return numpy.nan
+    with stage('polyfit'):
+        return numpy.polyfit(numpy.log(radii[keep]),numpy.log(C[keep]),1)[0]
+
+'''
+The correlation dimension for every r in a grid, with the orbits generated by the orbit engine
+(same arguments as iterate_orbits, including cache) and embedded in m dimensions. Returns one
+dimension per r.
+'''
+
+def correlation_dimensions(f,r,x0,iterations,transients,radii,m=2,tau=1,references=None,
+                           perturbation=0,cache=None,method=None):
+    f      = get_map(f)
+    orbits = iterate_orbits(f,r,x0,iterations,transients,perturbation,cache)
+    return numpy.array([correlation_dimension(orbit,radii,m,tau,references,method)
+                        for orbit in orbits.reshape(-1,orbits.shape[-1])]).reshape(orbits.shape[:-1])
@@ -0,0 +1,216 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import initial_state
+
+'''
+Stopping orbits early once they have settled onto a cycle. Most of the stable range of every
+map converges to a short cycle within a few hundred steps, after which iterating on to the
+full number of iterations only repeats the same p values. Here every 2*max_period steps the
+last 2*max_period values of each orbit are checked: it has settled onto
+a period p cycle if each of its last p values is within tolerance of the value p steps before
+it, for the smallest such p. Settled orbits are dropped from the state vector, so each step
+gets cheaper as more of the grid settles, and the rest of their orbit is the cycle repeated,
+which is filled in (or summed over) directly.
+
+The period is 0 for an orbit that never settled (chaos, a cycle longer than max_period, or
+still converging at the end) and settled is the step at which it was found to have settled
+(iterations if it never was).
+'''
+
+def find_periods(history,tolerance,max_period):
+    last    = history[-1]
+    close   = numpy.abs(history[-2:-max_period-2:-1] - last) <= tolerance
+    periods = numpy.zeros(last.size,numpy.int64)
+    rows    = numpy.flatnonzero(close.any(axis=0))
+    close   = close[:,rows]
+    for p in numpy.flatnonzero(close.any(axis=1)) + 1:
+        which = close[p-1] & (periods[rows] == 0)
+        if which.any():
+            gap = numpy.abs(history[-p:,rows[which]] - history[-2*p:-p,rows[which]]).max(axis=0)
+            periods[rows[which][gap <= tolerance]] = p
+    return periods
+
+'''
+The loop shared by the functions below. visit(rows,i,r,x) is called for every step i (counting
+from 0 for x0) with the r and x of the orbits still running, whose rows in the flattened grid
+are rows. When some of them stop at step i, settle(rows,i,r,cycles,periods,done) is called
+with the same rows and r, the mask done of the orbits that stop and their periods, where
+cycles[k,-periods[k]:] are the last periods[k] values of orbit k in order, ending with x_i.
+After the last step it is called once more with every orbit still running done and no
+periods, so that anything kept per running orbit can be compacted or flushed.
+
+The history is filled afresh between checks, so it never has to be shifted or compacted. At a
+check only the last value of each orbit is compared with the max_period values before it, and
+the full test is made just for the orbits where one of those is within tolerance, so a check
+costs about as much as a single step.
+'''
+
+def run_until_settled(f,r,x0,iterations,perturbation,tolerance,max_period,visit,settle):
+    f       = get_map(f)
+    r, x    = initial_state(r,x0,perturbation)
+    shape   = x.shape
+    r, x    = r.ravel(), x.ravel()
+    rows    = numpy.arange(x.size)
+    length  = 2*max_period
+    history = numpy.empty((length,x.size),float)
+    periods = numpy.zeros(x.size,numpy.int64)
+    settled = numpy.full(x.size,iterations,numpy.int64)
+    with numpy.errstate(over='ignore',invalid='ignore'):
+        for i in range(iterations+1):
+            if i:
+                x = f(r,x)
+            visit(rows,i,r,x)
+            history[i % length] = x
+            if (i+1) % length or i == iterations or not len(rows):
+                continue
+            with stage('cycle check'):
+                found  = find_periods(history,tolerance,max_period)
+                done   = found > 0
+                if not done.any():
+                    continue
+                periods[rows[done]] = found[done]
+                settled[rows[done]] = i
+                settle(rows,i,r,history.T,found,done)
+                rows, r, x = rows[~done], r[~done], x[~done]
+                history    = numpy.empty((length,len(rows)),float)
+                if not len(rows):
+                    break
+    settle(rows,iterations,r,numpy.empty((len(rows),0)),numpy.zeros(len(rows),numpy.int64),
+           numpy.ones(len(rows),bool))
+    return periods.reshape(shape), settled.reshape(shape)
+
+'''
+For the steps after i up to last (and from first), the position of each step in a cycle of
+period p whose last value is x_i, grouped by period so that each group is one fancy index.
+'''
+
+def cycle_groups(i,periods,first,last):
+    steps = numpy.arange(max(i+1,first),last+1)
+    for p in numpy.unique(periods[periods > 0]):
+        yield periods == p, p, steps, (steps - i - 1) % p
+
+'''
+The periods alone, for a table of period against r. Nothing is stored but the last
+2*max_period values of each orbit.
+'''
+
+def orbit_periods(f,r,x0,iterations,perturbation=0,tolerance=1e-10,max_period=64):
+    nothing = lambda *args: None
+    with stage('iterate until settled'):
+        return run_until_settled(f,r,x0,iterations,perturbation,tolerance,max_period,nothing,
+                                 nothing)
+
+'''
+The same orbits as iterate_orbits (x_n for n = transients, ..., iterations), but with each
+orbit stopped as soon as it has settled and the rest of it filled in from its cycle. Returns
+the orbits together with the periods and the steps at which they settled.
+
+The orbits are stored step by step, so the rest of a settled orbit is a column of the array.
+Neighbouring values of r usually settle together onto cycles of the same period, so the
+settled orbits are split into runs of neighbouring rows with the same period, and each run is
+filled a phase of the cycle at a time as a strided slice, which is far quicker than scattering
+the values with a fancy index.
+'''
+
+def cycle_orbits(f,r,x0,iterations,transients,perturbation=0,tolerance=1e-10,max_period=64):
+    shape = numpy.broadcast_shapes(numpy.shape(r),numpy.shape(x0))
+    kept  = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    orbit = numpy.empty((kept,int(numpy.prod(shape))),float)
+
+    def visit(rows,i,r,x):
+        if i >= transients:
+            orbit[i-transients,rows if len(rows) < orbit.shape[1] else slice(None)] = x
+
+    def settle(rows,i,r,cycles,periods,done):
+        cyclic                = periods > 0
+        rows, cycles, periods = rows[cyclic], cycles[cyclic], periods[cyclic]
+        start                 = max(i+1,transients)
+        breaks = numpy.flatnonzero((numpy.diff(rows) != 1) | (numpy.diff(periods) != 0)) + 1
+        for run in numpy.split(numpy.arange(len(rows)),breaks):
+            if not len(run):
+                continue
+            p, a, b = periods[run[0]], rows[run[0]], rows[run[-1]]+1
+            for j in range(min(p,iterations+1-start)):
+                orbit[start-transients+j::p,a:b] = cycles[run,(start+j-i-1) % p - p]
+
+    with stage('iterate until settled'):
+        periods, settled = run_until_settled(f,r,x0,iterations,perturbation,tolerance,
+                                             max_period,visit,settle)
+    return numpy.moveaxis(orbit.reshape((kept,) + shape),0,-1), periods, settled
+
+'''
+Counting the values of the orbits (x_n for n = transients, ..., iterations) into boxes, for a
+histogram, an entropy or a bifurcation image, with each orbit stopped once it has settled. The
+values are handed to add(rows,r,x,weights), where x has one row per orbit: the values of the
+orbits still running, up to chunk steps of them at a time, with weights None (each counts
+once), and for the orbits that settle the p values of their cycle, each weighted by the number
+of the remaining steps that land on it (whole turns of the cycle plus part of one). Every
+value of the full orbit is then counted exactly once, however early the orbit stopped. As for
+orbit_periods, the periods (0 where an orbit never settled) and the steps at which the orbits
+settled are returned, so a sweep that counts with a tolerance gets them for nothing.
+'''
+
+def cycle_counts(f,r,x0,iterations,transients,add,perturbation=0,tolerance=1e-10,
+                 max_period=64,chunk=1000):
+    kept   = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    block  = []
+    held   = [None,None]
+
+    def flush():
+        if block:
+            add(held[0],held[1],numpy.stack(block,axis=-1),None)
+            block.clear()
+
+    def visit(rows,i,r,x):
+        if i >= transients:
+            held[:] = rows, r
+            block.append(x)
+            if len(block) == chunk:
+                flush()
+
+    def settle(rows,i,r,cycles,periods,done):
+        flush()
+        for which, p, steps, phase in cycle_groups(i,periods,transients,iterations):
+            turns = numpy.bincount(phase,minlength=p)
+            add(rows[which],r[which],cycles[which,-p:],turns)
+
+    with stage('iterate until settled'):
+        return run_until_settled(f,r,x0,iterations,perturbation,tolerance,max_period,visit,
+                                 settle)
+
+'''
+The Lyapunov exponent, as lyapunov_exponents, but with each orbit stopped once it has settled:
+the rest of its sum of ln|f'(x)| is then whole turns of the cycle plus part of one.
+'''
+
+def cycle_lyapunov(f,r,x0,iterations,transients,perturbation=0,floor=None,tolerance=1e-10,
+                   max_period=64):
+    f     = get_map(f)
+    floor = floor if floor is not None else numpy.finfo(float).tiny
+    shape = numpy.broadcast_shapes(numpy.shape(r),numpy.shape(x0))
+    kept  = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    total = numpy.zeros(int(numpy.prod(shape)),float)
+    sums  = numpy.zeros(total.size,float)
+
+    def visit(rows,i,r,x):
+        if i >= transients:
+            sums[:len(x)] += numpy.log(numpy.maximum(numpy.abs(f.derivative(r,x)),floor))
+
+    def settle(rows,i,r,cycles,periods,done):
+        for which, p, steps, phase in cycle_groups(i,periods,transients,iterations):
+            d     = numpy.abs(f.derivative(r[which,None],cycles[which,-p:]))
+            turns = numpy.bincount(phase,minlength=p)
+            sums[:len(rows)][which] += (numpy.log(numpy.maximum(d,floor))*turns).sum(axis=1)
+        total[rows[done]]           = sums[:len(rows)][done]
+        sums[:len(rows)-done.sum()] = sums[:len(rows)][~done]
+
+    with stage('iterate until settled'):
+        run_until_settled(f,r,x0,iterations,perturbation,tolerance,max_period,visit,settle)
+    return (total/kept).reshape(shape)
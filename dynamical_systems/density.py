@@ -0,0 +1,163 @@
+import os
+import numpy
+from functools import partial
+from dynamical_systems.maps import get_map
+from dynamical_systems.cycles import cycle_counts
+from dynamical_systems.entropy import entropy_counts
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import orbit_chunks
+from dynamical_systems.sweep import sweep
+
+'''
+The invariant density of a map from a histogram of its orbit. A DensityAccumulator holds a
+fixed number of bin counts over the domain and update() adds a block of orbit values to them
+(each counted once, or weights times, e.g. the values of a settled cycle), so an orbit can be
+fed in a chunk at a time straight from the orbit engine and only the counts (and one block)
+are ever held in memory, however long the orbit is. Values outside the domain are not binned
+but are counted in outside.
+
+Histograms of separate orbits are added together with merge() (or +), e.g. the partial counts
+from parallel workers. save() and load() write and read the counts, together with the number
+of steps taken by each orbit and the state the orbits are to carry on from, so that a long run
+can be picked up again where it stopped, and with run, what identifies the run (the map, r, x0
+and so on, see accumulate_density) so that it is only ever picked up by the same run.
+'''
+
+class DensityAccumulator:
+    def __init__(self,bins,domain=(0,1)):
+        self.bins    = bins
+        self.domain  = tuple(domain)
+        self.counts  = numpy.zeros(bins,numpy.int64)
+        self.outside = 0
+        self.steps   = 0
+        self.state   = None
+        self.run     = {}
+
+    def update(self,values,weights=None):
+        values = numpy.asarray(values,float)
+        counts = entropy_counts(values,self.bins,self.domain,weights=weights)
+        counts = counts.reshape(-1,self.bins).sum(axis=0)
+        total  = values.size if weights is None else numpy.broadcast_to(weights,values.shape).sum()
+        self.counts  += counts
+        self.outside += int(total) - int(counts.sum())
+        self.steps   += values.shape[-1] if values.ndim else 1
+        return self
+
+    def merge(self,other):
+        if other.bins != self.bins or other.domain != self.domain:
+            raise ValueError('can only merge densities with the same bins and domain')
+        self.counts  += other.counts
+        self.outside += other.outside
+        self.steps    = max(self.steps,other.steps)
+        return self
+
+    def __add__(self,other):
+        total = DensityAccumulator(self.bins,self.domain)
+        return total.merge(self).merge(other)
+
+    def width(self):
+        low, high = self.domain
+        return (high-low)/self.bins
+
+    def centres(self):
+        return self.domain[0] + (numpy.arange(self.bins)+0.5)*self.width()
+
+    def density(self):
+        return self.counts/(self.counts.sum()*self.width())
+
+    def save(self,path):
+        temp = path + f'.{os.getpid()}.tmp'
+        with open(temp,'wb') as file:
+            numpy.savez(file,counts=self.counts,domain=self.domain,outside=self.outside,
+                        steps=self.steps,state=numpy.nan if self.state is None else self.state,
+                        **{f'run_{name}': value for name, value in self.run.items()})
+        os.replace(temp,path)
+
+    @classmethod
+    def load(cls,path):
+        with numpy.load(path) as data:
+            density         = cls(len(data['counts']),tuple(data['domain']))
+            density.counts  = data['counts']
+            density.outside = int(data['outside'])
+            density.steps   = int(data['steps'])
+            state           = data['state']
+            density.state   = None if numpy.all(numpy.isnan(state)) else state
+            density.run     = {name[4:]: data[name] for name in data.files
+                               if name.startswith('run_')}
+        return density
+
+    def same_run(self,run):
+        return (set(self.run) == set(run)
+                and all(numpy.array_equal(self.run[name],run[name]) for name in run))
+
+'''
+The density of the orbits of f at parameter r from x0, over x_n for n = transients, ...,
+iterations (as for iterate_orbits). x0 can be an array of starting values, in which case all
+of the orbits go into the one histogram: stepping many orbits together is much faster per
+value than one long orbit, and with perturbation they all end up independent. The domain
+defaults to the domain of the map.
+
+With checkpoint (a file name) the counts and state are saved every `every` chunks (of chunk
+steps of every orbit) and at the end, and if the file already exists the run carries on from
+it rather than starting again. The checkpoint records the map, r, x0, transients and
+perturbation it was written for, and one written for any other values (or bins or domain) is
+refused with a ValueError rather than merged into the new run; only iterations can differ, so
+that a finished run can be carried on for longer.
+With backend and workers the starting values are shared out between workers with sweep, each
+worker accumulating its own histogram, and the histograms are merged at the end (checkpoints
+are then not used).
+With a tolerance (and no checkpoint, as a settled orbit has no state to carry on from) each
+orbit stops once it has settled onto a cycle and the rest of it is binned from the cycle (see
+dynamical_systems.cycles.cycle_counts), which is what most starting values do at a periodic r.
+'''
+
+def accumulate_density(f,r,x0,iterations,transients,bins,domain=None,perturbation=0,
+                       chunk=1000,checkpoint=None,every=1000,tolerance=None,max_period=64):
+    f       = get_map(f)
+    domain  = domain if domain is not None else getattr(f,'domain',(0,1))
+    kept    = iterations - transients + 1
+    density = DensityAccumulator(bins,domain)
+    run     = dict(map=getattr(f,'name',getattr(f,'__name__',repr(f))),
+                   r=numpy.asarray(r,float),x0=numpy.asarray(x0,float),transients=transients,
+                   perturbation=perturbation)
+    if tolerance is not None and checkpoint is None:
+        def add(rows,r,x,weights):
+            with stage('density binning'):
+                density.update(x,weights)
+
+        cycle_counts(f,r,x0,iterations,transients,add,perturbation,tolerance,max_period,chunk)
+        density.steps = kept
+        return density
+    if checkpoint is not None and os.path.exists(checkpoint):
+        density = DensityAccumulator.load(checkpoint)
+        if density.bins != bins or density.domain != tuple(domain):
+            raise ValueError(f'checkpoint {checkpoint} has different bins or domain')
+        if not density.same_run(run):
+            raise ValueError(f'checkpoint {checkpoint} was written for a different map, r, x0, '
+                             f'transients or perturbation')
+        if density.steps >= kept:
+            return density
+        x0, iterations, transients, perturbation = density.state, kept-density.steps-1, 0, 0
+    density.run = run
+    for i, block in enumerate(orbit_chunks(f,r,x0,iterations,transients,perturbation,chunk,
+                                           cache=False)):
+        with stage('density binning'):
+            density.update(block)
+        with numpy.errstate(over='ignore',invalid='ignore'):
+            density.state = f(r,block[...,-1])
+        if checkpoint is not None and (i+1) % every == 0:
+            density.save(checkpoint)
+    if checkpoint is not None:
+        density.save(checkpoint)
+    return density
+
+def invariant_density(f,r,x0,iterations,transients,bins,domain=None,perturbation=0,chunk=1000,
+                      checkpoint=None,every=1000,backend='serial',workers=None,tolerance=None,
+                      max_period=64):
+    if backend == 'serial':
+        return accumulate_density(f,r,x0,iterations,transients,bins,domain,perturbation,chunk,
+                                  checkpoint,every,tolerance,max_period)
+    starts = numpy.atleast_1d(numpy.asarray(x0,float))
+    return sweep(partial(accumulate_density,f,r),starts,iterations,transients,bins,domain,
+                 perturbation,chunk,tolerance=tolerance,max_period=max_period,backend=backend,
+                 workers=workers,combine='sum')
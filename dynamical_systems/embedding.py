@@ -0,0 +1,25 @@
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+'''
+Time delay embedding of an orbit. Row n of the embedded matrix is the vector
+(x_n, x_n+tau, x_n+2tau, ..., x_n+(m-1)tau), so the matrix has m columns (the embedding
+dimension) and len(x)-(m-1)tau rows. Every row overlaps the next, so instead of copying the
+orbit m times the matrix is returned as a strided view onto the orbit itself: no data is
+copied, whatever m and tau are. The view is read only since writing to one entry would change
+every other entry that shares the same orbit value.
+
+x can also be a batch of orbits (e.g. the (n_r, n_kept) output of the orbit engine), in which
+case the embedding is taken along the last axis and the output has shape (n_r, rows, m).
+'''
+
+def delay_embedding(x,m,tau=1):
+    x    = numpy.asarray(x)
+    rows = x.shape[-1] - (m-1)*tau
+    if m < 1 or tau < 1:
+        raise ValueError('the embedding dimension m and the delay tau must be at least 1')
+    if rows < 1:
+        raise ValueError(f'an orbit of {x.shape[-1]} points is too short for m={m}, tau={tau}')
+    step = x.strides[-1]
+    return as_strided(x,shape=x.shape[:-1] + (rows,m),strides=x.strides[:-1] + (step,tau*step),
+                      writeable=False)
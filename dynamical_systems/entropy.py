@@ -0,0 +1,121 @@
+import numpy
+from functools import partial
+from dynamical_systems.cache import resolve_cache
+from dynamical_systems.cycles import cycle_counts
+from dynamical_systems.instrument import stage
+from dynamical_systems.maps import get_map
+from dynamical_systems.orbit import orbit_chunks
+from dynamical_systems.streams import value_uniform
+from dynamical_systems.sweep import sweep
+
+'''
+Shannon entropy of the orbit values. The domain is cut into bins equal boxes and each orbit's
+values are counted into them, giving one row of counts per orbit, i.e. an (n_r, bins) count
+matrix for a grid of r. The matrix is filled with integer bincounts (the box of every value
+offset by bins times its row) instead of a numpy.unique per r, and the entropy -sum(p ln p) of
+every row is then one reduction over the matrix. Values outside the domain (e.g. an orbit that
+has escaped) are not counted, which is only checked for when there are any, and a value exactly
+on the upper edge goes in the last box.
+
+The rows are binned a group at a time, the group being as many rows as make up about
+block_size values, so the box numbers of a group (written straight from the scaled values into
+an integer array, in the same memory order as the orbits so nothing is transposed) and the
+bins*group counts they are added into both stay in the cache, rather than every pass going
+over the whole block of orbits and one bincount scattering into the full count matrix.
+
+weights (broadcast against the orbits) counts each value that many times, as for the values
+of a settled cycle. base is 'e' for nats, or any number (e.g. 2 for bits).
+'''
+
+def entropy_counts(orbits,bins,domain=(0,1),block_size=2**17,weights=None):
+    low, high = domain
+    orbits    = numpy.asarray(orbits,float)
+    rows      = orbits.reshape(-1,orbits.shape[-1]) if orbits.ndim else orbits.reshape(1,1)
+    if weights is not None:
+        weights = numpy.broadcast_to(weights,orbits.shape).reshape(rows.shape)
+    counts    = numpy.zeros((len(rows),bins),numpy.int64)
+    group     = max(1,block_size//max(rows.shape[1],1))
+    offset    = numpy.arange(min(group,len(rows)))[:,None]*bins
+    scale     = bins/(high-low)
+    for start in range(0,len(rows) if rows.size else 0,group):
+        part  = rows[start:start+group]
+        index = numpy.empty_like(part,numpy.intp)
+        with numpy.errstate(invalid='ignore'):
+            numpy.multiply(part - low if low else part,scale,out=index,casting='unsafe')
+        least, most = part.min(), part.max()
+        if not most < high:
+            numpy.minimum(index,bins-1,out=index)
+        index += offset[:len(part)]
+        values = index.ravel('K' if weights is None else 'C')
+        weight = None if weights is None else weights[start:start+group].ravel()
+        if not (least >= low and most <= high):
+            inside = (part >= low) & (part <= high)
+            values = index[inside]
+            weight = None if weights is None else weights[start:start+group][inside]
+        counts[start:start+group] = numpy.bincount(values,weight,minlength=len(part)*bins
+                                                   ).reshape(len(part),bins)
+    return counts.reshape(orbits.shape[:-1] + (bins,))
+
+def shannon_entropy(counts,base='e'):
+    counts = numpy.asarray(counts)
+    total  = counts.sum(axis=-1,keepdims=True)
+    with numpy.errstate(divide='ignore',invalid='ignore'):
+        p       = counts/total
+        entropy = -numpy.where(p > 0,p*numpy.log(p),0).sum(axis=-1)
+    if base != 'e':
+        entropy = entropy/numpy.log(base)
+    return entropy
+
+'''
+The entropy for every r in a grid, with the orbits from the orbit engine (same arguments as
+iterate_orbits). The counts are built up a chunk of steps at a time so the orbits are never
+held whole, and the grid can be shared out between workers with the backend and workers
+arguments of sweep. The domain, and so the boxes, default to the domain of the map. With a
+tolerance (and no cache) each orbit stops once it has settled onto a cycle and the rest of it
+is counted from the cycle (see dynamical_systems.cycles.cycle_counts), so the periodic part of
+a sweep costs next to nothing; the counts then differ from the full ones only where a value of
+the cycle is within the tolerance of the edge of a box. per_value draws the perturbation of each
+orbit from the stream of its r, as for dynamical_systems.box.box_dimensions, so the entropy for
+an r is the same whatever grid it is worked out in. With periods=True (which needs a tolerance)
+the period each orbit settled onto comes back as well, 0 where it did not settle, from the same
+pass as the counts (see dynamical_systems.cycles.cycle_counts).
+'''
+
+def orbit_entropy_counts(f,r,x0,iterations,transients,bins,domain=None,perturbation=0,
+                         chunk=1000,cache=None,tolerance=None,max_period=64,per_value=False,
+                         periods=False):
+    f      = get_map(f)
+    if periods and (tolerance is None or resolve_cache(cache) is not None):
+        raise ValueError('periods are only found with a tolerance and no cache')
+    if per_value and perturbation:
+        x0, perturbation = x0 + value_uniform(r)*perturbation, 0
+    domain = domain if domain is not None else getattr(f,'domain',(0,1))
+    if tolerance is not None and resolve_cache(cache) is None:
+        shape  = numpy.broadcast_shapes(numpy.shape(r),numpy.shape(x0))
+        counts = numpy.zeros((int(numpy.prod(shape)),bins),numpy.int64)
+
+        def add(rows,r,x,weights):
+            with stage('entropy binning'):
+                counts[rows] += entropy_counts(x,bins,domain,weights=weights)
+
+        period = cycle_counts(f,r,x0,iterations,transients,add,perturbation,tolerance,
+                              max_period,chunk)[0]
+        counts = counts.reshape(shape + (bins,))
+        return (counts, period) if periods else counts
+    counts = 0
+    for block in orbit_chunks(f,r,x0,iterations,transients,perturbation,chunk,cache):
+        with stage('entropy binning'):
+            counts = counts + entropy_counts(block,bins,domain)
+    return counts
+
+def entropy_sweep(f,r,x0,iterations,transients,bins,base='e',domain=None,perturbation=0,
+                  chunk=1000,cache=None,backend='serial',workers=None,tolerance=None,
+                  max_period=64,per_value=False,periods=False):
+    counts = sweep(partial(orbit_entropy_counts,f),r,x0,iterations,transients,bins,domain,
+                   perturbation,chunk,cache,tolerance,max_period,per_value,periods,
+                   backend=backend,workers=workers)
+    if periods:
+        counts, period = counts
+    with stage('entropy'):
+        entropy = shannon_entropy(counts,base)
+    return (entropy, period) if periods else entropy
@@ -0,0 +1,77 @@
+import os
+import sys
+import importlib.util
+import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from dynamical_systems.results import Panels
+
+'''
+Writing results to image files without pyplot. Each figure is a matplotlib Figure with its own
+Agg canvas, so no backend is chosen, no window is opened and nothing is kept by pyplot after the
+file is written, which is what is wanted for writing hundreds of figures on a machine with no
+display. The format (png, svg, pdf...) is taken from the file name unless given. A Panels
+result is drawn onto the whole figure, any other result onto a single axes.
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def figure(size=(6.4,4.8),dpi=100):
+    fig = Figure(figsize=size,dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+def save_figure(result,path,format=None,size=(6.4,4.8),dpi=100):
+    fig = figure(size,dpi)
+    result.draw(fig if isinstance(result,Panels) else fig.add_subplot())
+    fig.savefig(path,format=format)
+    return path
+
+'''
+The analyses are the functions in the map scripts, which live in folders with spaces in their
+names and so are loaded straight from their files (once each). If pyplot has not been imported
+yet the Agg backend is selected first, so loading the scripts never brings up an interactive
+backend.
+'''
+
+SCRIPTS = {}
+
+def load_script(path):
+    path = os.path.abspath(os.path.join(ROOT,path))
+    if path not in SCRIPTS:
+        if 'matplotlib.pyplot' not in sys.modules:
+            matplotlib.use('Agg')
+        name   = 'script_' + ''.join(c if c.isalnum() else '_' for c in
+                                     os.path.splitext(os.path.basename(path))[0])
+        spec   = importlib.util.spec_from_file_location(name,path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        SCRIPTS[path] = module
+    return SCRIPTS[path]
+
+'''
+Run a list of jobs and write out their figures. Each job is a dict with
+
+    script    path of the script, relative to the top of the repository
+    function  name of the analysis function in it, called with graph=None so that it only
+              works out its Result
+    args      list of positional arguments (optional)
+    kwargs    dict of keyword arguments (optional)
+    name      file name to write, without the extension (defaults to function and job number)
+    formats   list of formats (optional, defaults to formats)
+
+and the figures are written to directory. Returns the paths written, in job order.
+'''
+
+def export_jobs(jobs,directory='.',formats=('png',),size=(6.4,4.8),dpi=100):
+    os.makedirs(directory,exist_ok=True)
+    paths = []
+    for number, job in enumerate(jobs):
+        module = load_script(job['script'])
+        result = getattr(module,job['function'])(*job.get('args',[]),graph=None,
+                                                 **job.get('kwargs',{}))
+        name   = job.get('name',f"{job['function']}_{number}")
+        for format in job.get('formats',formats):
+            path = os.path.join(directory,f'{name}.{format}')
+            paths.append(save_figure(result,path,format,size,dpi))
+    return paths
@@ -0,0 +1,103 @@
+import numpy
+from dynamical_systems.maps import get_map
+
+'''
+The period doubling cascade located directly rather than read off a bifurcation plot. The
+superstable parameter r_n is the r at which the critical point c (the top of the hump) lies on
+the period 2^n cycle, i.e. a root of
+
+    g_n(r) = f^(2^n)(r,c) - c
+
+where f^(p) is the map applied p times. Between r_n and r_(n+1) there are no other roots of
+g_(n+1) apart from r_n itself, and the gaps shrink by about the Feigenbaum constant
+delta = 4.669... each time, so r_(n+1) is bracketed by scanning g_(n+1) over a short stretch
+after r_n (set by the previous gap) and then refined by Newton's method kept inside the
+bracket (bisection when a step leaves it). The derivative of g with respect to r is carried
+along the 2^n steps by the chain rule, dx_(k+1)/dr = df/dr(r,x_k) + f'(r,x_k) dx_k/dr, using the
+map's parameter_derivative, or the refinement is plain bisection if the map does not have one.
+
+Each r_n costs a few dozen passes of 2^n steps, so the first dozen take milliseconds, against
+bifurcation sweeps at a resolution of 1e-9 in r. Past about n = 13 the gaps are near the
+precision of a double and the roots stop being meaningful.
+'''
+
+def cycle_residual(f,r,p):
+    f     = get_map(f)
+    x     = numpy.full(numpy.shape(r),f.critical,float)
+    dx    = numpy.zeros(numpy.shape(r),float)
+    slope = getattr(f,'parameter_derivative',None)
+    for i in range(p):
+        if slope is not None:
+            dx = slope(r,x) + f.derivative(r,x)*dx
+        x  = f(r,x)
+    return x - f.critical, (dx if slope is not None else None)
+
+def refine_root(f,p,a,b,tolerance=1e-15,steps=200):
+    ga   = cycle_residual(f,a,p)[0]
+    r    = (a+b)/2
+    for i in range(steps):
+        g, dg = cycle_residual(f,r,p)
+        if g == 0:
+            return r
+        if numpy.sign(g) == numpy.sign(ga):
+            a, ga = r, g
+        else:
+            b = r
+        step = r - g/dg if dg is not None and dg != 0 else None
+        new  = step if step is not None and a < step < b else (a+b)/2
+        if abs(new - r) <= tolerance*abs(r) or b - a <= tolerance*abs(r):
+            return new
+        r = new
+    return r
+
+def first_root(f,p,low,high,scan):
+    r    = numpy.linspace(low,high,scan)
+    g    = cycle_residual(f,r,p)[0]
+    sign = numpy.flatnonzero(numpy.signbit(g[1:]) != numpy.signbit(g[:-1]))
+    if len(sign) == 0:
+        return None
+    return refine_root(f,p,r[sign[0]],r[sign[0]+1])
+
+'''
+The first count superstable parameters r_0, r_1, ... of the cascade of f, starting from the
+first superstable fixed point in the map's parameter range. The first two are found by
+scanning the parameter range on a grid of scan points, the rest from the shrinking gaps.
+Raises ValueError if the map has no critical point or no cascade (the tent map, for example,
+never period doubles).
+'''
+
+def superstable_parameters(f,count=10,scan=1000):
+    f = get_map(f)
+    if getattr(f,'critical',None) is None:
+        raise ValueError(f'{f!r} has no critical point')
+    low, high = f.parameter_range
+    roots     = []
+    for n in range(count):
+        if n < 2:
+            start = roots[-1] if roots else low
+            root  = first_root(f,2**n,start + (high-start)/scan,high,scan)
+        else:
+            gap   = roots[-1] - roots[-2]
+            root  = first_root(f,2**n,roots[-1] + gap/100,roots[-1] + gap*0.6,64)
+        if root is None:
+            if n < 2:
+                raise ValueError(f'no period doubling cascade found for {f!r}')
+            break
+        roots.append(root)
+    return numpy.array(roots)
+
+'''
+The superstable parameters together with the estimates of the Feigenbaum constant from each
+three in a row, delta_n = (r_(n-1) - r_(n-2))/(r_n - r_(n-1)), and the onset of chaos r_inf
+extrapolated from the last gap as a geometric series with the last delta,
+r_inf = r_n + (r_n - r_(n-1))/(delta - 1).
+'''
+
+def feigenbaum_constants(f,count=12,scan=1000):
+    r     = superstable_parameters(f,count,scan)
+    gaps  = numpy.diff(r)
+    delta = gaps[:-1]/gaps[1:]
+    if len(delta) == 0:
+        raise ValueError('at least three superstable parameters are needed')
+    r_inf = r[-1] + gaps[-1]/(delta[-1] - 1)
+    return r, delta, r_inf
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+'''
+Opt-in timing of the stages of an analysis. The engine and analysis functions mark their
+stages (iterating the map, discarding transients, sampling, box counting, fitting, binning,
+drawing...) with
+
+    with stage('box counting'):
+        ...
+
+which does nothing (stage() hands back the same empty context every time) unless a Profiler
+has been switched on, so the marks cost next to nothing when profiling is off. With a Profiler
+on, every stage records its wall time and number of calls and, if the profiler was made with
+memory=True, the peak bytes allocated while it ran above what was allocated when it started
+(measured with tracemalloc, which slows things down, so it is off by default). Stages can be
+nested, the time of a stage includes the stages inside it. Each thread nests its stages on a
+stack of its own, so the stages of a sweep run on backend='thread' are recorded as they are
+nested in their own worker, but tracemalloc counts the allocations of the whole process, so
+with memory=True the peak of a stage run alongside others in other threads also includes what
+they allocated while it ran.
+
+    with profiling(memory=True) as profiler:
+        Overlay_plot(...)
+    print(profiler.summary())
+    profiler.trace('overlay.json')
+
+The trace is a Chrome trace (open it at chrome://tracing or in Perfetto) with one bar per call
+of each stage. Only stages run in this process are recorded, i.e. not those run in workers of a
+process pool.
+'''
+
+class Profiler:
+    def __init__(self,memory=False):
+        self.memory = memory
+        self.totals = {}
+        self.events = []
+        self.local  = threading.local()
+        self.stacks = []
+        self.start  = time.perf_counter()
+        self.lock   = threading.Lock()
+
+    @contextmanager
+    def stage(self,name):
+        if self.memory:
+            self.enter_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end  = time.perf_counter()
+            peak = self.exit_memory() if self.memory else 0
+            self.record(name,start,end,peak)
+
+    '''
+    tracemalloc has a single peak, so before it is reset for a new stage the peak so far is
+    folded into every stage still open (in any thread), and when a stage ends its own peak is
+    folded into the stage it is inside. The open stages are kept on one stack per thread, all
+    of them changed under the lock.
+    '''
+
+    def frames(self):
+        stack = getattr(self.local,'stack',None)
+        if stack is None:
+            stack = self.local.stack = []
+            self.stacks.append(stack)
+        return stack
+
+    def enter_memory(self):
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            for stack in self.stacks:
+                for frame in stack:
+                    frame[1] = max(frame[1],peak)
+            self.frames().append([current,current])
+            tracemalloc.reset_peak()
+
+    def exit_memory(self):
+        with self.lock:
+            stack      = self.frames()
+            base, peak = stack.pop()
+            peak       = max(peak,tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1][1] = max(stack[-1][1],peak)
+            return peak - base
+
+    def record(self,name,start,end,peak):
+        with self.lock:
+            calls, seconds, most = self.totals.get(name,(0,0.0,0))
+            self.totals[name] = (calls+1,seconds+end-start,max(most,peak))
+            self.events.append({'name':name,'ph':'X','pid':os.getpid(),
+                                'tid':threading.get_ident(),
+                                'ts':(start-self.start)*1e6,'dur':(end-start)*1e6,
+                                'args':{'peak_bytes':peak} if self.memory else {}})
+
+    def stop(self):
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def table(self):
+        return [{'stage':name,'calls':calls,'seconds':seconds,'mean':seconds/calls,
+                 'peak_bytes':peak}
+                for name, (calls,seconds,peak) in sorted(self.totals.items(),
+                                                         key=lambda item: -item[1][1])]
+
+    def summary(self):
+        lines = [f"{'stage':30} {'calls':>8} {'total s':>10} {'mean ms':>10}"
+                 + (f" {'peak MiB':>10}" if self.memory else '')]
+        for row in self.table():
+            lines.append(f"{row['stage']:30} {row['calls']:>8} {row['seconds']:10.4f} "
+                         f"{row['mean']*1e3:10.3f}"
+                         + (f" {row['peak_bytes']/2**20:10.2f}" if self.memory else ''))
+        return '\n'.join(lines)
+
+    def trace(self,path):
+        with open(path,'w') as file:
+            json.dump({'traceEvents':self.events,'displayTimeUnit':'ms'},file)
+
+PROFILER = None
+NOTHING  = nullcontext()
+
+def set_profiler(profiler):
+    global PROFILER
+    PROFILER = profiler
+
+def stage(name):
+    if PROFILER is None:
+        return NOTHING
+    return PROFILER.stage(name)
+
+@contextmanager
+def profiling(memory=False):
+    profiler = Profiler(memory)
+    previous = PROFILER
+    set_profiler(profiler)
+    try:
+        yield profiler
+    finally:
+        set_profiler(previous)
+        profiler.stop()
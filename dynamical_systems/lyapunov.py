@@ -0,0 +1,59 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.cache import resolve_cache
+from dynamical_systems.cycles import cycle_lyapunov
+from dynamical_systems.instrument import stage
+from dynamical_systems.orbit import initial_state, orbit_chunks
+
+'''
+The Lyapunov exponent (1/n)sum(ln|f'(x_n)|) for every r in a grid at once, using the
+derivative that the map declares in the registry. The orbit is never stored, only a running
+sum of ln|f'(x)| per orbit, so the memory used is the same for 10^3 or 10^8 steps. The
+arguments are the same as for iterate_orbits and the average is taken over x_n for
+n = transients, ..., iterations. The output has one exponent per orbit, i.e. shape (n_r,).
+
+At a superstable point f'(x) = 0 and ln|f'(x)| is -inf, which would swamp the whole average.
+Instead |f'(x)| is clipped from below at floor (the smallest positive double by default) so
+each such step adds about -708 to the sum, the mean stays finite and superstable orbits show up
+as very negative exponents rather than -inf and a divide by zero warning.
+
+With an orbit cache (see dynamical_systems.cache) the orbit is read back from the cache a chunk
+at a time instead of being generated again, so a repeated analysis does not iterate the map.
+
+With a tolerance (and no cache) each orbit is stopped once it has settled onto a cycle of
+period at most max_period and the rest of its sum is taken from the cycle (see
+dynamical_systems.cycles), which makes sweeps over mostly stable ranges much cheaper. The
+exponents then differ from the full sum by roughly the tolerance, and most near the
+bifurcation points, where the orbits converge slowest.
+'''
+
+FLOOR = numpy.finfo(float).tiny
+
+def lyapunov_exponents(f,r,x0,iterations,transients,perturbation=0,floor=FLOOR,cache=None,
+                       tolerance=None,max_period=64):
+    f     = get_map(f)
+    cache = resolve_cache(cache)
+    if tolerance is not None and cache is None:
+        return cycle_lyapunov(f,r,x0,iterations,transients,perturbation,floor,tolerance,
+                              max_period)
+    r, x  = initial_state(r,x0,perturbation)
+    kept  = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    total = numpy.zeros(x.shape,float)
+    if cache is not None:
+        for block in orbit_chunks(f,r,x0,iterations,transients,perturbation,cache=cache):
+            with numpy.errstate(over='ignore',invalid='ignore'), stage('lyapunov sum'):
+                d = numpy.abs(f.derivative(r[...,None],block))
+                total += numpy.log(numpy.maximum(d,floor)).sum(axis=-1)
+        return total/kept
+    with numpy.errstate(over='ignore',invalid='ignore'):
+        with stage('transients'):
+            for i in range(transients):
+                x = f(r,x)
+        with stage('iterate and lyapunov sum'):
+            for i in range(kept):
+                total += numpy.log(numpy.maximum(numpy.abs(f.derivative(r,x)),floor))
+                if i < kept-1:
+                    x = f(r,x)
+    return total/kept
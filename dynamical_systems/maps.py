@@ -0,0 +1,130 @@
+import numpy
+from functools import partial
+
+'''
+The 1D maps used throughout the scripts, their derivatives with respect to x and with respect
+to the parameter r. All of them are written with numpy operations only (no python if
+statements) so that r and x can be whole arrays, which is what the orbit engine and every sweep
+needs.
+'''
+
+#The logistic map and its derivatives
+def logistic(r,x):
+    return r*x*(1-x)
+
+def logistic_derivative(r,x):
+    return r*(1-2*x)
+
+def logistic_parameter_derivative(r,x):
+    return x*(1-x)
+
+#The tent map, rx for x<0.5 and r(1-x) otherwise, and its derivatives
+def tent(r,x):
+    return numpy.where(x < 0.5, r*x, r*(1-x))
+
+def tent_derivative(r,x):
+    return numpy.where(x < 0.5, r, -r)
+
+def tent_parameter_derivative(r,x):
+    return numpy.minimum(x,1-x)
+
+#The skew tent map, a tent whose peak (of height r/2) is at x=a rather than 0.5, and its
+#derivatives. With a=0.5 it is the tent map above.
+def skew_tent(r,x,a=0.5):
+    return numpy.where(x < a, r*x/(2*a), r*(1-x)/(2*(1-a)))
+
+def skew_tent_derivative(r,x,a=0.5):
+    return numpy.where(x < a, r/(2*a), -r/(2*(1-a)))
+
+def skew_tent_parameter_derivative(r,x,a=0.5):
+    return numpy.where(x < a, x/(2*a), (1-x)/(2*(1-a)))
+
+#The sine map rsin(pi*x) and its derivatives
+def sine(r,x):
+    return r*numpy.sin(numpy.pi*x)
+
+def sine_derivative(r,x):
+    return r*numpy.pi*numpy.cos(numpy.pi*x)
+
+def sine_parameter_derivative(r,x):
+    return numpy.sin(numpy.pi*x)
+
+'''
+A Map bundles together everything an analysis needs to know about one of the maps: the map
+itself, its derivative (for Lyapunov exponents), the range of the parameter r over which it
+is well defined and the domain that the orbit lives in (for binning in the entropy, density and
+box counting code). Calling a Map steps it once, so a Map can be used anywhere a plain f(r,x)
+function is expected.
+
+Maps with a single hump also give the critical point, the x at the top of the hump, and
+optionally the derivative with respect to r, which are what is needed to locate the
+superstable parameters of the period doubling cascade (see dynamical_systems.feigenbaum).
+'''
+
+class Map:
+    def __init__(self,name,function,derivative,parameter_range,domain,critical=None,
+                 parameter_derivative=None):
+        self.name                 = name
+        self.function             = function
+        self.derivative           = derivative
+        self.parameter_range      = parameter_range
+        self.domain               = domain
+        self.critical             = critical
+        self.parameter_derivative = parameter_derivative
+
+    def __call__(self,r,x):
+        return self.function(r,x)
+
+    def __repr__(self):
+        return f'Map({self.name!r}, r in {self.parameter_range}, x in {self.domain})'
+
+    def in_range(self,r):
+        low, high = self.parameter_range
+        return (numpy.asarray(r) >= low) & (numpy.asarray(r) <= high)
+
+'''
+The registry of maps by name. New maps are added with register_map and looked up with get_map,
+which also passes Map objects (and plain functions) straight through so that every analysis
+can take either a name such as 'tent' or the map itself.
+'''
+
+MAPS = {}
+
+def register_map(map):
+    MAPS[map.name] = map
+    return map
+
+def get_map(map):
+    if isinstance(map,str):
+        try:
+            return MAPS[map]
+        except KeyError:
+            raise ValueError(f'unknown map {map!r}, registered maps are {sorted(MAPS)}') from None
+    return map
+
+'''
+A family of maps with a second parameter gives the Map for any value of it, e.g. the skew tent
+for a peak position a. a can be an array that broadcasts against r and x (one value per row of
+a grid, say), which is how a plane of (r,a) is stepped all at once.
+'''
+
+def skew_tent_map(a):
+    return Map('skew_tent',partial(skew_tent,a=a),partial(skew_tent_derivative,a=a),(0,2),(0,1),
+               a,partial(skew_tent_parameter_derivative,a=a))
+
+#the families by name, for looking one up from a name as get_map does for the maps
+FAMILIES = {'skew_tent': skew_tent_map}
+
+def get_family(family):
+    if isinstance(family,str):
+        try:
+            return FAMILIES[family]
+        except KeyError:
+            raise ValueError(f'{family!r} is not a family of maps with a second parameter, the '
+                             f'families are {sorted(FAMILIES)}') from None
+    return family
+
+register_map(Map('logistic',logistic,logistic_derivative,(0,4),(0,1),0.5,
+                 logistic_parameter_derivative))
+register_map(Map('tent',tent,tent_derivative,(0,2),(0,1),0.5,tent_parameter_derivative))
+register_map(Map('sine',sine,sine_derivative,(0,1),(0,1),0.5,sine_parameter_derivative))
@@ -0,0 +1,105 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.cache import resolve_cache
+from dynamical_systems.instrument import stage
+from dynamical_systems.streams import choose, row_uniform
+
+'''
+The orbit engine. Rather than iterating the map for one value of the parameter r at a time
+inside a python loop, the whole grid of r values (and optionally a grid of initial values x0)
+is held as one numpy state vector and every point is stepped forward together. One step of
+the map is then a handful of numpy operations on the full grid instead of thousands of
+interpreted calls, which is where all the time in the old sweeps went.
+
+r and x0 are broadcast against each other, so a scalar x0 with an array of r values gives one
+orbit per r, and r[:,None] with x0[None,:] gives one orbit for every pair (r,x0). The map f
+is either the name of a registered map ('logistic', 'tent', 'sine'), a Map, or any function
+f(r,x) that accepts arrays.
+
+The output keeps the values x_n for n = transients, transients+1, ..., iterations where x_0
+is the initial value, so the last axis has iterations-transients+1 entries and the output has
+shape (n_r, n_kept) for a 1D grid of r. A small random perturbation can be added to every
+initial value to remove synchronisation artifacts, as the single r functions in the scripts do.
+It is drawn from the seeded row streams of dynamical_systems.streams, so the same grid always
+gets the same perturbation, whether it is run whole or in chunks by sweep.
+
+If an OrbitCache is given (or one has been set as the default, see dynamical_systems.cache)
+the orbits come from, or are saved to, the cache and a read only memory map is returned.
+'''
+
+def initial_state(r,x0,perturbation=0):
+    r, x  = numpy.broadcast_arrays(numpy.asarray(r,float),numpy.asarray(x0,float))
+    x     = numpy.array(x,float)
+    if perturbation:
+        x = x + row_uniform(x.shape)*perturbation
+    return r, x
+
+def iterate_orbits(f,r,x0,iterations,transients,perturbation=0,cache=None):
+    f     = get_map(f)
+    cache = resolve_cache(cache)
+    if cache is not None:
+        return cache.orbits(f,r,x0,iterations,transients,perturbation)
+    r, x  = initial_state(r,x0,perturbation)
+    kept  = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    orbit = numpy.empty((kept,) + x.shape, float)
+    with numpy.errstate(over='ignore',invalid='ignore'):
+        with stage('transients'):
+            for i in range(transients):
+                x = f(r,x)
+        with stage('iterate'):
+            orbit[0] = x
+            for i in range(1,kept):
+                x = f(r,x)
+                orbit[i] = x
+    return numpy.moveaxis(orbit,0,-1)
+
+'''
+The same orbits as iterate_orbits but handed out a block of at most chunk steps at a time, each
+block having shape (n_r, steps in block). Only one block is held in memory, so consumers that
+only need running totals (histograms, images, sums) can work on orbits far longer than would
+fit in memory as a single array. With a cache the blocks are read in turn from the cached file.
+'''
+
+def orbit_chunks(f,r,x0,iterations,transients,perturbation=0,chunk=1000,cache=None):
+    f     = get_map(f)
+    cache = resolve_cache(cache)
+    if cache is not None:
+        orbits = cache.orbits(f,r,x0,iterations,transients,perturbation,chunk)
+        for start in range(0,orbits.shape[-1],chunk):
+            yield numpy.array(orbits[...,start:start+chunk])
+        return
+    r, x  = initial_state(r,x0,perturbation)
+    kept  = iterations - transients + 1
+    if kept < 1:
+        raise ValueError('iterations must be at least the number of transients')
+    with numpy.errstate(over='ignore',invalid='ignore'), stage('transients'):
+        for i in range(transients):
+            x = f(r,x)
+    for start in range(0,kept,chunk):
+        block = numpy.empty((min(chunk,kept-start),) + x.shape, float)
+        with numpy.errstate(over='ignore',invalid='ignore'), stage('iterate'):
+            for i in range(len(block)):
+                if start or i:
+                    x = f(r,x)
+                block[i] = x
+        yield numpy.moveaxis(block,0,-1)
+
+'''
+For plotting we only want a random selection of the kept values for each r (the scripts keep
+half of them). Taking the same random set of columns for every row is a single fancy index
+rather than a shuffle per r, and the columns come from a seeded stream so that the same plot is
+drawn every time (or from stream, e.g. the value_stream of a single r, if one is given). The r values are returned alongside, broadcast to the same shape
+as the sampled x values so the pair can be plotted directly.
+'''
+
+def sample_orbits(r,orbits,sample,stream=None):
+    with stage('sample'):
+        return sample_columns(r,orbits,sample,stream)
+
+def sample_columns(r,orbits,sample,stream=None):
+    columns  = choose(orbits.shape[-1],sample,stream=stream)
+    x_values = orbits[...,columns]
+    r_values = numpy.broadcast_to(numpy.asarray(r,float)[...,None],x_values.shape)
+    return r_values, x_values
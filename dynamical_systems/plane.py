@@ -0,0 +1,119 @@
+import os
+import numpy
+import tempfile
+from functools import partial
+from numpy.lib.format import open_memmap
+from dynamical_systems.maps import get_map
+from dynamical_systems.lyapunov import lyapunov_exponents
+from dynamical_systems.instrument import stage
+from dynamical_systems.streams import PLANE, generator
+from dynamical_systems.sweep import sweep
+
+'''
+The Lyapunov exponent over a plane of two parameters rather than along a line of r: r across
+the columns and, up the rows, either the initial value x0 (y='x0') or the second parameter of a
+family of maps (y='parameter'), where f is then a function giving the Map for an array of that
+parameter, e.g. dynamical_systems.maps.skew_tent_map for the peak position of the skew tent.
+
+A plane of 2048x2048 is 4 million orbits, too many to step as one grid, so it is cut into tiles
+of at most tile x tile pixels, each of which is one grid for the orbit engine. The tiles are
+shared out between threads or processes by sweep (the tile numbers taking the place of the r
+values) and every tile writes its exponents straight into the output, an .npy file opened as a
+memory map (numpy.lib.format.open_memmap) that all the workers share, so no tile is ever sent
+back to the caller and the finished plane is already on disk as a single array file. Without a
+path the plane goes to a temporary file that is read back into memory at the end.
+
+Pixel (i,j) is at the centre of its cell, r = r1 + (j+0.5)(r2-r1)/width and likewise for y.
+With a perturbation, each row of the plane has its own seeded stream of perturbations (see
+dynamical_systems.streams), so the plane is the same whatever the tile size or the number of
+workers. A tolerance stops settled orbits early as for lyapunov_exponents; it is only used with
+y='x0', since the orbits of a family share one map whose parameter array cannot follow them as
+they drop out.
+'''
+
+def plane_axes(r1,r2,y1,y2,width,height):
+    r = r1 + (numpy.arange(width)+0.5)*(r2-r1)/width
+    y = y1 + (numpy.arange(height)+0.5)*(y2-y1)/height
+    return r, y
+
+def plane_tiles(width,height,tile):
+    return [(slice(i,min(i+tile,height)),slice(j,min(j+tile,width)))
+            for i in range(0,height,tile) for j in range(0,width,tile)]
+
+#the perturbations of the pixels in rows and columns of the plane, one seeded stream per row
+def plane_noise(rows,columns):
+    return numpy.stack([generator(PLANE,i).random(columns.stop)[columns]
+                        for i in range(rows.start,rows.stop)])
+
+def tile_lyapunov(f,r,y,x0,iterations,transients,which='x0',noise=None,tolerance=None,
+                  max_period=64):
+    if which == 'x0':
+        start = numpy.broadcast_to(y[:,None],(len(y),len(r)))
+    elif which == 'parameter':
+        f, tolerance = get_map(f(y[:,None])), None
+        start = numpy.broadcast_to(numpy.asarray(x0,float),(len(y),len(r)))
+    else:
+        raise ValueError(f"y must be 'x0' or 'parameter', not {which!r}")
+    if noise is not None:
+        start = start + noise
+    return lyapunov_exponents(f,r[None,:],start,iterations,transients,tolerance=tolerance,
+                              max_period=max_period,cache=False)
+
+#work out the tiles numbered in tiles and write them into the plane at path
+def fill_tiles(tiles,f,r,y,x0,iterations,transients,which,perturbation,tolerance,max_period,
+               path,tile):
+    plane = numpy.load(path,mmap_mode='r+')
+    cuts  = plane_tiles(len(r),len(y),tile)
+    for number in numpy.asarray(tiles,int):
+        rows, columns = cuts[number]
+        noise = plane_noise(rows,columns)*perturbation if perturbation else None
+        with stage('plane tile'):
+            plane[rows,columns] = tile_lyapunov(f,r[columns],y[rows],x0,iterations,transients,
+                                                which,noise,tolerance,max_period)
+    plane.flush()
+    return numpy.ones(len(tiles),bool)
+
+def lyapunov_plane(f,r1,r2,y1,y2,x0,iterations,transients,width=2048,height=2048,y='x0',
+                   perturbation=0,tolerance=None,max_period=64,tile=256,path=None,
+                   dtype=numpy.float32,backend='serial',workers=None):
+    r, ys = plane_axes(r1,r2,y1,y2,width,height)
+    f     = get_map(f) if y == 'x0' else f
+    keep  = path is not None
+    if not keep:
+        handle, path = tempfile.mkstemp(suffix='.npy')
+        os.close(handle)
+    open_memmap(path,mode='w+',dtype=dtype,shape=(height,width)).flush()
+    tiles = numpy.arange(len(plane_tiles(width,height,tile)))
+    try:
+        sweep(partial(fill_tiles,f=f,r=r,y=ys,x0=x0,iterations=iterations,
+                      transients=transients,which=y,perturbation=perturbation,
+                      tolerance=tolerance,max_period=max_period,path=path,tile=tile),
+              tiles,backend=backend,workers=workers,chunks=len(tiles))
+        plane = numpy.load(path,mmap_mode='r' if keep else None)
+    finally:
+        if not keep:
+            os.remove(path)
+    return PlaneImage(r1,r2,y1,y2,plane)
+
+'''
+The finished plane, drawn with imshow like a BifurcationImage (so it can go in a Result as an
+image layer). The colours run from blue (stable) to red (chaotic) and are centred on 0, with
+the very negative exponents of superstable orbits clipped at -clip.
+'''
+
+class PlaneImage:
+    def __init__(self,r1,r2,y1,y2,values):
+        self.r1     = r1
+        self.r2     = r2
+        self.y1     = y1
+        self.y2     = y2
+        self.values = values
+
+    def draw(self,ax=None,shading=None,cmap='RdBu_r',clip=2):
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        limit = min(clip,numpy.nanmax(numpy.abs(self.values))) or 1
+        return ax.imshow(numpy.clip(self.values,-clip,clip),extent=(self.r1,self.r2,self.y1,
+                         self.y2),origin='lower',aspect='auto',cmap=cmap,interpolation='nearest',
+                         vmin=-limit,vmax=limit)
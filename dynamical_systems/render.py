@@ -0,0 +1,116 @@
+import numpy
+from functools import partial
+from dynamical_systems.cache import resolve_cache
+from dynamical_systems.cycles import cycle_counts
+from dynamical_systems.instrument import stage
+from dynamical_systems.maps import get_map
+from dynamical_systems.orbit import orbit_chunks
+from dynamical_systems.sweep import sweep
+
+'''
+Drawing a bifurcation diagram with one scatter (or plot) call per r creates an artist per r
+and keeps millions of points in memory, so for large sweeps matplotlib costs more than the
+maths. Instead the points are binned straight into a fixed size image of (r,x) pixels as the
+orbit engine generates them, and the image is drawn once with imshow. Both the time spent
+drawing and the memory used then depend on the number of pixels and not the number of points.
+
+BifurcationImage holds the pixel counts for r in [r1,r2] (columns) and x in [x1,x2] (rows).
+add() bins any block of points, where r is broadcast against x so a grid of r of shape (n_r,)
+works with an orbit block of shape (n_r,steps). Points outside the image are ignored, points
+exactly on the top or right edge go in the last row or column. weights (broadcast against x)
+counts each point that many times, e.g. the values of a settled cycle once for every step
+that lands on them.
+'''
+
+class BifurcationImage:
+    def __init__(self,r1,r2,x1,x2,width,height):
+        self.r1     = r1
+        self.r2     = r2
+        self.x1     = x1
+        self.x2     = x2
+        self.width  = width
+        self.height = height
+        self.counts = numpy.zeros((height,width),numpy.int64)
+
+    def add(self,r,x,weights=None):
+        with stage('binning'):
+            self.bin(r,x,weights)
+
+    def bin(self,r,x,weights=None):
+        r, x    = numpy.broadcast_arrays(numpy.asarray(r,float),numpy.asarray(x,float))
+        column  = numpy.floor((r-self.r1)/(self.r2-self.r1)*self.width)
+        row     = numpy.floor((x-self.x1)/(self.x2-self.x1)*self.height)
+        column[r == self.r2] = self.width - 1
+        row[x == self.x2]    = self.height - 1
+        inside  = (column >= 0) & (column < self.width) & (row >= 0) & (row < self.height)
+        pixel   = row[inside].astype(numpy.int64)*self.width + column[inside].astype(numpy.int64)
+        weights = None if weights is None else numpy.broadcast_to(weights,x.shape)[inside]
+        counts  = numpy.bincount(pixel,weights,minlength=self.width*self.height)
+        self.counts += counts.reshape(self.height,self.width).astype(numpy.int64,copy=False)
+
+    '''
+    The image to draw. With log shading each pixel is log(1+count) so that both the dense
+    periodic orbits and the sparse chaotic bands are visible, with linear shading it is the
+    count itself. column shading is log shading of each pixel's share of the points in its
+    column, so columns holding more orbits than others (e.g. from an adaptive grid of r) are
+    not drawn darker. Empty pixels are masked so that they are transparent when the image is drawn
+    over another plot (e.g. a Lyapunov exponent on a twin axis).
+    '''
+
+    def shaded(self,shading='log'):
+        if shading == 'log':
+            image = numpy.log1p(self.counts)
+        elif shading == 'linear':
+            image = self.counts.astype(float)
+        elif shading == 'column':
+            total = numpy.maximum(self.counts.sum(axis=0),1)
+            image = numpy.log1p(self.counts*(self.height/total))
+        else:
+            raise ValueError(f"shading must be 'log', 'linear' or 'column', not {shading!r}")
+        return numpy.ma.masked_equal(image,0)
+
+    def draw(self,ax=None,shading='log',cmap='Greys'):
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        return ax.imshow(self.shaded(shading),extent=(self.r1,self.r2,self.x1,self.x2),
+                         origin='lower',aspect='auto',cmap=cmap,interpolation='nearest',vmin=0)
+
+'''
+Build the image for a map directly from the orbit engine. By default there is one value of r
+per pixel column (at the column centres), more can be used with r_per_pixel to fill in the
+columns more smoothly, or the r values can be given explicitly with r_values (e.g. to share
+orbits with another sweep over the same grid through a cache). The x range defaults to the
+domain of the map. The arguments iterations, transients, perturbation and cache are the same
+as for iterate_orbits, and without a cache the orbits are only ever held chunk steps at a time.
+The columns can be shared out between workers with the backend and workers arguments of sweep,
+each worker binning its own r values into a full size count image and the counts being added
+together at the end. With a tolerance (and no cache) each orbit stops once it has settled onto
+a cycle and the rest of it is binned from the cycle, each value weighted by the steps that land
+on it (see dynamical_systems.cycles.cycle_counts), so over the periodic windows the image is
+the same as without one, to within the tolerance, for a fraction of the work.
+'''
+
+def bifurcation_counts(f,r,x0,iterations,transients,r1,r2,x1,x2,width,height,perturbation=0,
+                       chunk=1000,cache=None,tolerance=None,max_period=64):
+    image = BifurcationImage(r1,r2,x1,x2,width,height)
+    if tolerance is not None and resolve_cache(cache) is None:
+        add = lambda rows, r, x, weights: image.add(r[:,None],x,weights)
+        cycle_counts(f,r,x0,iterations,transients,add,perturbation,tolerance,max_period,chunk)
+        return image.counts
+    for block in orbit_chunks(f,r,x0,iterations,transients,perturbation,chunk,cache):
+        image.add(r[:,None],block)
+    return image.counts
+
+def bifurcation_image(f,r1,r2,x0,iterations,transients,width=1000,height=800,xlim=None,
+                      r_per_pixel=1,r_values=None,perturbation=0,chunk=1000,cache=None,
+                      backend='serial',workers=None,tolerance=None,max_period=64):
+    f      = get_map(f)
+    x1, x2 = xlim if xlim is not None else getattr(f,'domain',(0,1))
+    image  = BifurcationImage(r1,r2,x1,x2,width,height)
+    n_r    = width*r_per_pixel
+    r      = r1 + (numpy.arange(n_r)+0.5)*(r2-r1)/n_r if r_values is None else r_values
+    image.counts = sweep(partial(bifurcation_counts,f),r,x0,iterations,transients,r1,r2,x1,x2,
+                         width,height,perturbation,chunk,cache,tolerance,max_period,
+                         backend=backend,workers=workers,combine='sum')
+    return image
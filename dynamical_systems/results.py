@@ -0,0 +1,142 @@
+'''
+The result of an analysis, kept apart from drawing it. A Result holds the arrays the analysis
+worked out (as keyword arguments, read back as attributes, e.g. result.Lyapunov) together with
+a description of how the figure is drawn: the layers of data (scatter, line and image layers,
+each with its matplotlib style arguments), the guides drawn over them (horizontal and vertical
+lines and bands) and the axes labels, limits, grid and title.
+
+Nothing here imports matplotlib. A Result is only drawn when asked, with draw() onto a given
+axes (or the current pyplot axes), or with save() which draws it onto a figure of its own on
+the Agg backend (see dynamical_systems.export), so the numbers can be worked out and reused, or
+figures written out in bulk, without a window ever being opened.
+
+draw(ax,decorate=False) draws only the data layers, for overlaying one result onto the axes of
+another figure. twin(other) draws another result on a second y axis sharing the x axis (e.g. a
+Lyapunov exponent over a bifurcation diagram), with ycolor telling the two y axes apart, and
+legend can be a dict of arguments for ax.legend as grid is for ax.grid.
+'''
+
+class Result:
+    def __init__(self,title=None,xlabel=None,ylabel=None,xlim=None,ylim=None,grid=None,
+                 legend=False,ycolor=None,**data):
+        self.title  = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.xlim   = xlim
+        self.ylim   = ylim
+        self.grid   = grid
+        self.legend = legend
+        self.ycolor = ycolor
+        self.data   = data
+        self.layers = []
+        self.guides = []
+        self.right  = None
+
+    def __getattr__(self,name):
+        try:
+            return self.__dict__['data'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __repr__(self):
+        return f'Result({self.title!r}, data={sorted(self.data)})'
+
+    def scatter(self,x,y,**style):
+        self.layers.append(('scatter',(x,y),style))
+        return self
+
+    def line(self,x,y,**style):
+        self.layers.append(('plot',(x,y),style))
+        return self
+
+    def image(self,image,shading='log'):
+        self.layers.append(('image',(image,shading),{}))
+        return self
+
+    def hline(self,*args,**style):
+        self.guides.append(('axhline',args,style))
+        return self
+
+    def vline(self,*args,**style):
+        self.guides.append(('axvline',args,style))
+        return self
+
+    def hspan(self,*args,**style):
+        self.guides.append(('axhspan',args,style))
+        return self
+
+    def twin(self,other):
+        self.right = other
+        return self
+
+    def draw(self,ax=None,decorate=True):
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        for kind, args, style in self.layers:
+            if kind == 'image':
+                args[0].draw(ax,args[1])
+            else:
+                getattr(ax,kind)(*args,**style)
+        if self.right is not None:
+            self.right.draw(ax.twinx(),decorate)
+        if not decorate:
+            return ax
+        for kind, args, style in self.guides:
+            getattr(ax,kind)(*args,**style)
+        if self.grid is not None:
+            ax.grid(True,**self.grid)
+        if self.xlim is not None:
+            ax.set_xlim(*self.xlim)
+        if self.ylim is not None:
+            ax.set_ylim(*self.ylim)
+        if self.xlabel is not None:
+            ax.set_xlabel(self.xlabel)
+        if self.ylabel is not None:
+            ax.set_ylabel(self.ylabel)
+        if self.ycolor is not None:
+            ax.yaxis.label.set_color(self.ycolor)
+            ax.tick_params(axis='y',labelcolor=self.ycolor)
+        if self.title is not None:
+            ax.set_title(self.title)
+        if self.legend:
+            ax.legend(**(self.legend if isinstance(self.legend,dict) else {}))
+        return ax
+
+    def save(self,path,format=None,size=(6.4,4.8),dpi=100):
+        from dynamical_systems.export import save_figure
+        return save_figure(self,path,format,size,dpi)
+
+'''
+A figure of several results in a grid of rows x columns axes (filled row by row, e.g. the time
+series or return maps for a few values of r side by side), with title, xlabel and ylabel
+for the figure as a whole. It holds its own arrays like a Result and is drawn onto a figure
+(the current pyplot figure by default) rather than onto an axes.
+'''
+
+class Panels(Result):
+    def __init__(self,results,rows=1,columns=None,title=None,xlabel=None,ylabel=None,
+                 sharex=False,**data):
+        super().__init__(title,xlabel,ylabel,**data)
+        self.results = list(results)
+        self.rows    = rows
+        self.columns = columns if columns is not None else -(-len(self.results)//rows)
+        self.sharex  = sharex
+
+    def __repr__(self):
+        return f'Panels({self.title!r}, {len(self.results)} results, data={sorted(self.data)})'
+
+    def draw(self,fig=None,decorate=True):
+        if fig is None:
+            import matplotlib.pyplot as plt
+            fig = plt.gcf()
+        axes = fig.subplots(self.rows,self.columns,sharex=self.sharex,squeeze=False).ravel()
+        for ax, result in zip(axes,self.results):
+            result.draw(ax,decorate)
+        if decorate and self.title is not None:
+            fig.suptitle(self.title)
+        if decorate and self.xlabel is not None:
+            fig.supxlabel(self.xlabel)
+        if decorate and self.ylabel is not None:
+            fig.supylabel(self.ylabel)
+        return axes
@@ -0,0 +1,327 @@
+import os
+import sys
+import zlib
+import struct
+import asyncio
+import hashlib
+import argparse
+import traceback
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.render import bifurcation_counts
+
+'''
+A small local web server for exploring a bifurcation diagram by zooming and panning, rather
+than running a script again with a new r1 and r2. The diagram over the whole parameter range
+and domain of a map is cut into square tiles as for an online map: at zoom z there are 2^z x 2^z
+tiles, tile (z,i,j) being the i-th across in r (from r low) and the j-th down in x (from x high).
+Each tile is worked out when it is first asked for, at exactly its own pixel resolution, from
+samples orbits per pixel column whose points are binned straight into the tile (see
+dynamical_systems.render), so a deep zoom is as sharp as the whole diagram.
+
+The pixel shading is the density of the column's points in that pixel relative to a uniform
+spread over the whole column at this zoom, on a log scale capped at contrast, so the shading
+is the same across tile edges and zoom levels.
+
+Tiles are kept as PNG images in memory (the memory most recently used ones) and on disk (under
+$DYNAMICAL_SYSTEMS_CACHE or ~/.cache/dynamical_systems, in a folder for the map and settings),
+and are worked out in a pool of worker processes so the server keeps answering while they run.
+Several requests for a tile that is being worked out all wait on the one computation. Reading
+and writing the tile files happens in a thread too, never on the event loop, and once the files
+on disk add up to more than max_bytes the least recently used ones are deleted (a file's
+modification time is updated each time it is read), as for dynamical_systems.cache.OrbitCache.
+
+    python -m dynamical_systems.server --map logistic --port 8000
+
+serves a page at http://localhost:8000/ to explore the diagram in, and the tiles themselves
+at /tiles/z/i/j.png.
+'''
+
+TILE = 256
+
+#the r and x ranges covered by tile (z,i,j) of a map
+def tile_bounds(f,z,i,j):
+    f          = get_map(f)
+    r_lo, r_hi = f.parameter_range
+    x_lo, x_hi = f.domain
+    width      = (r_hi-r_lo)/2**z
+    height     = (x_hi-x_lo)/2**z
+    return r_lo + i*width, r_lo + (i+1)*width, x_hi - (j+1)*height, x_hi - j*height
+
+'''
+A grey scale PNG (8 bit, no alpha) of a 2D uint8 array, top row first, written with zlib only.
+'''
+
+def png_chunk(kind,data):
+    return (struct.pack('>I',len(data)) + kind + data
+            + struct.pack('>I',zlib.crc32(kind + data) & 0xffffffff))
+
+def encode_png(pixels):
+    pixels        = numpy.ascontiguousarray(pixels,numpy.uint8)
+    height, width = pixels.shape
+    rows          = numpy.hstack([numpy.zeros((height,1),numpy.uint8),pixels])
+    return (b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR',struct.pack('>IIBBBBB',width,height,8,0,0,0,0))
+            + png_chunk(b'IDAT',zlib.compress(rows.tobytes(),6))
+            + png_chunk(b'IEND',b''))
+
+'''
+Work out one tile and return it as a PNG. This is what runs in the worker processes, so it only
+takes picklable arguments.
+'''
+
+def render_tile(f,z,i,j,size=TILE,iterations=2000,transients=500,samples=2,x0=0.2,
+                perturbation=1e-8,contrast=20):
+    f              = get_map(f)
+    r1, r2, x1, x2 = tile_bounds(f,z,i,j)
+    n_r            = size*samples
+    r              = r1 + (numpy.arange(n_r)+0.5)*(r2-r1)/n_r
+    counts         = bifurcation_counts(f,r,x0,iterations,transients,r1,r2,x1,x2,size,size,
+                                        perturbation)
+    density        = counts*(size*2**z/(samples*(iterations-transients+1)))
+    shade          = numpy.log1p(density)/numpy.log1p(contrast)
+    return encode_png(255 - numpy.round(255*numpy.clip(shade,0,1))[::-1])
+
+'''
+The tiles of one map with one set of settings, in memory and on disk, and the pool that works
+them out. tile() is a coroutine that gives the PNG of a tile from whichever is quickest.
+'''
+
+class TileCache:
+    def __init__(self,f='logistic',size=TILE,iterations=2000,transients=500,samples=2,x0=0.2,
+                 directory=None,memory=1024,max_bytes=2**30,workers=None,backend='process'):
+        self.f        = f if isinstance(f,str) else get_map(f).name
+        self.settings = dict(size=size,iterations=iterations,transients=transients,
+                             samples=samples,x0=x0)
+        key           = hashlib.sha256(repr((self.f,sorted(self.settings.items()))).encode())
+        if directory is None:
+            directory = os.environ.get('DYNAMICAL_SYSTEMS_CACHE',
+                                       os.path.join(os.path.expanduser('~'),'.cache',
+                                                    'dynamical_systems'))
+            directory = os.path.join(directory,'tiles',f'{self.f}-{key.hexdigest()[:16]}')
+        self.directory = directory
+        self.memory    = memory
+        self.max_bytes = max_bytes
+        self.tiles     = OrderedDict()
+        self.running   = {}
+        pool           = ThreadPoolExecutor if backend == 'thread' else ProcessPoolExecutor
+        self.pool      = pool(max_workers=workers or os.cpu_count() or 1)
+        os.makedirs(directory,exist_ok=True)
+
+    def path(self,z,i,j):
+        return os.path.join(self.directory,f'{z}_{i}_{j}.png')
+
+    def remember(self,key,png):
+        self.tiles[key] = png
+        self.tiles.move_to_end(key)
+        while len(self.tiles) > self.memory:
+            self.tiles.popitem(last=False)
+
+    async def tile(self,z,i,j):
+        key = (z,i,j)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+        if key not in self.running:
+            self.running[key] = asyncio.ensure_future(self.load(z,i,j))
+        try:
+            png = await asyncio.shield(self.running[key])
+        finally:
+            if key in self.running and self.running[key].done():
+                del self.running[key]
+        self.remember(key,png)
+        return png
+
+    async def load(self,z,i,j):
+        loop = asyncio.get_running_loop()
+        png  = await loop.run_in_executor(None,self.read,z,i,j)
+        if png is not None:
+            return png
+        png  = await loop.run_in_executor(self.pool,partial(render_tile,self.f,z,i,j,
+                                                            **self.settings))
+        await loop.run_in_executor(None,self.write,z,i,j,png)
+        return png
+
+    '''
+    The disk side, run in the event loop's default thread pool by load.
+    '''
+
+    def read(self,z,i,j):
+        path = self.path(z,i,j)
+        try:
+            with open(path,'rb') as file:
+                png = file.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return png
+
+    def write(self,z,i,j,png):
+        path = self.path(z,i,j)
+        temp = path + f'.{os.getpid()}.tmp'
+        with open(temp,'wb') as file:
+            file.write(png)
+        os.replace(temp,path)
+        self.evict(keep=path)
+
+    def files(self):
+        return [os.path.join(self.directory,name) for name in os.listdir(self.directory)
+                if name.endswith('.png')]
+
+    def evict(self,keep=None):
+        files = []
+        for path in self.files():
+            try:
+                files.append((os.path.getmtime(path),os.path.getsize(path),path))
+            except FileNotFoundError:
+                pass
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+'''
+The HTTP side, on asyncio streams: one GET request per connection, / for the viewer page and
+/tiles/z/i/j.png for the tiles. Anything else is a 404, and a tile outside the diagram (or
+deeper than max_zoom) is a 404 too. A request that fails in any other way (e.g. a tile that
+could not be worked out) gets a 500, and the error is printed, rather than the connection being
+dropped.
+'''
+
+PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>html,body{{margin:0;height:100%;overflow:hidden;background:#fff;font:13px sans-serif}}
+#view{{position:absolute;inset:0;cursor:grab}}#view img{{position:absolute;user-select:none}}
+#info{{position:absolute;left:8px;bottom:8px;background:#fffd;padding:2px 6px}}</style></head>
+<body><div id="view"></div><div id="info"></div><script>
+const T={size},R=[{r_lo},{r_hi}],X=[{x_lo},{x_hi}],MAX={max_zoom};
+const view=document.getElementById('view'),info=document.getElementById('info');
+let z=0,cx=0.5,cy=0.5,drag=null;
+function draw(){{
+  const W=view.clientWidth,H=view.clientHeight,n=2**z,s=n*T,ox=W/2-cx*s,oy=H/2-cy*s;
+  view.innerHTML='';
+  for(let i=Math.max(0,Math.floor(-ox/T));i<Math.min(n,Math.ceil((W-ox)/T));i++)
+    for(let j=Math.max(0,Math.floor(-oy/T));j<Math.min(n,Math.ceil((H-oy)/T));j++){{
+      const img=new Image();img.src=`/tiles/${{z}}/${{i}}/${{j}}.png`;img.draggable=false;
+      img.style.left=(ox+i*T)+'px';img.style.top=(oy+j*T)+'px';view.appendChild(img);}}
+  info.textContent=`zoom ${{z}}  r = ${{(R[0]+cx*(R[1]-R[0])).toPrecision(10)}}  `+
+                   `x = ${{(X[1]-cy*(X[1]-X[0])).toPrecision(10)}}`;
+}}
+view.onmousedown=e=>{{drag=[e.clientX,e.clientY]}};
+onmouseup=()=>{{drag=null}};
+onmousemove=e=>{{if(!drag)return;const s=2**z*T;cx-=(e.clientX-drag[0])/s;
+  cy-=(e.clientY-drag[1])/s;drag=[e.clientX,e.clientY];draw();}};
+view.onwheel=e=>{{e.preventDefault();const W=view.clientWidth,H=view.clientHeight,s=2**z*T,
+  px=cx+(e.clientX-W/2)/s,py=cy+(e.clientY-H/2)/s,nz=Math.min(MAX,Math.max(0,z+(e.deltaY<0?1:-1)));
+  const f=2**(z-nz);cx=px-(px-cx)*f;cy=py-(py-cy)*f;z=nz;draw();}};
+onresize=draw;draw();
+</script></body></html>'''
+
+async def respond(writer,status,body,kind):
+    reason = {200:'OK',404:'Not Found',405:'Method Not Allowed',
+              500:'Internal Server Error'}[status]
+    cache  = 'max-age=86400' if status == 200 else 'no-store'
+    writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: {kind}\r\n'
+                 f'Content-Length: {len(body)}\r\nCache-Control: {cache}\r\n'
+                 f'Connection: close\r\n\r\n'.encode() + body)
+    await writer.drain()
+
+class TileServer:
+    def __init__(self,cache,max_zoom=40):
+        self.cache    = cache
+        self.max_zoom = max_zoom
+
+    def page(self):
+        f          = get_map(self.cache.f)
+        r_lo, r_hi = f.parameter_range
+        x_lo, x_hi = f.domain
+        return PAGE.format(title=f'{f.name} bifurcation',size=self.cache.settings['size'],
+                           r_lo=r_lo,r_hi=r_hi,x_lo=x_lo,x_hi=x_hi,max_zoom=self.max_zoom)
+
+    def parse(self,target):
+        parts = target.split('?')[0].strip('/').split('/')
+        if len(parts) != 4 or parts[0] != 'tiles' or not parts[3].endswith('.png'):
+            return None
+        try:
+            z, i, j = int(parts[1]), int(parts[2]), int(parts[3][:-4])
+        except ValueError:
+            return None
+        if not 0 <= z <= self.max_zoom or not (0 <= i < 2**z and 0 <= j < 2**z):
+            return None
+        return z, i, j
+
+    async def handle(self,reader,writer):
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request) < 2 or request[0] != 'GET':
+                return await respond(writer,405,b'','text/plain')
+            if request[1].split('?')[0] in ('/','/index.html'):
+                return await respond(writer,200,self.page().encode(),'text/html; charset=utf-8')
+            tile = self.parse(request[1])
+            if tile is None:
+                return await respond(writer,404,b'not found','text/plain')
+            await respond(writer,200,await self.cache.tile(*tile),'image/png')
+        except (ConnectionError,asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            traceback.print_exc()
+            try:
+                await respond(writer,500,b'internal server error','text/plain')
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def start(self,host='127.0.0.1',port=8000):
+        return await asyncio.start_server(self.handle,host,port)
+
+async def run(host,port,**settings):
+    cache  = TileCache(**settings)
+    server = await TileServer(cache).start(host,port)
+    print(f'serving the {cache.f} bifurcation diagram at http://{host}:{port}/',flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        cache.close()
+
+def serve(f='logistic',host='127.0.0.1',port=8000,**settings):
+    try:
+        asyncio.run(run(host,port,f=f,**settings))
+    except KeyboardInterrupt:
+        pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a zoomable bifurcation diagram.')
+    parser.add_argument('--map',default='logistic',help='registered map name')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8000)
+    parser.add_argument('--iterations',type=int,default=2000)
+    parser.add_argument('--transients',type=int,default=500)
+    parser.add_argument('--samples',type=int,default=2,help='orbits per pixel column')
+    parser.add_argument('--x0',type=float,default=0.2)
+    parser.add_argument('--workers',type=int,default=None)
+    parser.add_argument('--directory',default=None,help='tile cache folder')
+    parser.add_argument('--max-bytes',type=int,default=2**30,help='tile cache size on disk')
+    args = parser.parse_args(argv)
+    serve(args.map,args.host,args.port,iterations=args.iterations,transients=args.transients,
+          samples=args.samples,x0=args.x0,workers=args.workers,directory=args.directory,
+          max_bytes=args.max_bytes)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import numpy
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+'''
+All of the randomness in the package (the small perturbation of the initial values and the
+random choices of points to plot or to use as references) comes from numpy Generators seeded
+from a single seed, never from the global random state, so that a run can be repeated exactly.
+
+The perturbation of a grid of orbits is drawn row by row (the first axis, the one that sweep
+splits between workers) from streams that each cover BLOCK rows of the whole grid, the stream
+of block b being spawned from the seed with the key (PERTURBATION, b). A row's value depends only
+on the seed and its position in the whole grid, so a chunk of rows (given its offset by sweep,
+see rows below) draws exactly the values it would have had as part of the whole grid and the
+results are the same bit for bit however many workers the grid is split between.
+
+A single orbit outside of a grid (one value of r in the scripts) has no row to take its values
+from, so it draws them from value_stream instead, a stream keyed on the values of r (and
+anything else that identifies the orbit) themselves: each r gets its own perturbation and its
+own sample of points, and the same ones every run.
+
+The seed defaults to SEED and can be changed for the session with set_seed, or for a single
+sweep with its seed argument.
+'''
+
+SEED  = 0
+BLOCK = 4096
+
+PERTURBATION, SAMPLE, REFERENCES, PLANE, VALUE = range(5)
+
+_default = [SEED]
+_rows    = ContextVar('rows',default=(None,0))
+
+def set_seed(seed):
+    _default[0] = seed
+
+def resolve_seed(seed=None):
+    if seed is not None:
+        return seed
+    context = _rows.get()[0]
+    return context if context is not None else _default[0]
+
+def row_offset():
+    return _rows.get()[1]
+
+'''
+Within rows(offset) the rows of any grid are numbered from offset on, i.e. it is a chunk
+starting offset rows into a bigger grid, and seed (if given) replaces the session seed.
+Offsets add up, so a chunk of a chunk is numbered within the whole grid.
+'''
+
+@contextmanager
+def rows(offset,seed=None):
+    token = _rows.set((resolve_seed(seed),row_offset()+offset))
+    try:
+        yield
+    finally:
+        _rows.reset(token)
+
+#a Generator for one purpose (and any further key), the same every time for the same seed
+def generator(purpose,*key,seed=None):
+    sequence = numpy.random.SeedSequence(resolve_seed(seed),spawn_key=(purpose,)+key)
+    return numpy.random.Generator(numpy.random.PCG64(sequence))
+
+#a Generator for one orbit, keyed on the bits of its values (e.g. r), the same every time
+def value_stream(*values,seed=None):
+    key = [int(numpy.float64(value).view(numpy.uint64)) for value in values]
+    return generator(VALUE,*key,seed=seed)
+
+#the first uniform value of the value_stream of each entry of values, in their shape
+def value_uniform(values,seed=None):
+    values = numpy.asarray(values,float)
+    drawn  = [value_stream(value,seed=seed).random() for value in values.ravel()]
+    return numpy.array(drawn,float).reshape(values.shape)
+
+'''
+Uniform values on [0,1) of the given shape, one row of the streams per entry of the first axis
+(a scalar is a single row), for the rows of the current chunk.
+'''
+
+def row_uniform(shape,seed=None):
+    shape  = tuple(shape)
+    count  = shape[0] if shape else 1
+    rest   = shape[1:]
+    start  = row_offset()
+    if count == 0:
+        return numpy.empty(shape,float)
+    first  = start//BLOCK
+    blocks = [generator(PERTURBATION,b,seed=seed).random((BLOCK,) + rest)
+              for b in range(first,(start+count-1)//BLOCK + 1)]
+    values = numpy.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+    return values[start-first*BLOCK:start-first*BLOCK+count].reshape(shape)
+
+#sample distinct indices out of n, sorted, the same ones every time for the same seed (or
+#drawn from stream if one is given)
+def choose(n,sample,purpose=SAMPLE,seed=None,stream=None):
+    stream = stream if stream is not None else generator(purpose,seed=seed)
+    return numpy.sort(stream.choice(n,sample,replace=False))
@@ -0,0 +1,95 @@
+import os
+import numpy
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dynamical_systems.streams import resolve_seed, row_offset, rows
+
+'''
+Running a parameter sweep over a grid of r. The grid is split into chunks (one per worker by
+default) and function(chunk,*args,**kwargs) is called on each chunk, either one after another
+('serial'), on a pool of threads ('thread', worthwhile for numpy kernels that release the GIL
+while they work on large arrays) or on a pool of processes ('process', which needs function
+and its arguments to be picklable, i.e. module level functions such as those in this package
+or functools.partial of them). The results are gathered back in the order of the grid.
+
+function must return its results along the first axis, one per r in the chunk. With
+combine='concatenate' the chunk results are joined together (element by element if function
+returns a tuple), with combine='sum' they are added together, which is what is wanted for
+e.g. histogram or image counts.
+
+Each chunk is run knowing where its rows start in the whole grid and with the same seed (seed,
+or the session seed, see dynamical_systems.streams), so its random perturbations are the ones
+those rows would have had in one piece and the result does not depend on the number of chunks.
+'''
+
+BACKENDS = ('serial','thread','process')
+
+'''
+Each sweep normally starts a pool of its own and shuts it down at the end, which for processes
+costs a good part of a second every time. Inside a shared_pool(backend,workers) block every
+sweep on that backend uses the one pool instead (workers defaulting to its size), e.g. for a
+batch of jobs run one after another.
+'''
+
+POOLS = {}
+
+@contextmanager
+def shared_pool(backend='process',workers=None):
+    if backend not in ('thread','process'):
+        raise ValueError(f"a shared pool must be 'thread' or 'process', not {backend!r}")
+    workers = workers or os.cpu_count() or 1
+    pool    = ThreadPoolExecutor if backend == 'thread' else ProcessPoolExecutor
+    with pool(max_workers=workers) as executor:
+        POOLS[backend] = (executor,workers)
+        try:
+            yield executor
+        finally:
+            del POOLS[backend]
+
+def sweep(function,r_values,*args,backend='serial',workers=None,chunks=None,
+          combine='concatenate',seed=None,**kwargs):
+    if backend not in BACKENDS:
+        raise ValueError(f'backend must be one of {BACKENDS}, not {backend!r}')
+    r_values = numpy.asarray(r_values,float)
+    seed     = resolve_seed(seed)
+    if backend == 'serial' and chunks is None:
+        with rows(0,seed):
+            return function(r_values,*args,**kwargs)
+    shared   = POOLS.get(backend)
+    workers  = workers or (shared[1] if shared else os.cpu_count() or 1)
+    chunks   = max(1,min(chunks or workers,len(r_values)))
+    pieces   = numpy.array_split(r_values,chunks)
+    starts   = row_offset() + numpy.cumsum([0] + [len(piece) for piece in pieces[:-1]])
+    tasks    = [partial(in_rows,function,int(start),seed) for start in starts]
+    if backend == 'serial':
+        results = [task(piece,*args,**kwargs) for task, piece in zip(tasks,pieces)]
+    elif shared:
+        futures = [shared[0].submit(task,piece,*args,**kwargs)
+                   for task, piece in zip(tasks,pieces)]
+        results = [future.result() for future in futures]
+    else:
+        pool = ThreadPoolExecutor if backend == 'thread' else ProcessPoolExecutor
+        with pool(max_workers=workers) as executor:
+            futures = [executor.submit(task,piece,*args,**kwargs)
+                       for task, piece in zip(tasks,pieces)]
+            results = [future.result() for future in futures]
+    return gather(results,combine)
+
+#run function on a chunk whose rows start at start in the whole grid (start is absolute, as a
+#worker thread or process does not share the caller's row numbering)
+def in_rows(function,start,seed,*args,**kwargs):
+    with rows(start-row_offset(),seed):
+        return function(*args,**kwargs)
+
+def gather(results,combine='concatenate'):
+    if combine == 'sum':
+        total = results[0]
+        for result in results[1:]:
+            total = total + result
+        return total
+    if combine != 'concatenate':
+        raise ValueError(f"combine must be 'concatenate' or 'sum', not {combine!r}")
+    if isinstance(results[0],tuple):
+        return tuple(gather(list(part),combine) for part in zip(*results))
+    return numpy.concatenate(results)
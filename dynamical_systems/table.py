@@ -0,0 +1,112 @@
+import numpy
+
+'''
+A compact, column-wise store of orbits for many values of r. All the orbit values sit end to
+end in one contiguous array, values, and the orbit of the i-th r is values[offsets[i]:
+offsets[i+1]], so orbits of different lengths can be kept together. Per-r numbers (r itself
+and, if known, the Lyapunov exponent) are stored once per r rather than once per row, and the
+step number of each value is worked out from the offsets when it is needed rather than stored.
+With dtype=numpy.float32 the values take half the memory again.
+
+Compared with one pandas DataFrame per r, concatenated (which stores r, the step number and
+the exponent on every row as well as the value, in float64 and int64), a table of float32
+values is about 8 times smaller. A DataFrame (or a pyarrow Table) is only built when asked for,
+and the value column of either is the values array itself rather than a copy.
+'''
+
+class OrbitTable:
+    def __init__(self,r,values,offsets,start=0,lyapunov=None,name='X'):
+        self.r        = numpy.atleast_1d(numpy.asarray(r,float))
+        self.values   = values
+        self.offsets  = numpy.asarray(offsets,numpy.int64)
+        self.start    = start
+        self.lyapunov = None if lyapunov is None else numpy.broadcast_to(
+                            numpy.asarray(lyapunov,float),self.r.shape).copy()
+        self.name     = name
+        if len(self.offsets) != len(self.r)+1 or self.offsets[-1] != len(values):
+            raise ValueError('offsets must have one more entry than r and end at len(values)')
+
+    '''
+    From the (n_r, steps) output of the orbit engine (or a single orbit), without a copy if it
+    is already contiguous and of the right dtype. start is the step number of the first value.
+    '''
+
+    @classmethod
+    def from_orbits(cls,r,orbits,start=0,lyapunov=None,dtype=float,name='X'):
+        orbits = numpy.asarray(orbits)
+        orbits = orbits.reshape(-1,orbits.shape[-1])
+        values = numpy.ascontiguousarray(orbits,dtype).ravel()
+        return cls(r,values,numpy.arange(len(orbits)+1)*orbits.shape[-1],start,lyapunov,name)
+
+    #from a list of orbits of any lengths, one per r
+    @classmethod
+    def from_list(cls,r,orbits,start=0,lyapunov=None,dtype=float,name='X'):
+        lengths = [len(orbit) for orbit in orbits]
+        values  = numpy.concatenate([numpy.asarray(orbit,dtype) for orbit in orbits]) \
+                  if orbits else numpy.empty(0,dtype)
+        return cls(r,values,numpy.concatenate([[0],numpy.cumsum(lengths)]),start,lyapunov,
+                   name)
+
+    def __len__(self):
+        return len(self.r)
+
+    def __repr__(self):
+        return (f'OrbitTable({len(self)} orbits, {len(self.values)} values of '
+                f'{self.values.dtype}, {self.nbytes} bytes)')
+
+    @property
+    def nbytes(self):
+        extra = 0 if self.lyapunov is None else self.lyapunov.nbytes
+        return self.values.nbytes + self.offsets.nbytes + self.r.nbytes + extra
+
+    def lengths(self):
+        return numpy.diff(self.offsets)
+
+    def orbit(self,i):
+        return self.values[self.offsets[i]:self.offsets[i+1]]
+
+    def steps(self):
+        lengths = self.lengths()
+        return (numpy.arange(len(self.values)) - numpy.repeat(self.offsets[:-1],lengths)
+                + self.start)
+
+    '''
+    shape='tall' gives one row per value with the step number, r, the value and (if there is
+    one) the exponent, as the scripts' dataframes have always been laid out. shape='wide' gives
+    one column per r indexed by step number, which needs all the orbits to be the same length
+    and is a view onto values.
+    '''
+
+    def to_pandas(self,shape='tall'):
+        import pandas
+        if shape == 'wide':
+            lengths = self.lengths()
+            if len(lengths) and (lengths != lengths[0]).any():
+                raise ValueError('the wide shape needs orbits of the same length')
+            steps = numpy.arange(lengths[0] if len(lengths) else 0) + self.start
+            frame = pandas.DataFrame(self.values.reshape(len(self),-1).T,copy=False,
+                                     index=pandas.Index(steps,name='Iterations'),
+                                     columns=pandas.Index(self.r,name='r'))
+            return frame
+        if shape != 'tall':
+            raise ValueError(f"unknown shape {shape!r}, use 'tall' or 'wide'")
+        columns = {'Iterations':self.steps(),'r':numpy.repeat(self.r,self.lengths()),
+                   self.name:self.values}
+        if self.lyapunov is not None:
+            columns['Lyapunov'] = numpy.repeat(self.lyapunov,self.lengths())
+        return pandas.DataFrame(columns,copy=False)
+
+    '''
+    A pyarrow Table with one row per r: r, the exponent and the orbit as a list column, whose
+    offsets and values are the table's own arrays. pyarrow is only imported here.
+    '''
+
+    def to_arrow(self):
+        import pyarrow
+        orbits  = pyarrow.LargeListArray.from_arrays(pyarrow.array(self.offsets),
+                                                     pyarrow.array(self.values))
+        columns = {'r':pyarrow.array(self.r)}
+        if self.lyapunov is not None:
+            columns['Lyapunov'] = pyarrow.array(self.lyapunov)
+        columns[self.name] = orbits
+        return pyarrow.table(columns)
@@ -0,0 +1,100 @@
+import numpy
+from dynamical_systems.maps import get_map
+from dynamical_systems.density import DensityAccumulator
+from dynamical_systems.instrument import stage
+
+try:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.linalg import eigs
+except ImportError:
+    coo_matrix = None
+
+'''
+The invariant density by Ulam's method rather than from a long orbit. The domain is cut into
+bins and P_ij, the fraction of bin i that the map sends into bin j, is the chance of going from
+bin i to bin j; the invariant density is then the stationary distribution p = pP of this
+Markov chain. Every bin is covered whatever the density there, so the bins at the
+1/sqrt(x(1-x)) edge singularities are as well resolved as the rest, where an orbit visits them
+only rarely.
+
+Each bin is cut into samples equal pieces and the ends of every piece are pushed through the
+map. Over a piece this small the map is as good as linear, so the piece's share of the mass is
+spread evenly over its image, and P_ij is worked out from the lengths of overlap of the images
+with the bins rather than by counting sample points, which would only give multiples of
+1/samples. Mass sent out of the domain is dropped and p is renormalised after every step.
+
+The matrix is kept as its nonzero entries (source bin, target bin, weight), a few per row, so
+10^5 bins take about a million entries. A step p -> pP is then a single numpy.bincount of
+the targets weighted by p of the sources.
+'''
+
+def transition_matrix(f,r,bins,samples=8,domain=None,block_size=2**22):
+    f         = get_map(f)
+    low, high = domain if domain is not None else getattr(f,'domain',(0,1))
+    width     = (high-low)/bins
+    step      = max(1,block_size//(4*samples))
+    keys, weights = [], []
+    with stage('ulam transitions'), numpy.errstate(over='ignore',invalid='ignore'):
+        for start in range(0,bins,step):
+            source = numpy.arange(start,min(start+step,bins))
+            y      = f(r,low + (source[:,None] + numpy.arange(samples+1)/samples)*width)
+            a      = (numpy.minimum(y[:,:-1],y[:,1:]).ravel() - low)/width
+            b      = (numpy.maximum(y[:,:-1],y[:,1:]).ravel() - low)/width
+            first  = numpy.clip(numpy.floor(a),0,bins-1).astype(numpy.int64)
+            last   = numpy.clip(numpy.floor(b),0,bins-1).astype(numpy.int64)
+            inside = (b >= 0) & (a <= bins) & numpy.isfinite(a) & numpy.isfinite(b)
+            span   = numpy.where(inside,last-first+1,0)
+            piece  = numpy.repeat(numpy.arange(len(a)),span)
+            target = (numpy.repeat(first - numpy.concatenate([[0],numpy.cumsum(span)[:-1]]),span)
+                      + numpy.arange(span.sum()))
+            lo, hi = a[piece], b[piece]
+            share  = numpy.where(hi > lo,(numpy.minimum(hi,target+1) - numpy.maximum(lo,target))
+                                 /numpy.where(hi > lo,hi-lo,1),1)
+            keys.append(numpy.repeat(source,samples)[piece]*bins + target)
+            weights.append(share/samples)
+        keys, inverse = numpy.unique(numpy.concatenate(keys),return_inverse=True)
+        weight        = numpy.bincount(inverse.ravel(),numpy.concatenate(weights))
+    return keys // bins, keys % bins, weight
+
+'''
+The stationary distribution. The power method steps the lazy chain p -> (p + pP)/2, which has
+the same stationary distribution but cannot cycle between the bins of a periodic orbit, from
+the uniform distribution until the total change in a step is below tolerance. method='eigen'
+asks scipy's sparse eigen-solver for the eigenvector of eigenvalue 1 instead.
+'''
+
+def stationary_distribution(source,target,weight,bins,method='power',tolerance=1e-10,
+                            max_steps=10000):
+    with stage('ulam stationary'):
+        if method == 'eigen':
+            if coo_matrix is None:
+                raise ImportError('the eigen method needs scipy, use method="power"')
+            matrix = coo_matrix((weight,(target,source)),shape=(bins,bins)).tocsr()
+            vector = eigs(matrix,k=1,which='LM',v0=numpy.full(bins,1/bins))[1][:,0]
+            p      = numpy.abs(vector.real)
+            return p/p.sum()
+        if method != 'power':
+            raise ValueError(f"unknown method {method!r}, use 'power' or 'eigen'")
+        p = numpy.full(bins,1/bins)
+        for step in range(max_steps):
+            q  = numpy.bincount(target,weight*p[source],bins)
+            q  = (p + q/q.sum())/2
+            if numpy.abs(q-p).sum() < tolerance:
+                return q
+            p  = q
+        return p
+
+'''
+Ulam's invariant density for the map f at parameter r, returned as a DensityAccumulator (see
+dynamical_systems.density) whose counts are the stationary probability of each bin, so that
+density() and centres() are the same as for the histogram of an orbit.
+'''
+
+def ulam_density(f,r,bins,samples=8,domain=None,method='power',tolerance=1e-10,
+                 max_steps=10000):
+    f       = get_map(f)
+    domain  = domain if domain is not None else getattr(f,'domain',(0,1))
+    matrix  = transition_matrix(f,r,bins,samples,domain)
+    density = DensityAccumulator(bins,domain)
+    density.counts = stationary_distribution(*matrix,bins,method,tolerance,max_steps)
+    return density
@@ -0,0 +1,16 @@
+import os
+import numpy
+from dynamical_systems.export import load_script
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')
+BOX  = load_script(os.path.join(ROOT,'Logistic Map','Python Scripts','Logistic Box.py'))
+
+#a single r gives the same dimension as the same r within the range sweep, whatever the backend
+def test_single_r_matches_range():
+    sweep = BOX.range_box_counting_values(3.5,4,0.2,3000,500,graph=None)
+    for index in (0,40,len(sweep.r)-1):
+        r = sweep.r[index]
+        assert BOX.box_counting_values(r,0.2,3000,500,graph=None).D == sweep.dimension[index]
+    threads = BOX.range_box_counting_values(3.5,4,0.2,3000,500,backend='thread',workers=3,
+                                            graph=None)
+    assert numpy.array_equal(threads.dimension,sweep.dimension)
@@ -0,0 +1,13 @@
+import os
+from dynamical_systems.export import load_script
+
+ROOT        = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..')
+BIFURCATION = load_script(os.path.join(ROOT,'Logistic Map','Python Scripts',
+                                       'Logistic bifurcation.py'))
+
+#a single r gives the same entropy as the same r within the range sweep
+def test_single_r_matches_range():
+    sweep = BIFURCATION.shannon_entropy_range(3.5,4,0.2,2000,500,50,spacing=40,graph=None)
+    for index in (0,17,39):
+        r = sweep.r[index]
+        assert BIFURCATION.logistic_shannon_entropy(r,0.2,2000,500,50) == sweep.entropy[index]